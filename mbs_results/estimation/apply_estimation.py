@@ -1,14 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import pandas as pd
 
 from mbs_results.estimation.calculate_estimation_weights import (
-    calculate_calibration_factor,
-    calculate_design_weight,
+    calculate_estimation_weights,
 )
 from mbs_results.estimation.create_population_counts import (
     create_population_count_output,
 )
 from mbs_results.estimation.pre_processing_estimation import get_estimation_data
-from mbs_results.staging.data_cleaning import is_census
 from mbs_results.utilities.file_selector import find_files
 from mbs_results.utilities.inputs import read_csv_wrapper
 
@@ -31,7 +32,8 @@ def apply_estimation(method: str, convert_NI_GB_cells: bool, config: dict):
         If True, will convert NI and GB cells to UK (convert_cell_number
         will be activated)
     config : dict
-        main config file for pipeline
+        main config file for pipeline. Optional key `estimation_workers` reads
+        and weights that many periods at a time in a pool of threads.
 
     Returns
     -------
@@ -58,8 +60,6 @@ def apply_estimation(method: str, convert_NI_GB_cells: bool, config: dict):
         config=config,
     )
 
-    estimation_df_list = []
-
     if method not in ["separate", "combined"]:
         raise ValueError(
             """{} is not an accepted state status,
@@ -85,47 +85,23 @@ def apply_estimation(method: str, convert_NI_GB_cells: bool, config: dict):
         calibration_group_map = None
         config["group"] = config["strata"]
 
-    for population_file, sample_file in zip(population_files, sample_files):
-        estimation_data = get_estimation_data(
-            population_file,
-            sample_file,
-            calibration_group_map,
-            convert_NI_GB_cells,
-            config,
-        )
+    estimate_period = partial(
+        get_estimation_weights,
+        calibration_group_map=calibration_group_map,
+        convert_NI_GB_cells=convert_NI_GB_cells,
+        config=config,
+    )
 
-        census_df = estimation_data[
-            is_census(
-                estimation_data[config["calibration_group"]],
-                config["census_extra_calibration_group"],
-            )
-        ]
-
-        census_df["design_weight"] = 1
-        census_df["calibration_factor"] = 1
-        census_df["is_census"] = True
-        # is_census: bool, to distinguish fully sampled (i.e. census) strata from
-        # non-census strata. Used in outlier detection so census strata are
-        # not winsorised.
-        # is_sampled: bool. This is used to distinguish sampled refs from non-sampled
-        # refs in population
-
-        non_census_df = estimation_data[
-            ~(
-                is_census(
-                    estimation_data[config["calibration_group"]],
-                    config["census_extra_calibration_group"],
-                )
+    if config.get("estimation_workers"):
+        # Periods are independent, reading files of one period overlaps with
+        # weighting another. Results are returned in period order.
+        with ThreadPoolExecutor(max_workers=config["estimation_workers"]) as executor:
+            estimation_df_list = list(
+                executor.map(estimate_period, population_files, sample_files)
             )
-        ]
 
-        non_census_df = calculate_design_weight(non_census_df, **config)
-        non_census_df = calculate_calibration_factor(non_census_df, **config)
-        non_census_df["is_census"] = False
-
-        all_together = pd.concat([non_census_df, census_df], ignore_index=True)
-
-        estimation_df_list.append(all_together)
+    else:
+        estimation_df_list = list(map(estimate_period, population_files, sample_files))
 
     estimation_df = pd.concat(estimation_df_list, ignore_index=True)
 
@@ -134,3 +110,46 @@ def apply_estimation(method: str, convert_NI_GB_cells: bool, config: dict):
     # validate_estimation(estimation_df, **config)
 
     return estimation_df
+
+
+def get_estimation_weights(
+    population_file: str,
+    sample_file: str,
+    calibration_group_map: pd.DataFrame,
+    convert_NI_GB_cells: bool,
+    config: dict,
+) -> pd.DataFrame:
+    """
+    Read population frame and sample of one period and derive estimation
+    weights.
+
+    Parameters
+    ----------
+    population_file : str
+        File path of the population frame.
+    sample_file : str
+        File path of the sample.
+    calibration_group_map : pd.DataFrame
+        Dataframe containing map between cell number and calibration group,
+        None for the separate method.
+    convert_NI_GB_cells: bool
+        If True, will convert NI and GB cells to UK (convert_cell_number
+        will be activated)
+    config : dict
+        main config file for pipeline
+
+    Returns
+    -------
+    pd.DataFrame
+        population frame with sampled flag, design weight, calibration factor
+        and is_census
+    """
+    estimation_data = get_estimation_data(
+        population_file,
+        sample_file,
+        calibration_group_map,
+        convert_NI_GB_cells,
+        config,
+    )
+
+    return calculate_estimation_weights(estimation_data, **config)
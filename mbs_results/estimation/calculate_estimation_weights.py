@@ -1,5 +1,11 @@
+from typing import List
+
+import numpy as np
 import pandas as pd
 
+from mbs_results.staging.data_cleaning import is_census
+from mbs_results.utilities.utils import get_group_codes
+
 
 def calculate_design_weight(
     population_frame: pd.DataFrame,
@@ -31,21 +37,27 @@ def calculate_design_weight(
     -----
     #TODO: Add link to specification once added to repository
     """
-    population_counts = population_frame.groupby([period, strata]).size()
+    codes = get_group_codes(population_frame, [period, strata])
+    number_of_groups = codes.max(initial=-1) + 1
 
-    sample = population_frame[population_frame[sampled] == 1]
-    sample_counts = sample.groupby([period, strata]).size()
+    is_sampled = population_frame[sampled].to_numpy() == 1
 
-    design_weights = population_counts / sample_counts
-
-    design_weights.name = "design_weight"
-    design_weights = design_weights.reset_index()
+    population_counts = np.bincount(codes[codes >= 0], minlength=number_of_groups)
+    sample_counts = np.bincount(
+        codes[(codes >= 0) & is_sampled], minlength=number_of_groups
+    )
 
-    population_frame = population_frame.merge(
-        design_weights, how="left", on=[period, strata]
+    # Strata without sampled businesses have no design weight
+    design_weights = np.divide(
+        population_counts,
+        sample_counts,
+        out=np.full(number_of_groups, np.nan),
+        where=sample_counts > 0,
     )
 
-    return population_frame
+    return population_frame.assign(
+        design_weight=take_group_values(design_weights, codes)
+    )
 
 
 def calculate_calibration_factor(
@@ -82,22 +94,105 @@ def calculate_calibration_factor(
     pd.DataFrame
         dataframe with new column `calibration_factor`
     """
+    is_sampled = population_frame[sampled].to_numpy() == 1
+
+    # Population and weighted sample sums in one aggregation
+    grouped = pd.DataFrame(
+        {
+            "auxiliary": population_frame[auxiliary],
+            "weighted_auxiliary": (
+                population_frame[auxiliary] * population_frame[design_weight]
+            ).where(is_sampled),
+        }
+    ).groupby([population_frame[period], population_frame[group]])
+
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype="int64")
+    sums = grouped.sum()
+
+    population_sums = sums["auxiliary"].to_numpy()
+    # Groups without sampled businesses have no calibration factor
+    weighted_sample_sums = np.where(
+        np.bincount(codes[(codes >= 0) & is_sampled], minlength=len(sums)) > 0,
+        sums["weighted_auxiliary"].to_numpy(),
+        np.nan,
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        calibration_factors = population_sums / weighted_sample_sums
 
-    population_sums = population_frame.groupby([period, group])[auxiliary].sum()
+    return population_frame.assign(
+        calibration_factor=take_group_values(calibration_factors, codes)
+    )
 
-    # copy to avoid SettingWithCopy warning
-    # (not required with later versions of pandas)
-    sample = population_frame.copy()[population_frame[sampled] == 1]
-    sample["weighted_auxiliary"] = sample[auxiliary] * sample[design_weight]
-    weighted_sample_sums = sample.groupby([period, group])["weighted_auxiliary"].sum()
 
-    calibration_factor = population_sums / weighted_sample_sums
+def calculate_estimation_weights(
+    estimation_data: pd.DataFrame,
+    calibration_group: str,
+    census_extra_calibration_group: List,
+    **config,
+) -> pd.DataFrame:
+    """
+    Add design weight, calibration factor and is_census columns to the
+    estimation data of one or more periods.
 
-    calibration_factor.name = "calibration_factor"
-    calibration_factor = calibration_factor.reset_index()
+    Census calibration groups have design weight and calibration factor 1,
+    weights of other groups are calculated with calculate_design_weight and
+    calculate_calibration_factor. Non census rows are returned first,
+    followed by census rows.
+
+    Parameters
+    ----------
+    estimation_data : pd.DataFrame
+        population frame with sampled flag and calibration group
+    calibration_group : str
+        name of column in dataframe containing calibration group
+    census_extra_calibration_group : List
+        calibration groups which are census besides groups ending in 4 or 5
+    **config
+        main config, containing period, strata, group, sampled, auxiliary and
+        design_weight column names
 
-    population_frame = population_frame.merge(
-        calibration_factor, how="left", on=[period, group]
+    Returns
+    -------
+    pd.DataFrame
+        dataframe with new columns design_weight, calibration_factor and
+        is_census
+    """
+    # is_census: bool, to distinguish fully sampled (i.e. census) strata from
+    # non-census strata. Used in outlier detection so census strata are
+    # not winsorised.
+    # is_sampled: bool. This is used to distinguish sampled refs from non-sampled
+    # refs in population
+    census = is_census(
+        estimation_data[calibration_group], census_extra_calibration_group
+    ).to_numpy()
+
+    non_census_df = calculate_design_weight(estimation_data[~census], **config)
+    non_census_df = calculate_calibration_factor(non_census_df, **config)
+
+    census_df = estimation_data[census].assign(design_weight=1, calibration_factor=1)
+
+    return pd.concat(
+        [non_census_df.assign(is_census=False), census_df.assign(is_census=True)],
+        ignore_index=True,
     )
 
-    return population_frame
+
+def take_group_values(values: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """
+    Maps values of each group back to rows, rows with group number -1 are
+    given NaN.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        value of each group, indexed by group number
+    codes : np.ndarray
+        group number of each row
+
+    Returns
+    -------
+    np.ndarray
+        value of each row
+    """
+    return np.append(values.astype("float64"), np.nan).take(codes)
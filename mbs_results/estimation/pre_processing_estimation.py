@@ -29,6 +29,7 @@ def get_estimation_data(
         platform - either "s3" or "network"
         bucket_name - S3 bucket name for file storage. (optional)
         population_column_names: list of column names for the population frames
+        idbr_cache_path - local folder to cache parsed files in (optional)
 
     Returns
     -------
@@ -43,6 +44,8 @@ def get_estimation_data(
         period=config["period"],
         import_platform=config["platform"],
         bucket_name=config["bucket"],
+        cache_path=config.get("idbr_cache_path"),
+        cache_format=config.get("idbr_cache_format", "parquet"),
     )
 
     sample_df = read_colon_separated_file(
@@ -52,6 +55,8 @@ def get_estimation_data(
         period=config["period"],
         import_platform=config["platform"],
         bucket_name=config["bucket"],
+        cache_path=config.get("idbr_cache_path"),
+        cache_format=config.get("idbr_cache_format", "parquet"),
     )
 
     estimation_data = derive_estimation_variables(
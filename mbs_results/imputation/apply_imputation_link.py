@@ -1,3 +1,6 @@
+from mbs_results.imputation.panel_index import sort_panel
+
+
 def create_and_merge_imputation_values(
     df,
     imputation_class,
@@ -13,8 +16,9 @@ def create_and_merge_imputation_values(
     **kwargs,
 ):
     """
-    Loop through different imputation types and merge the results according
-    to an imputation marker column
+    Apply imputation to the target column according to an imputation marker
+    column. Constructed values are applied first, then rolling imputation
+    values are taken from a single forward and backward fill of the target.
 
     Parameters
     ----------
@@ -40,10 +44,10 @@ def create_and_merge_imputation_values(
     construction_link : str
         column name for contruction link
     imputation_types : tup
-        types of imputation to run and add to combined_imputation column stored in a
-        tuple. If 'fic' is selected 'c' must also be selected and proceed 'fic'.
-        For 'fic' to produce the correct result, the C marker must be in the first
-        period for a given reference.
+        types of imputation to apply to the target column stored in a tuple.
+        If 'fic' is selected 'c' must also be selected. For 'fic' to produce the
+        correct result, the C marker must be in the first period for a given
+        reference.
     kwargs : mapping, optional
         A dictionary of keyword arguments passed into func.
 
@@ -53,147 +57,40 @@ def create_and_merge_imputation_values(
         dataframe with imputation values defined by the imputation marker
     """
 
-    # constructed has to come first to use the result for forward
-    # impute from constructed
-    imputation_config = {
-        # "backdata": {
-        #     "intermediate_column": "backdata",
-        #     "marker": "backdata",
-        #     # doesn't actually apply a fill so can be forward or back
-        #     "fill_column": target,
-        #     "fill_method": "ffill",
-        #     "link_column": cumulative_forward_link,
-        # },
-        "c": {
-            "intermediate_column": "constructed",
-            "marker": "c",
-            # doesn't actually apply a fill so can be forward or back
-            "fill_column": auxiliary,
-            "fill_method": "ffill",
-            "link_column": construction_link,
-        },
-        "mc": {
-            "intermediate_column": "manual_constructed",
-            "marker": "mc",
-            # doesn't actually apply a fill so can be forward or back
-            # ToDo rework to worth with None as input
-            "fill_column": f"{target}_man",
-            "fill_method": "ffill",
-            "link_column": "man_link",
-        },
-        "fir": {
-            "intermediate_column": "fir",
-            "marker": "fir",
-            "fill_column": target,
-            "fill_method": "ffill",
-            "link_column": cumulative_forward_link,
-        },
-        # FIMC Here or after BIR
-        "bir": {
-            "intermediate_column": "bir",
-            "marker": "bir",
-            "fill_column": target,
-            "fill_method": "bfill",
-            "link_column": cumulative_backward_link,
-        },
-        "fimc": {
-            "intermediate_column": "fimc",
-            "marker": "fimc",
-            "fill_column": f"{target}_man",
-            "fill_method": "ffill",
-            "link_column": cumulative_forward_link,
-        },
-        # FIMC Here instead, check specs?
-        "fic": {
-            # FIC only works if the C is in the first period of the business being
-            # sampled. This is fine for automatic imputation, but should be careful
-            # if manual construction imputation is done
-            "intermediate_column": "fic",
-            "marker": "fic",
-            "fill_column": target,
-            "fill_method": "ffill",
-            "link_column": cumulative_forward_link,
-        },
-    }
-
-    df.sort_values([imputation_class, reference, period], inplace=True)
-
-    intermediate_columns = []
+    sort_panel(df, [imputation_class, reference, period], inplace=True)
 
-    for imp_type in imputation_types:
-        df = create_impute(
-            df, [imputation_class, reference], imputation_config[imp_type]
-        )
-        df = merge_imputation_type(df, imputation_config[imp_type], marker, target)
+    not_backdata = ~df["is_backdata"]
 
-        intermediate_columns.append(imputation_config[imp_type]["intermediate_column"])
-
-    return df.drop(columns=intermediate_columns)
-
-
-def create_impute(df, group, imputation_spec):
-    """
-    Add a new column to a dataframe of imputed values using ratio imputation.
-
-    Parameters
-    ----------
-    dataframe : pandas.DataFrame
-    group : str or list
-        variables that define the imputation class
-    imputation_spec: dict
-        dictionary defining the details of the imputation type
-
-    Returns
-    -------
-    pandas.DataFrame
-        dataframe with an added imputation column defined by the imputation_spec
-    """
-
-    column_name = imputation_spec["intermediate_column"]
-    fill_column = imputation_spec["fill_column"]
-    fill_method = imputation_spec["fill_method"]
-    link_column = imputation_spec["link_column"]
-    imputation_spec["marker"]
-
-    if fill_method == "ffill":
-        df[column_name] = df.groupby(group)[fill_column].ffill() * df[link_column]
-    elif fill_method == "bfill":
-        df[column_name] = df.groupby(group)[fill_column].bfill() * df[link_column]
-
-    if "hold_period_0_values" in df.columns:
-        df.loc[df["hold_period_0_values"].notnull(), column_name] = df.loc[
-            df["hold_period_0_values"].notnull(), "hold_period_0_values"
-        ]
-        df.drop(columns="hold_period_0_values", inplace=True)
+    # Constructed values are applied first, so forward imputation from
+    # constructed (fic) and manual constructed (fimc) values can use them.
+    # These rows always have their own auxiliary and manual construction values,
+    # so no fill is needed
+    construction_sources = {
+        "c": (auxiliary, construction_link),
+        "mc": (f"{target}_man", "man_link"),
+    }
 
-    return df
+    for imp_type, (fill_column, link_column) in construction_sources.items():
+        if imp_type in imputation_types:
+            is_type = (df[marker] == imp_type) & not_backdata
+            df.loc[is_type, target] = (
+                df.loc[is_type, fill_column] * df.loc[is_type, link_column]
+            )
 
+    # Rolling imputation needs one forward and one backward fill, the link and
+    # fill used by each row are then selected from the imputation marker
+    group = df.groupby([imputation_class, reference])[target]
 
-def merge_imputation_type(df, imputation_spec, marker, target):
-    """
-    Uses an existing column of imputed values and a imputation marker to merge values
-    into a single column
+    forward_types = [i for i in ("fir", "fimc", "fic") if i in imputation_types]
+    backward_types = [i for i in ("bir",) if i in imputation_types]
 
-    Parameters
-    ----------
-    dataframe : pandas.DataFrame
-    imputation_spec: dict
-        dictionary defining the details of the imputation type
-    marker : str
-        column name containing a marker to indicate the type of imputation required
-    combined_imputation : str
-        column name for the combined imputation types according to the imputation marker
+    is_forward = df[marker].isin(forward_types) & not_backdata
+    is_backward = df[marker].isin(backward_types) & not_backdata
 
-    Returns
-    -------
-    pandas.DataFrame
-        dataframe with combined_imputation
-    """
+    forward_values = group.ffill() * df[cumulative_forward_link]
+    backward_values = group.bfill() * df[cumulative_backward_link]
 
-    imputation_marker = imputation_spec["marker"]
-    imputation_column = imputation_spec["intermediate_column"]
+    df.loc[is_forward, target] = forward_values[is_forward]
+    df.loc[is_backward, target] = backward_values[is_backward]
 
-    df.loc[(df[marker] == imputation_marker) & (~df["is_backdata"]), target] = df[
-        imputation_column
-    ]
     return df
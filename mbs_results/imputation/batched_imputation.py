@@ -0,0 +1,96 @@
+import logging
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def ratio_of_means_batched(
+    df: pd.DataFrame,
+    imputation_function: Callable,
+    batch_size: int,
+    question_no: str,
+    strata: str,
+    **rom_arguments,
+) -> pd.DataFrame:
+    """
+    Runs ratio of means in batches of question number and imputation class
+    partitions, so only one batch is imputed at a time.
+
+    Links are calculated per imputation class and period, and forward and
+    backward imputation never cross an imputation class and reference, so
+    imputing partitions separately gives the same output as imputing them
+    together. Memory used by the intermediate columns of ratio of means is
+    bounded by the batch size instead of the number of periods and
+    references in the revision window. The outputs of all batches are kept,
+    as estimation and outlier detection need the full imputed dataframe, and
+    are concatenated once without sorting them again.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe with all question numbers to impute.
+    imputation_function : Callable
+        Function which runs ratio of means for a dataframe, called with
+        question_no, strata and rom_arguments.
+    batch_size : int
+        Number of question number and imputation class partitions imputed
+        together.
+    question_no : str
+        Column name containing question number.
+    strata : str
+        Column name containing strata information (imputation class).
+    rom_arguments : mapping
+        Remaining keyword arguments passed to imputation_function.
+
+    Returns
+    -------
+    pd.DataFrame
+        Output of ratio_of_means for all question numbers, sorted by question
+        number, strata, reference and period.
+    """
+    sort_columns = [
+        question_no,
+        strata,
+        rom_arguments["reference"],
+        rom_arguments["period"],
+    ]
+
+    # Partitions are numbered in sorted order, so sorting each batch output
+    # sorts the concatenated output
+    partition_codes = (
+        df.groupby([question_no, strata], dropna=False, sort=True).ngroup().to_numpy()
+    )
+    partition_rows = pd.Series(partition_codes).groupby(partition_codes).indices
+
+    batches = np.array_split(
+        np.arange(len(partition_rows)),
+        max(int(np.ceil(len(partition_rows) / batch_size)), 1),
+    )
+
+    batch_outputs = []
+
+    for batch_number, batch in enumerate(batches):
+        batch_rows = np.sort(
+            np.concatenate(
+                [np.empty(0, dtype="int64"), *(partition_rows[code] for code in batch)]
+            )
+        )
+
+        batch_outputs.append(
+            imputation_function(
+                df.iloc[batch_rows],
+                question_no=question_no,
+                strata=strata,
+                **rom_arguments,
+            ).sort_values(sort_columns, kind="stable", ignore_index=True)
+        )
+
+        logger.info(
+            f"Imputed batch {batch_number + 1} of {len(batches)} "
+            f"({len(batch)} question and imputation class partitions)"
+        )
+
+    return pd.concat(batch_outputs, ignore_index=True)
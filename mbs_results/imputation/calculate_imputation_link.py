@@ -1,6 +1,13 @@
+import logging
+from typing import List
+
 import numpy as np
 import pandas as pd
 
+from mbs_results.utilities.lookups import map_lookup
+
+logger = logging.getLogger(__name__)
+
 
 def calculate_imputation_link(
     df: pd.DataFrame,
@@ -41,37 +48,226 @@ def calculate_imputation_link(
     df : pd.DataFrame
         A pandas DataFrame with a new column containing imputation link.
     """
+    link_table = calculate_imputation_link_table(
+        df, period, strata, match_col, target, predictive_variable, link_col
+    )
+
+    link_columns = [link_col, "default_link_" + match_col]
+
+    return join_imputation_link_table(df, link_table[link_columns], [strata, period])
+
+
+def calculate_imputation_link_table(
+    df: pd.DataFrame,
+    period: str,
+    strata: str,
+    match_col: str,
+    target: str,
+    predictive_variable: str,
+    link_col: str,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Calculate link between target and predictive_variable, default link flag
+    and count of matches, one row per strata and period.
+
+    Parameters
+    ----------
+    df : pd.Dataframe
+        Original dataframe.
+    period : str
+        Column name containing time period.
+    strata : str
+        Column name containing strata information (sic).
+    match_col : str
+        Column name of the matched pair links, this column should be bool.
+    target : str
+        Column name of the targeted variable.
+    predictive_variable : str
+        Column name of the predicted target variable.
+    link_col : str
+        Name to use for the column containing imputation link
+    kwargs : mapping, optional
+        A dictionary of keyword arguments passed into func.
+
+    Returns
+    -------
+    pd.DataFrame
+        Link table indexed by strata and period, in order of first appearance
+        in df, with the imputation link, default link flag and match count
+        columns. Rows with missing strata or period are not in the table.
+    """
 
-    df_intermediate = df.copy()
     if "ignore_from_link" in df.columns:
         # Quick and dirty work around when dealing with filtered cases
-        df_intermediate.rename(
-            columns={
-                f"f_match_filtered_{target}": f"f_match_{target}",
-                f"b_match_filtered_{target}": f"b_match_{target}",
-            },
-            inplace=True,
-        )
+        filtered_match_cols = {
+            f"f_match_{target}": f"f_match_filtered_{target}",
+            f"b_match_{target}": f"b_match_filtered_{target}",
+        }
+        link_match_col = filtered_match_cols.get(match_col, match_col)
+    else:
+        link_match_col = match_col
 
-    df_intermediate[target] = df_intermediate[target] * df_intermediate[match_col]
+    # Links are summed by strata and period codes, so no copy of the
+    # dataframe is needed
+    grouped = df.groupby([strata, period], sort=False)
+    group_codes = grouped.ngroup().fillna(-1).to_numpy(dtype="int64")
 
-    df_intermediate[predictive_variable] = (
-        df_intermediate[predictive_variable] * df_intermediate[match_col]
+    match = df[link_match_col].eq(True).to_numpy()
+
+    numerator = sum_matched_values(
+        df[target].to_numpy(dtype="float"), match, group_codes, grouped.ngroups
+    )
+    denominator = sum_matched_values(
+        df[predictive_variable].to_numpy(dtype="float"),
+        match,
+        group_codes,
+        grouped.ngroups,
     )
 
-    numerator = df_intermediate.groupby([strata, period])[target].transform("sum")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        link = numerator / denominator
+
+    # Groups are numbered in order of first appearance, so the first row of
+    # each group gives its strata and period
+    _, first_rows = np.unique(group_codes, return_index=True)
+    first_rows = first_rows[group_codes[first_rows] >= 0]
+
+    link_table = pd.DataFrame(
+        {link_col: link},
+        index=pd.MultiIndex.from_frame(df[[strata, period]].iloc[first_rows]),
+    )
+
+    link_table = calculate_default_imputation_links(
+        link_table, pd.Series(denominator, link_table.index), match_col, link_col
+    )
+
+    link_table[link_match_col + "_count"] = np.bincount(
+        group_codes[match & (group_codes >= 0)], minlength=grouped.ngroups
+    )
+
+    return link_table
+
+
+def join_imputation_link_table(
+    df: pd.DataFrame, link_table: pd.DataFrame, keys: List[str]
+) -> pd.DataFrame:
+    """
+    Adds the columns of a link table indexed by strata and period onto the
+    rows of df. Rows without a link get missing links and counts, and False
+    default link flags.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Original dataframe.
+    link_table : pd.DataFrame
+        Link table indexed by keys, e.g. strata and period from
+        calculate_imputation_link_table.
+    keys : List[str]
+        Column names of the link table index, e.g. strata and period.
 
-    denominator = df_intermediate.groupby([strata, period])[
-        predictive_variable
-    ].transform("sum")
+    Returns
+    -------
+    pd.DataFrame
+        df with the link table columns added.
+    """
+    links = map_lookup(df, link_table, keys)
 
-    df[link_col] = numerator / denominator
+    for column in links.columns:
+        if column.startswith("default_link_"):
+            # Missing default link flags are False
+            links[column] = links[column].eq(True)
 
-    df = calculate_default_imputation_links(df, denominator, match_col, link_col)
+        df[column] = links[column]
 
     return df
 
 
+def replace_imputation_links(
+    link_table: pd.DataFrame,
+    links: pd.DataFrame,
+    question_numbers: np.ndarray,
+    question_no: str,
+) -> pd.DataFrame:
+    """
+    Replaces the links, default link flags and match counts of a link table
+    with the links of the same question number, strata and period from
+    another table.
+
+    Parameters
+    ----------
+    link_table : pd.DataFrame
+        Link table indexed by strata and period, e.g. from
+        calculate_imputation_link_table.
+    links : pd.DataFrame
+        Links with question number, strata and period columns, and the
+        columns of link_table.
+    question_numbers : np.ndarray
+        Question number of each row of link_table.
+    question_no : str
+        Column name containing question number.
+
+    Returns
+    -------
+    pd.DataFrame
+        link_table with the replaced links.
+    """
+    keys = [question_no, *link_table.index.names]
+
+    positions = links.set_index(keys).index.get_indexer(
+        pd.MultiIndex.from_arrays(
+            [
+                question_numbers,
+                *(
+                    link_table.index.get_level_values(level)
+                    for level in range(link_table.index.nlevels)
+                ),
+            ]
+        )
+    )
+
+    is_given = positions >= 0
+
+    if is_given.any():
+        for column in link_table.columns:
+            link_table[column] = np.where(
+                is_given,
+                links[column].to_numpy()[positions],
+                link_table[column].to_numpy(),
+            )
+
+    return link_table
+
+
+def sum_matched_values(
+    values: np.ndarray, match: np.ndarray, group_codes: np.ndarray, ngroups: int
+) -> np.ndarray:
+    """
+    Sums values by group, only where match is True, missing values are
+    treated as 0.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values to sum.
+    match : np.ndarray
+        Boolean array, True where the value should be included.
+    group_codes : np.ndarray
+        Group code of each value, -1 if the value has no group.
+    ngroups : int
+        Number of groups.
+
+    Returns
+    -------
+    np.ndarray
+        Sum of matched values for each group code.
+    """
+    include = match & (group_codes >= 0) & ~np.isnan(values)
+
+    return np.bincount(group_codes[include], weights=values[include], minlength=ngroups)
+
+
 def calculate_default_imputation_links(
     df: pd.DataFrame,
     denominator: pd.Series,
@@ -115,12 +311,54 @@ def calculate_default_imputation_links(
         A pandas DataFrame with default values overwriting values in
         imputation link columns.
     """
-    default_indices = denominator.index[denominator == 0].tolist()
+    is_default = (denominator == 0).to_numpy()
 
-    df.loc[default_indices, link_col] = default_value
+    df.loc[is_default, link_col] = default_value
 
-    df["default_link_" + match_col] = np.where(
-        df.index.isin(default_indices), True, False
-    )
+    df["default_link_" + match_col] = is_default
 
     return df
+
+
+def merge_imputation_link_table(
+    df: pd.DataFrame,
+    link_table: pd.DataFrame,
+    question_no: str,
+    strata: str,
+    period: str,
+) -> pd.DataFrame:
+    """
+    Adds links from a link table saved by impute onto the rows of df, so
+    ratio of means can reuse them instead of calculating them.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe to impute.
+    link_table : pd.DataFrame
+        Link table with question number, strata, period and link columns.
+    question_no : str
+        Column name containing question number.
+    strata : str
+        Column name containing strata information (sic).
+    period : str
+        Column name containing time period.
+
+    Returns
+    -------
+    pd.DataFrame
+        df with the link table columns added.
+    """
+    keys = [question_no, strata, period]
+
+    links = map_lookup(df, link_table.set_index(keys), keys)
+
+    missing_links = links.isna().all(axis=1).sum()
+
+    if missing_links:
+        logger.warning(
+            f"{missing_links} rows have no link in the imputation link table, "
+            "their links will be missing"
+        )
+
+    return pd.concat([df, links], axis=1)
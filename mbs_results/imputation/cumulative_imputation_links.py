@@ -1,5 +1,12 @@
 import numpy as np
 
+from mbs_results.imputation.panel_index import get_panel_index, sort_panel
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 
 def get_cumulative_links(
     dataframe,
@@ -43,7 +50,56 @@ def get_cumulative_links(
         dataframe with imputation_group and
         cumulative_forward/backward_imputation_link column
     """
-    dataframe.sort_values([strata, reference, period], inplace=True)
+    if forward_or_backward == "f":
+        links = {"forward_link": imputation_link}
+    elif forward_or_backward == "b":
+        links = {"backward_link": imputation_link}
+
+    return get_forward_and_backward_cumulative_links(
+        dataframe, strata, reference, target, period, **links
+    )
+
+
+def get_forward_and_backward_cumulative_links(
+    dataframe,
+    strata,
+    reference,
+    target,
+    period,
+    forward_link=None,
+    backward_link=None,
+    **kwargs,
+):
+    """
+    Create cumulative forward and backward imputation links for multiple
+    consecutive periods without a return, sorting the dataframe and finding
+    imputation groups only once for both directions.
+
+    Parameters
+    ----------
+    dataframe : pandas.DataFrame
+    strata : str
+        column name containing strata information (sic)
+    reference : str
+        column name containing business reference id
+    target : str
+        column name containing target variable
+    period : str
+        column name containing time period
+    forward_link : str, optional
+        column name containing forward imputation links
+    backward_link : str, optional
+        column name containing backward imputation links
+    kwargs : mapping, optional
+        A dictionary of keyword arguments passed into func
+
+    Returns
+    -------
+    pandas.DataFrame
+        dataframe with imputation_group and a cumulative column for each
+        given imputation link
+    """
+    sort_panel(dataframe, [strata, reference, period], inplace=True)
     dataframe["missing_value"] = np.where(dataframe[target].isnull(), True, False)
 
     # TODO: These conditions are similar with the ones at flags, consider a fun for this
@@ -55,27 +111,123 @@ def get_cumulative_links(
         # is false
     )
 
-    strat_diff_con = dataframe[strata].diff(time_difference) != 0
+    panel_index = get_panel_index(dataframe, period, reference, strata)
 
-    reference_diff_con = dataframe[reference].diff(time_difference) != 0
+    group_start = (marker_diff_con | panel_index["panel_group_start"]).to_numpy()
 
-    dataframe["imputation_group"] = (
-        (marker_diff_con | strat_diff_con | reference_diff_con).astype("int").cumsum()
-    )
+    dataframe["imputation_group"] = group_start.astype("int").cumsum()
 
-    if forward_or_backward == "f":
-        dataframe["cumulative_" + imputation_link] = dataframe.groupby(
-            "imputation_group"
-        )[imputation_link].cumprod()
-    elif forward_or_backward == "b":
-        dataframe["cumulative_" + imputation_link] = (
-            dataframe[::-1].groupby("imputation_group")[imputation_link].cumprod()[::-1]
+    is_returned = dataframe[target].notnull().to_numpy()
+
+    for imputation_link, reverse in [(forward_link, False), (backward_link, True)]:
+        if imputation_link is None:
+            continue
+
+        cumulative_link = segmented_cumprod(
+            dataframe[imputation_link].to_numpy(dtype="float64"), group_start, reverse
         )
 
-    dataframe["cumulative_" + imputation_link] = np.where(
-        ~dataframe[target].isnull(),
-        np.nan,
-        dataframe["cumulative_" + imputation_link],
-    )
+        dataframe["cumulative_" + imputation_link] = np.where(
+            is_returned, np.nan, cumulative_link
+        )
 
     return dataframe
+
+
+def segmented_cumprod(
+    values: np.ndarray, segment_start: np.ndarray, reverse: bool = False
+) -> np.ndarray:
+    """
+    Cumulative product of values restarting at every segment, equivalent to
+    a groupby cumprod on sorted groups. Missing values are skipped and stay
+    missing, as in pandas.
+
+    Uses a numba compiled loop if numba is installed, otherwise a NumPy
+    kernel which multiplies all rows at the same position within their
+    segment at once.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Float values to multiply.
+    segment_start : np.ndarray
+        Boolean array, True for the first row of every segment.
+    reverse : bool, optional
+        If True the product runs from the last row of each segment backwards.
+
+    Returns
+    -------
+    np.ndarray
+        Cumulative product within each segment.
+    """
+    if len(values) == 0:
+        return values.astype("float64")
+
+    segment_start = np.asarray(segment_start, dtype=bool)
+
+    if reverse:
+        # Segment starts of the reversed array are the segment ends
+        segment_end = np.append(segment_start[1:], True)
+        return segmented_cumprod(values[::-1], segment_end[::-1])[::-1]
+
+    if njit is not None:
+        return _segmented_cumprod_numba(values, segment_start)
+
+    return _segmented_cumprod_numpy(values, segment_start)
+
+
+def _segmented_cumprod_numpy(
+    values: np.ndarray, segment_start: np.ndarray
+) -> np.ndarray:
+    """
+    NumPy kernel of segmented_cumprod. Rows are multiplied in the same order
+    as a sequential loop, so results are identical to groupby cumprod.
+    """
+    is_missing = np.isnan(values)
+    cumulative = np.where(is_missing, 1.0, values)
+
+    segment_start = segment_start.copy()
+    segment_start[0] = True
+
+    first_row = np.flatnonzero(segment_start)
+    length = np.diff(np.append(first_row, len(values)))
+
+    # Each position within segment is one multiply over all segments long
+    # enough to reach it, shorter segments are dropped as positions increase
+    position = 1
+    while True:
+        reaching = length > position
+        first_row, length = first_row[reaching], length[reaching]
+
+        if len(first_row) == 0:
+            break
+
+        rows = first_row + position
+        cumulative[rows] *= cumulative[rows - 1]
+        position += 1
+
+    cumulative[is_missing] = np.nan
+
+    return cumulative
+
+
+def _segmented_cumprod_loop(values: np.ndarray, segment_start: np.ndarray):
+    """Sequential kernel of segmented_cumprod, compiled with numba if installed."""
+    cumulative = np.empty(len(values))
+    accumulator = 1.0
+
+    for row in range(len(values)):
+        if segment_start[row]:
+            accumulator = 1.0
+
+        if np.isnan(values[row]):
+            cumulative[row] = np.nan
+        else:
+            accumulator *= values[row]
+            cumulative[row] = accumulator
+
+    return cumulative
+
+
+if njit is not None:
+    _segmented_cumprod_numba = njit(cache=True)(_segmented_cumprod_loop)
@@ -1,6 +1,8 @@
 import numpy as np  # noqa F401
 import pandas as pd  # noqa F401
 
+from mbs_results.imputation.panel_index import get_panel_index, same_segment, sort_panel
+
 
 def flag_matched_pair(
     df,
@@ -44,7 +46,8 @@ def flag_matched_pair(
         forward matched pairs and predictive target variable data column
     """
 
-    df = df.sort_values(by=[strata, reference, period])
+    # Shallow copy so new columns are not added to the input dataframe
+    df = sort_panel(df, [strata, reference, period]).copy(deep=False)
 
     if forward_or_backward == "b":
         time_difference = -time_difference
@@ -56,15 +59,12 @@ def flag_matched_pair(
         "actual_response",
     ] = None
 
+    panel_index = get_panel_index(df, period, reference, strata)
+
     df[f"{forward_or_backward}_match_{target}"] = (
-        df.groupby([strata, reference])
-        .shift(time_difference)["actual_response"]
-        .notnull()
-        .mul(df["actual_response"].notnull())
-        .mul(
-            df[period] - pd.DateOffset(months=time_difference)
-            == df.shift(time_difference)[period]
-        )
+        df["actual_response"].notnull()
+        & df["actual_response"].shift(time_difference).notnull()
+        & same_segment(panel_index["panel_segment_start"], time_difference)
     )
 
     df.drop("actual_response", axis=1, inplace=True)
@@ -0,0 +1,186 @@
+import time
+import tracemalloc
+from functools import wraps
+from typing import Callable, List
+
+import pandas as pd
+
+from mbs_results.imputation.imputation_flags import IMPUTATION_MARKER_DTYPE
+from mbs_results.utilities.outputs import write_csv_wrapper, write_json_wrapper
+
+
+def profile_imputation_step(
+    step: Callable, diagnostics: List[dict], question_no: str, marker: str
+) -> Callable:
+    """
+    Wraps an imputation step so each call appends one record of its
+    diagnostics to the diagnostics list.
+
+    A record contains the step name, question number, wall time, row counts
+    of the input and output and counts of each imputation marker in the
+    output, once markers have been generated. The question number is None if
+    the step imputes several question numbers at once, e.g. in single pass.
+    Peak memory allocated above the memory in use before the step is only
+    recorded if tracemalloc is already tracing, wall times then include the
+    tracing overhead. The step is returned unchanged if diagnostics is None.
+
+    Parameters
+    ----------
+    step : Callable
+        Imputation step, called with the dataframe as first argument.
+    diagnostics : List[dict]
+        List to append records to, or None to not profile.
+    question_no : str
+        Column name containing question number.
+    marker : str
+        Column name containing imputation markers.
+
+    Returns
+    -------
+    Callable
+        Step which records its diagnostics when called.
+    """
+    if diagnostics is None:
+        return step
+
+    @wraps(step)
+    def profiled_step(df: pd.DataFrame, *args, **kwargs) -> pd.DataFrame:
+        trace_memory = tracemalloc.is_tracing()
+
+        if trace_memory:
+            memory_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+
+        output = step(df, *args, **kwargs)
+
+        wall_time = time.perf_counter() - start
+
+        peak_memory_delta = (
+            tracemalloc.get_traced_memory()[1] - memory_before if trace_memory else None
+        )
+
+        diagnostics.append(
+            {
+                "step": step.__name__,
+                "question": get_single_question(df, question_no),
+                "wall_time_seconds": wall_time,
+                "peak_memory_delta_bytes": peak_memory_delta,
+                "rows_in": len(df),
+                "rows_out": len(output),
+                **{
+                    f"marker_{marker_value}": count
+                    for marker_value, count in count_markers(output, marker).items()
+                },
+            }
+        )
+
+        return output
+
+    return profiled_step
+
+
+def get_single_question(df: pd.DataFrame, question_no: str):
+    """
+    Returns the question number of df, None if df has no question number
+    column or several question numbers.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe passed to an imputation step.
+    question_no : str
+        Column name containing question number.
+
+    Returns
+    -------
+    Question number of all rows of df, or None.
+    """
+    if question_no not in df.columns:
+        return None
+
+    questions = df[question_no].unique()
+
+    return questions[0] if len(questions) == 1 else None
+
+
+def count_markers(df: pd.DataFrame, marker: str) -> dict:
+    """
+    Counts imputation markers, only once they have IMPUTATION_MARKER_DTYPE,
+    i.e. after they are generated.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe to count markers of.
+    marker : str
+        Column name containing imputation markers.
+
+    Returns
+    -------
+    dict
+        Count of each imputation marker, empty if markers are not generated.
+    """
+    if marker not in df.columns or df[marker].dtype != IMPUTATION_MARKER_DTYPE:
+        return {}
+
+    return {
+        marker_value: int(count)
+        for marker_value, count in df[marker].value_counts(sort=False).items()
+    }
+
+
+def export_imputation_diagnostics(
+    diagnostics: List[dict],
+    file_prefix: str,
+    import_platform: str = "network",
+    bucket_name: str = None,
+) -> list:
+    """
+    Writes imputation diagnostics records to a CSV and a JSON file.
+
+    Parameters
+    ----------
+    diagnostics : List[dict]
+        Records appended by steps wrapped with profile_imputation_step.
+    file_prefix : str
+        Path and name of the files without extension.
+    import_platform : str, optional
+        Either network or s3. The default is "network".
+    bucket_name : str, optional
+        The S3 bucket to write to when import_platform is s3.
+
+    Returns
+    -------
+    list
+        Paths of the CSV and JSON files.
+    """
+    diagnostics_df = pd.DataFrame(diagnostics)
+
+    marker_columns = [
+        column for column in diagnostics_df.columns if column.startswith("marker_")
+    ]
+    diagnostics_df[marker_columns] = (
+        diagnostics_df[marker_columns].fillna(0).astype(int)
+    )
+
+    csv_path = f"{file_prefix}.csv"
+    json_path = f"{file_prefix}.json"
+
+    write_csv_wrapper(
+        diagnostics_df, csv_path, import_platform, bucket_name, index=False
+    )
+
+    # Missing values, e.g. untraced memory, are written as JSON nulls
+    write_json_wrapper(
+        diagnostics_df.astype(object)
+        .where(diagnostics_df.notna(), None)
+        .to_dict(orient="records"),
+        json_path,
+        save_path="",
+        import_platform=import_platform,
+        bucket_name=bucket_name,
+    )
+
+    return [csv_path, json_path]
@@ -1,6 +1,116 @@
+from typing import List
+
 import numpy as np
 import pandas as pd
 
+from mbs_results.imputation.panel_index import get_panel_index, sort_panel
+
+# Imputation markers in hierarchy order, followed by the derived marker
+IMPUTATION_MARKERS = ["r", "mc", "fir", "bir", "fimc", "fic", "c", "d"]
+IMPUTATION_MARKER_DTYPE = pd.CategoricalDtype(IMPUTATION_MARKERS)
+
+
+def convert_to_imputation_marker(markers: pd.Series) -> pd.Series:
+    """
+    Converts imputation markers to lower case with IMPUTATION_MARKER_DTYPE, so
+    later comparisons are done on category codes instead of strings.
+
+    Parameters
+    ----------
+    markers : pd.Series
+        Imputation markers, any case.
+
+    Returns
+    -------
+    pd.Series
+        Imputation markers with IMPUTATION_MARKER_DTYPE.
+
+    Raises
+    ------
+    ValueError
+        If markers contains values which are not in IMPUTATION_MARKERS.
+    """
+    if markers.dtype == IMPUTATION_MARKER_DTYPE:
+        return markers
+
+    # Lower case is applied to the distinct markers instead of every row
+    markers = markers.astype("category")
+    lower_markers = markers.cat.categories.str.lower()
+
+    unknown_markers = set(lower_markers.dropna()) - set(IMPUTATION_MARKERS)
+
+    if unknown_markers:
+        raise ValueError(
+            f"{unknown_markers} are not valid imputation markers, "
+            f"use one of {IMPUTATION_MARKERS}"
+        )
+
+    # Missing markers have code -1, which takes the appended -1
+    marker_codes = np.append(
+        IMPUTATION_MARKER_DTYPE.categories.get_indexer(lower_markers), -1
+    )
+
+    return pd.Series(
+        pd.Categorical.from_codes(
+            marker_codes[markers.cat.codes.to_numpy()],
+            dtype=IMPUTATION_MARKER_DTYPE,
+        ),
+        index=markers.index,
+        name=markers.name,
+    )
+
+
+def is_imputation_marker(markers: pd.Series, values: List[str]) -> np.ndarray:
+    """
+    Returns True where markers is one of values, compared on category codes
+    of IMPUTATION_MARKER_DTYPE.
+
+    Parameters
+    ----------
+    markers : pd.Series
+        Imputation markers, converted with convert_to_imputation_marker if
+        they do not have IMPUTATION_MARKER_DTYPE.
+    values : List[str]
+        Imputation markers to look for, lower case.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array, False where markers is missing.
+    """
+    value_codes = IMPUTATION_MARKER_DTYPE.categories.get_indexer(values)
+
+    return np.isin(
+        convert_to_imputation_marker(markers).cat.codes.to_numpy(),
+        value_codes[value_codes >= 0],
+    )
+
+
+def create_imputed_and_derived_flag(df: pd.DataFrame, target: str) -> pd.Series:
+    """
+    Returns imputation markers of target, with 'd' where the value was derived
+    by constrains.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe with imputation markers and constrain_marker column.
+    target : str
+        Column name containing target variable.
+
+    Returns
+    -------
+    pd.Series
+        Imputed and derived flag with IMPUTATION_MARKER_DTYPE.
+    """
+    is_derived = (
+        df["constrain_marker"].astype(str).str.lower().str.contains("sum", regex=False)
+    )
+
+    return convert_to_imputation_marker(df[f"imputation_flags_{target}"]).where(
+        ~is_derived, "d"
+    )
+
 
 def generate_imputation_marker(
     df: pd.DataFrame,
@@ -70,14 +180,46 @@ def generate_imputation_marker(
     )
 
     select_cols = [f"{i}_flag_{target}" for i in flags]
-    first_condition_met = [np.where(i)[0][0] for i in df[select_cols].values]
-    df[f"imputation_flags_{target}"] = [flags[i] for i in first_condition_met]
+    df[f"imputation_flags_{target}"] = select_imputation_marker(
+        df[select_cols].to_numpy(), flags
+    )
     df.drop(columns=select_cols, inplace=True)
     df.drop(columns="fill_group", inplace=True)
 
     return df
 
 
+def select_imputation_marker(flag_matrix: np.ndarray, flags: list) -> pd.Categorical:
+    """
+    Selects the first flag which is True in each row of a boolean matrix, i.e.
+    the highest imputation method in the hierarchy which can be used.
+
+    Parameters
+    ----------
+    flag_matrix : np.ndarray
+        Boolean array with one row per record and one column per flag, in
+        hierarchy order.
+    flags : list
+        Imputation markers matching the columns of flag_matrix, must be in
+        IMPUTATION_MARKERS.
+
+    Returns
+    -------
+    pd.Categorical
+        Imputation marker for each row with IMPUTATION_MARKERS as categories,
+        missing if no flag is True.
+    """
+    flag_matrix = flag_matrix.astype(bool)
+
+    flag_codes = np.array([IMPUTATION_MARKERS.index(flag) for flag in flags])
+
+    codes = np.where(
+        flag_matrix.any(axis=1), flag_codes[flag_matrix.argmax(axis=1)], -1
+    )
+
+    return pd.Categorical.from_codes(codes, dtype=IMPUTATION_MARKER_DTYPE)
+
+
 def create_imputation_logical_columns(
     df: pd.DataFrame,
     target: str,
@@ -144,28 +286,32 @@ def create_imputation_logical_columns(
     # if target na but not back data period OR if backdata flag is 'r'
     df[f"r_flag_{target}"] = (df[target].notna() & ~df["is_backdata"]) | backdata_r_mask
 
+    # Rolling flags of all source columns are calculated in one pass
+    forward_columns = [target, auxiliary]
+
     if f"{target}_man" in df.columns:
         df[f"mc_flag_{target}"] = df[f"{target}_man"].notna()
+        forward_columns.append(f"{target}_man")
+
+    forward_flags = flag_rolling_impute_columns(
+        df, time_difference, forward_columns, fill_group
+    )
+    backward_flags = flag_rolling_impute_columns(
+        df, -time_difference, [target], fill_group
+    )
 
     df[f"fir_flag_{target}"] = (
-        flag_rolling_impute(df, time_difference, target, fill_group)
-        & ~df["is_backdata"]
+        forward_flags[target] & ~df["is_backdata"]
     ) | backdata_fir_mask
 
     df[f"bir_flag_{target}"] = (
-        (
-            flag_rolling_impute(df, -time_difference, target, fill_group)
-            & ~df["is_backdata"]
-        )
+        (backward_flags[target] & ~df["is_backdata"])
         | backdata_r_mask
         | backdata_bir_mask
     )
 
     if f"{target}_man" in df.columns:
-        df[f"fimc_flag_{target}"] = (
-            flag_rolling_impute(df, time_difference, f"{target}_man", fill_group)
-            | backdata_fimc_mask
-        )
+        df[f"fimc_flag_{target}"] = forward_flags[f"{target}_man"] | backdata_fimc_mask
 
         df = imputation_overlaps_mc(df, target, fill_group)
 
@@ -175,8 +321,7 @@ def create_imputation_logical_columns(
     df[f"c_flag_{target}"] = np.where(construction_conditions, True, False)
 
     df[f"fic_flag_{target}"] = (
-        flag_rolling_impute(df, time_difference, auxiliary, fill_group)
-        | backdata_fic_mask
+        forward_flags[auxiliary] | backdata_fic_mask
     ) & np.logical_not(prior_month_backdata_bir_mask)
 
     return df
@@ -188,19 +333,18 @@ def imputation_overlaps_mc(df, target, fill_group):
     manual construction is present
     e.g. r, fir, mc, fimc or c, mc, bir, r
 
+    Forward imputation flags are removed from a row if a row at or before it
+    in its fill group has both forward imputation and manual construction
+    flags, backward imputation flags if such a row is at or after it.
+
     Parameters
     ----------
     df : pd.Dataframe
         dataframe
     target : str
         Column name containing target variable.
-    period: str
-        Column name containing date variable.
-    reference : str
-        Column name containing business reference id.
-    strata : str
-        Column name containing strata information (sic).
-
+    fill_group : str
+        Column name containing fill group.
 
     Returns
     -------
@@ -209,26 +353,21 @@ def imputation_overlaps_mc(df, target, fill_group):
         imputation boolean columns
     """
 
-    for column in ["back_impute_overlaps_mc", "forward_impute_overlaps_mc"]:
-        direction_single_string = column[0]
-        imputation_marker_column = direction_single_string + f"ir_flag_{target}"
-        df[column] = np.where(
-            df[imputation_marker_column] & df[f"mc_flag_{target}"], False, None
-        )
-        if direction_single_string == "b":
-            df[column] = (df.groupby(fill_group)[column].bfill().astype(bool)).fillna(
-                True
-            )
-        elif direction_single_string == "f":
-            df[column] = (df.groupby(fill_group)[column].ffill().astype(bool)).fillna(
-                True
-            )
-
-        df[imputation_marker_column] = df[imputation_marker_column] & df[column]
-        df.drop(
-            columns=[column],
-            inplace=True,
+    for direction, forward in [("b", False), ("f", True)]:
+        imputation_marker_column = f"{direction}ir_flag_{target}"
+
+        overlaps_mc = (
+            df[imputation_marker_column] & df[f"mc_flag_{target}"]
+        ).to_numpy()
+
+        impute_overlaps_mc = is_available_in_fill_group(
+            overlaps_mc[:, np.newaxis], df[fill_group], forward
+        )[:, 0]
+
+        df[imputation_marker_column] = (
+            df[imputation_marker_column] & ~impute_overlaps_mc
         )
+
     return df
 
 
@@ -249,8 +388,6 @@ def flag_rolling_impute(
         lookup distance for matched pairs
     target : str
         Column name containing target variable.
-    period: str
-        Column name containing date variable.
     fill_group : str
         Column name containing fill group. This is used to apply ffill or
         bfill.
@@ -259,24 +396,98 @@ def flag_rolling_impute(
     -------
     pd.Series
     """
+    return flag_rolling_impute_columns(df, time_difference, [target], fill_group)[
+        target
+    ]
 
-    if time_difference < 0:
-        boolean_column = (
-            df.groupby(["fill_group"])[target]
-            .bfill()
-            .notnull()
-            .mul(df["fill_group"] == df.shift(time_difference)["fill_group"])
-        )
 
-    elif time_difference > 0:
-        boolean_column = (
-            df.groupby(["fill_group"])[target]
-            .ffill()
-            .notnull()
-            .mul(df["fill_group"] == df.shift(time_difference)["fill_group"])
+def flag_rolling_impute_columns(
+    df: pd.DataFrame, time_difference: int, columns: list, fill_group: str
+) -> pd.DataFrame:
+    """
+    Creates logical values for whether rolling imputation can be done from
+    each of the given columns, in one pass over all columns.
+
+    A row can be imputed forward (time_difference > 0) if the row
+    time_difference rows before it is in its fill group and the column has a
+    value at or before the row within the fill group, backward
+    (time_difference < 0) likewise after the row.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        DataFrame sorted so that fill groups are contiguous.
+    time_difference: int
+        lookup distance for matched pairs, negative for backward imputation.
+    columns : list
+        Column names of the values to impute from.
+    fill_group : str
+        Column name containing fill group.
+
+    Returns
+    -------
+    pd.DataFrame
+        Boolean flag for each of the columns, same index as df.
+    """
+    same_group = (
+        (df[fill_group] == df[fill_group].shift(time_difference))
+        .to_numpy()
+        .reshape(-1, 1)
+    )
+
+    available = is_available_in_fill_group(
+        df[columns].notna().to_numpy(), df[fill_group], time_difference > 0
+    )
+
+    return pd.DataFrame(available & same_group, index=df.index, columns=columns)
+
+
+def is_available_in_fill_group(
+    available: np.ndarray, fill_group: pd.Series, forward: bool
+) -> np.ndarray:
+    """
+    Checks for each row and column if available is True in the same fill group
+    at or before the row (forward) or at or after the row (backward).
+
+    Equivalent to a grouped forward or backward fill of the available values
+    followed by a not null check, using the position of the last (next)
+    available row instead.
+
+    Parameters
+    ----------
+    available : np.ndarray
+        Boolean array with one row per record and one column per value.
+    fill_group : pd.Series
+        Fill group of each row, fill groups must be contiguous.
+    forward : bool
+        True to look at or before each row, False to look at or after.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array with the same shape as available.
+    """
+    groups = fill_group.to_numpy()
+    position = np.arange(len(groups))
+    is_new_group = np.empty(len(groups), dtype=bool)
+    is_new_group[:1] = True
+    is_new_group[1:] = groups[1:] != groups[:-1]
+
+    if forward:
+        group_start = np.maximum.accumulate(np.where(is_new_group, position, 0))
+        last_available = np.maximum.accumulate(
+            np.where(available, position[:, np.newaxis], -1), axis=0
         )
+        return last_available >= group_start[:, np.newaxis]
 
-    return boolean_column
+    is_group_end = np.append(is_new_group[1:], True)
+    group_end = np.minimum.accumulate(
+        np.where(is_group_end, position, len(groups))[::-1]
+    )[::-1]
+    next_available = np.minimum.accumulate(
+        np.where(available, position[:, np.newaxis], len(groups))[::-1], axis=0
+    )[::-1]
+    return next_available <= group_end[:, np.newaxis]
 
 
 def create_fill_group(
@@ -316,17 +527,14 @@ def create_fill_group(
     -------
     pd.DataFrame
     """
-    df.sort_values([reference, imputation_class, period], inplace=True)
+    sort_panel(df, [imputation_class, reference, period], inplace=True)
 
     mc_exists_rule = (
         (df[f"{target}_man"].notna()) if f"{target}_man" in df.columns else False
     )
 
-    df["fill_group"] = (
-        (df[period] - pd.DateOffset(months=1) != df.shift(1)[period])
-        | (df[imputation_class].diff(1) != 0)
-        | (df[reference].diff(1) != 0)
-        | mc_exists_rule
-    ).cumsum()
+    panel_index = get_panel_index(df, period, reference, imputation_class)
+
+    df["fill_group"] = (panel_index["panel_segment_start"] | mc_exists_rule).cumsum()
 
     return df
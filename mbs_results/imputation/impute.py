@@ -1,7 +1,25 @@
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, List
+
 import pandas as pd
 
+from mbs_results.imputation.batched_imputation import ratio_of_means_batched
+from mbs_results.imputation.calculate_imputation_link import merge_imputation_link_table
+from mbs_results.imputation.imputation_diagnostics import export_imputation_diagnostics
+from mbs_results.imputation.imputation_flags import create_imputed_and_derived_flag
+from mbs_results.imputation.incremental_imputation import ratio_of_means_incremental
+from mbs_results.imputation.link_filter import flag_rows_to_ignore
 from mbs_results.imputation.ratio_of_means import ratio_of_means
 from mbs_results.utilities.constrains import constrain
+from mbs_results.utilities.inputs import read_csv_wrapper
+from mbs_results.utilities.lookups import map_lookup
+from mbs_results.utilities.outputs import save_df
+from mbs_results.utilities.utils import (
+    convert_column_to_datetime,
+    convert_datetime_to_int,
+)
 
 
 def impute(
@@ -14,8 +32,34 @@ def impute(
     ----------
     dataframe : pd.DataFrame
         dataframe with both contributors and responses from snapshot
+    manual_constructions : pd.DataFrame
+        Dataframe with values which are used for manual construction.
     config : dict
-        config file containing column names and manual construction path
+        config file containing column names and manual construction path.
+        Optional key `imputation_engine` selects how ratio of means is run,
+        `per_question` (default) runs it once for each question number,
+        `single_pass` runs it once over all question numbers.
+        Optional key `imputation_workers` runs the `per_question` engine in a
+        pool of that many processes.
+        Optional key `imputation_links_path` is the path of an imputation links
+        table saved by a previous run, its links are used instead of
+        calculating them.
+        Optional key `export_imputation_links` saves the calculated links,
+        default link flags and match counts by question number, imputation
+        class and period to `imputation_links`.
+        Optional key `imputation_batch_size` imputes that many question and
+        imputation class partitions at a time.
+        Optional key `imputation_diagnostics` exports wall time, row counts
+        and imputation marker counts of each imputation step and question
+        number to the output path, optional key
+        `imputation_diagnostics_memory` also traces peak memory.
+        Optional key `incremental_imputation_path` is a local folder where
+        the imputed rows and links are cached, later runs only impute the rows
+        whose output can differ from the cached run.
+    filter_df : pd.DataFrame, optional
+        Dataframe with values to exclude from imputation links. Rows are
+        flagged once for all question numbers and, in debug mode, the flagged
+        rows are saved to `imputation_filtered_rows`.
 
     Returns
     -------
@@ -23,25 +67,77 @@ def impute(
         post imputation dataframe, values have been derived and constrained following
         imputation
     """
-    post_impute = dataframe.groupby(config["question_no"], group_keys=False)[
-        dataframe.columns
-    ].apply(
-        lambda df: ratio_of_means(
-            df=df,
-            manual_constructions=manual_constructions,
-            reference=config["reference"],
-            target=config["target"],
-            period=config["period"],
-            current_period=config["current_period"],
-            revision_window=config["revision_window"],
-            question_no=config["question_no"],
-            strata="imputation_class",
-            auxiliary=config["auxiliary_converted"],
-            filters=filter_df,
+    imputation_engine = config.get("imputation_engine", "per_question")
+
+    imputation_function = wrap_imputation_function(
+        get_imputation_function(imputation_engine, config.get("imputation_workers")),
+        config,
+    )
+
+    if filter_df is not None:
+        # Flagged once here instead of once per question in ratio_of_means
+        dataframe = flag_rows_to_ignore(dataframe, filter_df)
+
+        save_df(
+            dataframe.loc[dataframe["ignore_from_link"]],
+            "imputation_filtered_rows",
+            config,
+            config["debug_mode"],
         )
+
+    rom_arguments = dict(
+        manual_constructions=manual_constructions,
+        reference=config["reference"],
+        target=config["target"],
+        period=config["period"],
+        current_period=config["current_period"],
+        revision_window=config["revision_window"],
+        question_no=config["question_no"],
+        strata="imputation_class",
+        auxiliary=config["auxiliary_converted"],
     )
 
-    post_impute["period"] = post_impute["period"].dt.strftime("%Y%m").astype("int")
+    # Link tables are only collected if they are exported
+    rom_arguments["link_tables"] = [] if config.get("export_imputation_links") else None
+
+    if config.get("imputation_links_path"):
+        link_table = read_csv_wrapper(
+            config["imputation_links_path"], config["platform"], config["bucket"]
+        )
+        link_table[config["period"]] = convert_column_to_datetime(
+            link_table[config["period"]]
+        )
+
+        dataframe = merge_imputation_link_table(
+            dataframe,
+            link_table,
+            config["question_no"],
+            "imputation_class",
+            config["period"],
+        )
+
+        rom_arguments["imputation_links"] = {
+            link: link
+            for link in [
+                f"f_link_{config['target']}",
+                f"b_link_{config['target']}",
+                "construction_link",
+            ]
+        }
+
+    if config.get("imputation_diagnostics"):
+        post_impute = impute_with_diagnostics(
+            imputation_function, dataframe, config, **rom_arguments
+        )
+
+    else:
+        post_impute = imputation_function(dataframe, **rom_arguments)
+
+    post_impute["period"] = convert_datetime_to_int(post_impute["period"])
+
+    if rom_arguments["link_tables"]:
+        save_imputation_link_table(rom_arguments["link_tables"], config)
+
     post_impute = post_impute.reset_index(drop=True)  # remove groupby leftovers
     post_impute = post_impute[~post_impute["is_backdata"]]  # remove backdata
     post_impute.drop(columns=["is_backdata"], inplace=True)
@@ -56,13 +152,8 @@ def impute(
         sic=config["sic"],
     )
 
-    post_constrain["imputed_and_derived_flag"] = post_constrain.apply(
-        lambda row: (
-            "d"
-            if "sum" in str(row["constrain_marker"]).lower()
-            else row[f"imputation_flags_{config['target']}"]
-        ),
-        axis=1,
+    post_constrain["imputed_and_derived_flag"] = create_imputed_and_derived_flag(
+        post_constrain, config["target"]
     )
 
     # Added reverse mapping for idbr formtype. Needed for SE and other outputs
@@ -74,3 +165,426 @@ def impute(
     )
 
     return post_constrain
+
+
+def impute_with_diagnostics(
+    imputation_function: Callable,
+    dataframe: pd.DataFrame,
+    config: dict,
+    **rom_arguments,
+) -> pd.DataFrame:
+    """
+    Runs imputation collecting diagnostics of each imputation step and
+    exports them to `imputation_diagnostics_<run_id>` in the output path.
+
+    Memory is only traced if `imputation_diagnostics_memory` is set in the
+    config, as tracing slows down every step and so inflates wall times.
+
+    Parameters
+    ----------
+    imputation_function : Callable
+        Function which runs ratio of means for a dataframe.
+    dataframe : pd.DataFrame
+        dataframe with all question numbers to impute.
+    config : dict
+        config file with output path, platform, bucket and run id.
+    rom_arguments : mapping
+        Remaining keyword arguments passed to imputation_function.
+
+    Returns
+    -------
+    pd.DataFrame
+        Output of imputation_function.
+    """
+    diagnostics = []
+
+    trace_memory = config.get("imputation_diagnostics_memory") and (
+        not tracemalloc.is_tracing()
+    )
+
+    if trace_memory:
+        tracemalloc.start()
+
+    try:
+        post_impute = imputation_function(
+            dataframe, diagnostics=diagnostics, **rom_arguments
+        )
+
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    export_imputation_diagnostics(
+        diagnostics,
+        config["output_path"] + f"imputation_diagnostics_{config['run_id']}",
+        config["platform"],
+        config["bucket"],
+    )
+
+    return post_impute
+
+
+def wrap_imputation_function(imputation_function: Callable, config: dict) -> Callable:
+    """
+    Wraps an imputation function to impute in batches or incrementally if
+    set in the config.
+
+    Parameters
+    ----------
+    imputation_function : Callable
+        Function which runs ratio of means for a dataframe, see
+        get_imputation_function.
+    config : dict
+        config file with the optional `imputation_batch_size` and
+        `incremental_imputation_path` keys.
+
+    Returns
+    -------
+    Callable
+        Function which runs ratio of means for a dataframe.
+
+    Raises
+    ------
+    ValueError
+        If `incremental_imputation_path` is set together with
+        `imputation_links_path`.
+    """
+    if config.get("imputation_batch_size"):
+        imputation_function = partial(
+            ratio_of_means_batched,
+            imputation_function=imputation_function,
+            batch_size=config["imputation_batch_size"],
+        )
+
+    if config.get("incremental_imputation_path"):
+        if config.get("imputation_links_path"):
+            raise ValueError(
+                "imputation_links_path and incremental_imputation_path can not be "
+                "used together, links are reused from the incremental imputation "
+                "cache"
+            )
+
+        imputation_function = partial(
+            ratio_of_means_incremental,
+            cache_path=config["incremental_imputation_path"],
+            imputation_function=imputation_function,
+        )
+
+    return imputation_function
+
+
+def get_imputation_function(
+    imputation_engine: str, imputation_workers: int = None
+) -> Callable:
+    """
+    Returns the function which runs ratio of means for all question numbers.
+
+    Parameters
+    ----------
+    imputation_engine : str
+        `per_question` or `single_pass`.
+    imputation_workers : int, optional
+        Number of processes for the `per_question` engine, runs serially if
+        not given.
+
+    Returns
+    -------
+    Callable
+        Function called with the dataframe and ratio of means arguments.
+
+    Raises
+    ------
+    ValueError
+        If imputation_engine is not accepted.
+    """
+    if imputation_engine == "single_pass":
+        return ratio_of_means_single_pass
+
+    elif imputation_engine == "per_question" and imputation_workers:
+        return partial(ratio_of_means_parallel, imputation_workers=imputation_workers)
+
+    elif imputation_engine == "per_question":
+        return ratio_of_means_per_question
+
+    raise ValueError(
+        f"""{imputation_engine} is not an accepted imputation_engine,
+        use either per_question or single_pass"""
+    )
+
+
+def ratio_of_means_per_question(
+    df: pd.DataFrame, question_no: str, **rom_arguments
+) -> pd.DataFrame:
+    """
+    Runs ratio of means separately for each question number.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe with all question numbers to impute.
+    question_no : str
+        Column name containing question number.
+    rom_arguments : mapping
+        Remaining keyword arguments passed to ratio_of_means.
+
+    Returns
+    -------
+    pd.DataFrame
+        Output of ratio_of_means for all question numbers.
+    """
+    return df.groupby(question_no, group_keys=False)[df.columns].apply(
+        lambda question_df: ratio_of_means(
+            df=question_df, question_no=question_no, **rom_arguments
+        )
+    )
+
+
+def ratio_of_means_single_pass(
+    df: pd.DataFrame,
+    question_no: str,
+    strata: str,
+    link_tables: List[pd.DataFrame] = None,
+    link_table: pd.DataFrame = None,
+    **rom_arguments,
+) -> pd.DataFrame:
+    """
+    Runs ratio of means once for all question numbers instead of once per
+    question number.
+
+    Every imputation step groups by strata (and reference), so a numeric code
+    for each question number and strata combination is used as the strata.
+    The frame is then sorted once by (question number, strata, reference,
+    period) and every step runs over all questions in one vectorised pass.
+    Links, flags and imputed values are identical to running ratio of means
+    separately for each question number.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe with all question numbers to impute.
+    question_no : str
+        Column name containing question number.
+    strata : str
+        Column name containing strata information (imputation class).
+    link_tables : List[pd.DataFrame], optional
+        If given, the link table is appended to it, indexed by strata instead
+        of the question number and strata code.
+    link_table : pd.DataFrame, optional
+        Links with question number, strata and period columns which replace
+        the calculated links, see ratio_of_means.
+    rom_arguments : mapping
+        Remaining keyword arguments passed to ratio_of_means.
+
+    Returns
+    -------
+    pd.DataFrame
+        Output of ratio_of_means for all question numbers, sorted by question
+        number, strata, reference and period.
+    """
+    question_strata = f"{question_no}_{strata}"
+
+    df = df.copy()
+    df[question_strata] = df.groupby([question_no, strata]).ngroup()
+
+    question_link_tables = None if link_tables is None else []
+
+    if link_table is not None:
+        strata_codes = df.groupby([question_no, strata])[[question_strata]].first()
+
+        link_table = (
+            link_table.assign(
+                **map_lookup(link_table, strata_codes, [question_no, strata])
+            )
+            .dropna(subset=question_strata)
+            .astype({question_strata: df[question_strata].dtype})
+            .drop(columns=strata)
+        )
+
+    post_impute = ratio_of_means(
+        df=df,
+        question_no=question_no,
+        strata=question_strata,
+        link_tables=question_link_tables,
+        link_table=link_table,
+        **rom_arguments,
+    )
+
+    if link_tables is not None:
+        strata_lookup = df.groupby(question_strata)[strata].first()
+
+        link_tables.extend(
+            link_table.rename(
+                index=strata_lookup.to_dict(), level=question_strata
+            ).rename_axis(index={question_strata: strata})
+            for link_table in question_link_tables
+        )
+
+    return post_impute.drop(columns=question_strata)
+
+
+def ratio_of_means_parallel(
+    df: pd.DataFrame,
+    imputation_workers: int,
+    question_no: str,
+    manual_constructions: pd.DataFrame = None,
+    filters: pd.DataFrame = None,
+    diagnostics: List[dict] = None,
+    link_tables: List[pd.DataFrame] = None,
+    link_table: pd.DataFrame = None,
+    **rom_arguments,
+) -> pd.DataFrame:
+    """
+    Runs ratio of means for each question number in a pool of processes.
+
+    Question numbers are independent until constrains are applied, so each
+    question is sent to a worker together with only its own manual
+    constructions, filters and links. Results are concatenated in question number
+    order, giving the same output as the serial groupby apply.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe with all question numbers to impute.
+    imputation_workers : int
+        Maximum number of worker processes.
+    question_no : str
+        Column name containing question number.
+    manual_constructions : pd.DataFrame, optional
+        Dataframe with values which are used for manual construction.
+    filters : pd.DataFrame, optional
+        Dataframe with values to exclude from imputation method.
+    diagnostics : List[dict], optional
+        If given, diagnostics of imputation steps are collected from the
+        workers and appended to it.
+    link_tables : List[pd.DataFrame], optional
+        If given, link tables are collected from the workers and appended to
+        it.
+    link_table : pd.DataFrame, optional
+        Links with question number, strata and period columns which replace
+        the calculated links, see ratio_of_means.
+    rom_arguments : mapping
+        Remaining keyword arguments passed to ratio_of_means.
+
+    Returns
+    -------
+    pd.DataFrame
+        Output of ratio_of_means for all question numbers.
+    """
+    collectors = {
+        name: collector
+        for name, collector in [
+            ("diagnostics", diagnostics),
+            ("link_tables", link_tables),
+        ]
+        if collector is not None
+    }
+
+    worker = (
+        partial(ratio_of_means_collected, collect=list(collectors))
+        if collectors
+        else ratio_of_means
+    )
+
+    with ProcessPoolExecutor(max_workers=imputation_workers) as executor:
+        futures = [
+            executor.submit(
+                worker,
+                df=question_df,
+                question_no=question_no,
+                manual_constructions=subset_question(
+                    manual_constructions, question_no, question
+                ),
+                filters=subset_question(filters, question_no, question),
+                link_table=subset_question(link_table, question_no, question),
+                **rom_arguments,
+            )
+            for question, question_df in df.groupby(question_no)
+        ]
+
+        # Collecting in submission order keeps the output deterministic
+        results = [future.result() for future in futures]
+
+    if collectors:
+        for _, collected in results:
+            for name, collector in collectors.items():
+                collector.extend(collected[name])
+
+        results = [output for output, _ in results]
+
+    return pd.concat(results)
+
+
+def ratio_of_means_collected(collect: List[str], **rom_arguments) -> tuple:
+    """
+    Runs ratio of means and returns the lists it appended to with the output,
+    so diagnostics and link tables can be returned from worker processes.
+
+    Parameters
+    ----------
+    collect : List[str]
+        Names of the ratio_of_means list arguments to collect, `diagnostics`
+        and/or `link_tables`.
+    rom_arguments : mapping
+        Keyword arguments passed to ratio_of_means.
+
+    Returns
+    -------
+    tuple
+        Output of ratio_of_means and dictionary of the collected lists.
+    """
+    collected = {name: [] for name in collect}
+
+    return ratio_of_means(**collected, **rom_arguments), collected
+
+
+def save_imputation_link_table(link_tables: List[pd.DataFrame], config: dict):
+    """
+    Saves link tables collected from ratio of means to `imputation_links`,
+    one row per question number, imputation class and period, so reruns can
+    load them with `imputation_links_path` instead of recalculating them.
+
+    Parameters
+    ----------
+    link_tables : List[pd.DataFrame]
+        Link tables indexed by imputation class and period, with a question
+        number column.
+    config : dict
+        config file containing column names, output path and run id.
+    """
+    keys = [config["question_no"], "imputation_class", config["period"]]
+
+    link_table = pd.concat(link_tables).reset_index()
+    link_table[config["period"]] = convert_datetime_to_int(link_table[config["period"]])
+
+    save_df(
+        link_table[keys + link_table.columns.difference(keys, sort=False).tolist()]
+        .sort_values(keys)
+        .reset_index(drop=True),
+        "imputation_links",
+        config,
+    )
+
+
+def subset_question(df: pd.DataFrame, question_no: str, question: int) -> pd.DataFrame:
+    """
+    Returns rows of df for one question number, df is returned unchanged if
+    it is None or does not have a question number column.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe to subset, e.g. manual constructions or filters.
+    question_no : str
+        Column name containing question number.
+    question : int
+        Question number to keep.
+
+    Returns
+    -------
+    pd.DataFrame
+        Rows of df for the given question number.
+    """
+    if df is None or question_no not in df.columns:
+        return df
+
+    return df.loc[df[question_no] == question]
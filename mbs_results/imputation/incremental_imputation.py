@@ -0,0 +1,1021 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+from pandas.util import hash_pandas_object
+
+from mbs_results.imputation.imputation_flags import (
+    convert_to_imputation_marker,
+    is_imputation_marker,
+)
+from mbs_results.imputation.link_filter import flag_rows_to_ignore
+from mbs_results.imputation.ratio_of_means import (
+    calculate_back_data_period,
+    get_imputation_columns,
+)
+from mbs_results.utilities.lookups import map_lookup
+from mbs_results.utilities.utils import convert_column_to_datetime, period_to_ordinal
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached files or the reuse rules change, so old caches are
+# not read
+INCREMENTAL_CACHE_VERSION = 1
+
+# Month ordinal bound used for ranges without a start or end
+UNBOUNDED = 2**31 - 1
+
+
+def ratio_of_means_incremental(
+    df: pd.DataFrame,
+    cache_path: str,
+    imputation_function: Callable,
+    question_no: str,
+    strata: str,
+    target: str,
+    period: str,
+    reference: str,
+    auxiliary: str,
+    current_period: int,
+    revision_window: int,
+    manual_constructions: pd.DataFrame = None,
+    filters: pd.DataFrame = None,
+    link_tables: List[pd.DataFrame] = None,
+    **rom_arguments,
+) -> pd.DataFrame:
+    """
+    Runs ratio of means only for the rows whose output can differ from the
+    run which wrote the cache, other rows and links are taken from the cache.
+
+    The columns used by ratio of means of every input row are hashed with
+    its manual construction and back data flag. Rows whose hash changed, or
+    which were added or removed since the cached run, change the links of
+    their strata in their own and adjacent periods, these links are
+    recalculated and all other links are reused. A row is imputed again if
+    such a change is within its dependency range, see impute_changed_rows, or
+    if its other columns changed. The rows of these ranges are imputed with
+    the reused links replacing the calculated links, and only the rows which
+    could change are taken from that output.
+
+    All rows are imputed, and the cache is rewritten, if there is no cache,
+    if the columns, manual construction columns or run arguments other than
+    current_period and revision_window changed, or if question number,
+    reference and period do not identify rows.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe with all question numbers to impute.
+    cache_path : str
+        Local folder of the cache, created if it does not exist.
+    imputation_function : Callable
+        Function which runs ratio of means for a dataframe, called with the
+        ratio of means arguments, link_tables and link_table.
+    question_no : str
+        Column name containing question number.
+    strata : str
+        Column name containing strata information (imputation class).
+    target : str
+        Column name of values to be imputed.
+    period : str
+        Column name containing datetime information.
+    reference : str
+        Column name of unique Identifier.
+    auxiliary : str
+        Column name containing auxiliary information (sic).
+    current_period: int
+        Value with current period to be imputed as int.
+    revision_window: int
+        Value containing the amount of periods for imputation.
+    manual_constructions : pd.DataFrame, optional
+        Dataframe with values which are used for manual construction.
+    filters : pd.DataFrame, optional
+        Dataframe with values to exclude from imputation links, rows are
+        flagged once before hashing.
+    link_tables : List[pd.DataFrame], optional
+        If given, the link table of all question numbers, strata and periods,
+        reused and recalculated, is appended to it.
+    rom_arguments : mapping
+        Remaining keyword arguments passed to imputation_function.
+
+    Returns
+    -------
+    pd.DataFrame
+        Output of ratio_of_means for all question numbers, sorted by question
+        number, strata, reference and period.
+    """
+    if filters is not None:
+        df = flag_rows_to_ignore(df, filters)
+
+    rom_arguments = dict(
+        question_no=question_no,
+        strata=strata,
+        target=target,
+        period=period,
+        reference=reference,
+        auxiliary=auxiliary,
+        current_period=current_period,
+        revision_window=revision_window,
+        manual_constructions=manual_constructions,
+        **rom_arguments,
+    )
+
+    rows = create_row_table(
+        df,
+        back_data_period=calculate_back_data_period(current_period, revision_window),
+        **rom_arguments,
+    )
+
+    keys = [question_no, reference, period]
+
+    if rows.duplicated(subset=keys).any() or not df.index.is_unique:
+        logger.warning(
+            f"{keys} or the index do not identify rows, all rows are imputed "
+            "without the incremental imputation cache"
+        )
+        return sort_imputed_rows(
+            imputation_function(df, link_tables=link_tables, **rom_arguments),
+            rom_arguments,
+        )
+
+    arguments_hash = hash_imputation_arguments(df, **rom_arguments)
+
+    cache = read_incremental_cache(cache_path, arguments_hash)
+
+    post_impute = None
+
+    if cache is not None:
+        post_impute, link_table = impute_changed_rows(
+            df, rows, cache, imputation_function, rom_arguments
+        )
+
+    if post_impute is None:
+        collected_link_tables = []
+
+        post_impute = sort_imputed_rows(
+            imputation_function(df, link_tables=collected_link_tables, **rom_arguments),
+            rom_arguments,
+        )
+
+        link_table = pd.concat(collected_link_tables).reset_index()
+
+    write_incremental_cache(
+        cache_path,
+        arguments_hash,
+        imputed=post_impute,
+        rows=rows.drop(columns=["is_response", "has_auxiliary"]),
+        links=link_table,
+    )
+
+    if link_tables is not None:
+        link_tables.append(link_table.set_index([strata, period]))
+
+    return post_impute
+
+
+def impute_changed_rows(
+    df: pd.DataFrame,
+    rows: pd.DataFrame,
+    cache: dict,
+    imputation_function: Callable,
+    rom_arguments: dict,
+) -> tuple:
+    """
+    Imputes the rows of df whose output can differ from the cached run and
+    takes the other rows from the cached output.
+
+    Links of a strata and period only depend on the rows of that and the
+    adjacent periods in the strata, so links with a changed row within one
+    period are recalculated and all other links are reused. A row is imputed
+    again if a changed row is within its dependency range in its question
+    number and strata, see find_dependency_ranges, which covers the changed
+    rows of its chain and of the links it uses.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe with all question numbers to impute.
+    rows : pd.DataFrame
+        Row table of df from create_row_table.
+    cache : dict
+        Cached imputed rows, row table and links from read_incremental_cache.
+    imputation_function : Callable
+        Function which runs ratio of means for a dataframe.
+    rom_arguments : dict
+        Ratio of means arguments.
+
+    Returns
+    -------
+    tuple
+        Output of ratio_of_means for all rows and the link table of all
+        question numbers, strata and periods, both None if the cached output
+        does not have all reused rows.
+    """
+    question_no, strata, reference, period = (
+        rom_arguments[column]
+        for column in ["question_no", "strata", "reference", "period"]
+    )
+    keys = [question_no, reference, period]
+
+    changes, is_updated = find_changed_rows(rows, cache["rows"], keys, strata)
+
+    (chain_codes,) = group_codes([rows], [question_no, strata, reference])
+    link_codes, change_codes = group_codes([rows, changes], [question_no, strata])
+
+    # Barriers also need no hazard in the cached run, rows which are not in
+    # the cached run are changed rows themselves
+    cached_hazard = map_lookup(rows, cache["rows"].set_index(keys), keys)[
+        "manual_construction_hazard"
+    ]
+    is_forward_barrier = (
+        rows["is_response"]
+        & rows["has_auxiliary"]
+        & ~rows["manual_construction_hazard"]
+        & cached_hazard.eq(False)
+    ).to_numpy()
+
+    period_ordinal = rows["period_ordinal"].to_numpy()
+    chain_order = np.lexsort((period_ordinal, chain_codes))
+
+    lower, upper = find_dependency_ranges(
+        chain_codes[chain_order],
+        period_ordinal[chain_order],
+        rows["is_response"].to_numpy()[chain_order],
+        is_forward_barrier[chain_order],
+    )
+
+    # Rows with missing strata are never linked to other rows
+    missing_strata = rows[strata].isna().to_numpy()[chain_order]
+    lower = np.where(missing_strata, period_ordinal[chain_order], lower)
+    upper = np.where(missing_strata, period_ordinal[chain_order], upper)
+
+    # Links within a range are only used between the responses or barriers
+    # which bound it, so changes in the strata within the range cover both
+    # the changed rows of the chain and the changed links
+    is_changed = (
+        missing_strata
+        | is_updated[chain_order]
+        | count_in_ranges(
+            change_codes,
+            changes["period_ordinal"].to_numpy(),
+            link_codes[chain_order],
+            lower,
+            upper,
+        ).astype(bool)
+    )
+
+    # Rows whose dependency ranges cover a changed row, and the rows which
+    # the recalculated links are calculated from, are imputed together
+    is_imputed = np.zeros(len(rows), dtype=bool)
+    is_imputed[chain_order] = cover_ranges(
+        chain_codes[chain_order],
+        period_ordinal[chain_order],
+        lower[is_changed],
+        upper[is_changed],
+        chain_codes[chain_order][is_changed],
+    )
+    is_imputed |= is_near_change(
+        rows, changes, [question_no, strata], period_ordinal, 2
+    )
+
+    changed_rows = np.sort(chain_order[is_changed])
+    imputed_rows = np.flatnonzero(is_imputed)
+
+    cached_links = cache["links"]
+    is_recalculated = is_near_change(
+        cached_links,
+        changes,
+        [question_no, strata],
+        period_to_ordinal(cached_links[period]).to_numpy(),
+        1,
+    )
+
+    logger.info(
+        f"Incremental imputation recalculating {len(changed_rows)} of {len(rows)} "
+        f"rows and {is_recalculated.sum()} of {len(cached_links)} links, imputing "
+        f"{len(imputed_rows)} rows"
+    )
+
+    cached_output = cache["imputed"]
+    reused = pd.MultiIndex.from_frame(cached_output[keys]).isin(
+        pd.MultiIndex.from_frame(rows[keys].drop(index=changed_rows))
+    )
+
+    if reused.sum() != len(rows) - len(changed_rows):
+        logger.warning("Cached imputation output is incomplete, all rows are imputed")
+        return None, None
+
+    outputs = [cached_output.loc[reused]]
+    links = [cached_links.loc[~is_recalculated]]
+
+    if len(imputed_rows):
+        collected_link_tables = []
+
+        imputed = imputation_function(
+            df.iloc[imputed_rows],
+            link_tables=collected_link_tables,
+            link_table=links[0],
+            **rom_arguments,
+        )
+
+        outputs.append(
+            imputed.loc[
+                pd.MultiIndex.from_frame(imputed[keys]).isin(
+                    pd.MultiIndex.from_frame(rows[keys].take(changed_rows))
+                )
+            ]
+        )
+
+        recalculated_links = pd.concat(collected_link_tables).reset_index()
+        links.append(
+            recalculated_links.loc[
+                is_near_change(
+                    recalculated_links,
+                    changes,
+                    [question_no, strata],
+                    period_to_ordinal(recalculated_links[period]).to_numpy(),
+                    1,
+                ),
+                cached_links.columns,
+            ]
+        )
+
+    post_impute = sort_imputed_rows(pd.concat(outputs), rom_arguments)
+
+    return post_impute, pd.concat(links, ignore_index=True)
+
+
+def sort_imputed_rows(df: pd.DataFrame, rom_arguments: dict) -> pd.DataFrame:
+    """Sorts rows by question number, strata, reference and period."""
+    return df.sort_values(
+        [
+            rom_arguments[column]
+            for column in ["question_no", "strata", "reference", "period"]
+        ],
+        kind="stable",
+    ).reset_index(drop=True)
+
+
+def create_row_table(
+    df: pd.DataFrame,
+    manual_constructions: pd.DataFrame,
+    question_no: str,
+    strata: str,
+    target: str,
+    period: str,
+    reference: str,
+    auxiliary: str,
+    back_data_period: str,
+    imputation_links: Dict[str, str] = {},
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Returns the key, strata, month ordinal and input hashes of each row of
+    df, with the flags used to find which rows imputation chains can not
+    cross.
+
+    The imputation hash covers the columns used by ratio of means, the manual
+    construction of the row and whether it is in the back data period, the
+    row hash covers all columns of the row. A row is a response if it has a
+    target value which is not removed as back data, i.e. its imputation
+    marker is missing or r, and it is not in the back data period. A row may
+    be manually constructed if it has a manual construction, a mc or fimc
+    marker or a manual construction value, and has a manual construction
+    hazard if such a row is at or before it without a gap in periods.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe to impute.
+    manual_constructions : pd.DataFrame
+        Dataframe with values which are used for manual construction, or None.
+    question_no : str
+        Column name containing question number.
+    strata : str
+        Column name containing strata information (imputation class).
+    target : str
+        Column name of values to be imputed.
+    period : str
+        Column name containing datetime information.
+    reference : str
+        Column name of unique Identifier.
+    auxiliary : str
+        Column name containing auxiliary information (sic).
+    back_data_period : str
+        Back data period in YYYYMM format.
+    imputation_links : dict, optional
+        Dictionary of column name keys matching to their imputation link value.
+    kwargs : mapping, optional
+        A dictionary of keyword arguments passed into func.
+
+    Returns
+    -------
+    pd.DataFrame
+        Row table with the same row positions as df.
+    """
+    is_backdata = (
+        df[period] == pd.to_datetime(back_data_period, format="%Y%m")
+    ).to_numpy()
+
+    manual_construction_hash = hash_manual_constructions(
+        df, manual_constructions, question_no, reference, period
+    )
+
+    imputation_columns = get_imputation_columns(
+        df,
+        [target, period, reference, strata, auxiliary, question_no],
+        imputation_links=imputation_links,
+    )
+
+    imputation_hash = hash_pandas_object(
+        pd.DataFrame(
+            {
+                "row": hash_pandas_object(
+                    df[imputation_columns], index=False
+                ).to_numpy(),
+                "manual_construction": manual_construction_hash,
+                "is_backdata": is_backdata,
+            }
+        ),
+        index=False,
+    ).to_numpy()
+
+    is_response = df[target].notna().to_numpy() & ~is_backdata
+    maybe_manual_construction = manual_construction_hash != 0
+
+    if f"imputation_flags_{target}" in df.columns:
+        markers = convert_to_imputation_marker(df[f"imputation_flags_{target}"])
+
+        is_response &= markers.isna().to_numpy() | is_imputation_marker(markers, ["r"])
+        maybe_manual_construction |= is_imputation_marker(markers, ["mc", "fimc"])
+
+    if f"{target}_man" in df.columns:
+        maybe_manual_construction |= df[f"{target}_man"].notna().to_numpy()
+
+    rows = pd.DataFrame(
+        {
+            question_no: df[question_no].to_numpy(),
+            reference: df[reference].to_numpy(),
+            period: df[period].to_numpy(),
+            strata: df[strata].to_numpy(),
+            "period_ordinal": period_to_ordinal(df[period]).to_numpy(),
+            "imputation_hash": imputation_hash,
+            "row_hash": hash_pandas_object(df, index=False).to_numpy(),
+            "is_response": is_response,
+            "has_auxiliary": df[auxiliary].notna().to_numpy(),
+        }
+    )
+
+    chain_codes = rows.groupby(
+        [question_no, strata, reference], dropna=False, sort=False
+    ).ngroup()
+
+    rows["manual_construction_hazard"] = flag_manual_construction_hazard(
+        chain_codes.to_numpy(),
+        rows["period_ordinal"].to_numpy(),
+        maybe_manual_construction,
+    )
+
+    return rows
+
+
+def flag_manual_construction_hazard(
+    chain_codes: np.ndarray,
+    period_ordinal: np.ndarray,
+    maybe_manual_construction: np.ndarray,
+) -> np.ndarray:
+    """
+    Flags rows with a possibly manually constructed row at or before them in
+    their chain, without a gap in periods in between.
+
+    Parameters
+    ----------
+    chain_codes : np.ndarray
+        Chain code of each row.
+    period_ordinal : np.ndarray
+        Month ordinal of each row.
+    maybe_manual_construction : np.ndarray
+        Boolean array, True where the row may be manually constructed.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array in the order of the input rows.
+    """
+    order = np.lexsort((period_ordinal, chain_codes))
+    position = np.arange(len(order))
+
+    segment_start = np.ones(len(order), dtype=bool)
+    segment_start[1:] = (chain_codes[order][1:] != chain_codes[order][:-1]) | (
+        np.diff(period_ordinal[order]) != 1
+    )
+
+    first_row = np.maximum.accumulate(np.where(segment_start, position, 0))
+    last_manual_construction = np.maximum.accumulate(
+        np.where(maybe_manual_construction[order], position, -1)
+    )
+
+    hazard = np.empty(len(order), dtype=bool)
+    hazard[order] = last_manual_construction >= first_row
+
+    return hazard
+
+
+def find_dependency_ranges(
+    chain_codes: np.ndarray,
+    period_ordinal: np.ndarray,
+    is_response: np.ndarray,
+    is_forward_barrier: np.ndarray,
+) -> tuple:
+    """
+    Finds the range of periods in its chain which the output of each row
+    depends on.
+
+    Chains are the rows of one question number, strata and reference. A
+    response is imputed from nothing, so its output only depends on the rows
+    of the adjacent periods, through matched pairs and predictive values.
+    Other rows are imputed forward from a previous response, backward from a
+    next response or constructed. Backward imputation and backward fills stop
+    at the next response, so the range ends one period after it. Forward
+    imputation and fills stop at the previous response, but the imputation
+    markers after a response also depend on the auxiliary and manual
+    constructions of the rows before it, so the range only starts one period
+    before a previous response with an auxiliary and no manual construction
+    hazard (forward barrier). Ranges without a response or barrier run to the
+    start or end of the chain.
+
+    Parameters
+    ----------
+    chain_codes : np.ndarray
+        Chain code of each row, rows sorted by chain and period.
+    period_ordinal : np.ndarray
+        Month ordinal of each row.
+    is_response : np.ndarray
+        Boolean array, True for responses.
+    is_forward_barrier : np.ndarray
+        Boolean array, True for forward barriers.
+
+    Returns
+    -------
+    tuple
+        Arrays of the first and last month ordinal of the range of each row,
+        -UNBOUNDED and UNBOUNDED for ranges without a start or end.
+    """
+    position = np.arange(len(chain_codes))
+
+    chain_start = np.ones(len(chain_codes), dtype=bool)
+    chain_start[1:] = chain_codes[1:] != chain_codes[:-1]
+    chain_end = np.append(chain_start[1:], True)
+
+    first_row = np.maximum.accumulate(np.where(chain_start, position, 0))
+    last_row = np.minimum.accumulate(
+        np.where(chain_end, position, len(position))[::-1]
+    )[::-1]
+
+    previous_barrier = np.append(
+        -1, np.maximum.accumulate(np.where(is_forward_barrier, position, -1))[:-1]
+    )
+    next_response = np.append(
+        np.minimum.accumulate(np.where(is_response, position, len(position))[::-1])[
+            ::-1
+        ][1:],
+        len(position),
+    )
+
+    lower = np.where(
+        previous_barrier >= first_row,
+        period_ordinal[np.clip(previous_barrier, 0, None)] - 1,
+        -UNBOUNDED,
+    )
+    upper = np.where(
+        next_response <= last_row,
+        period_ordinal[np.clip(next_response, None, len(position) - 1)] + 1,
+        UNBOUNDED,
+    )
+
+    lower = np.where(is_response, period_ordinal - 1, lower)
+    upper = np.where(is_response, period_ordinal + 1, upper)
+
+    return lower, upper
+
+
+def find_changed_rows(
+    rows: pd.DataFrame, cached_rows: pd.DataFrame, keys: List[str], strata: str
+) -> tuple:
+    """
+    Returns the strata, reference and month ordinal of rows whose imputation
+    hash changed, or which were added or removed since the cached run, and
+    flags the rows where only other columns changed. A changed row is
+    returned with its current and with its cached strata.
+
+    Parameters
+    ----------
+    rows : pd.DataFrame
+        Row table of the current run.
+    cached_rows : pd.DataFrame
+        Row table of the cached run.
+    keys : List[str]
+        Column names of question number, reference and period.
+    strata : str
+        Column name containing strata information (imputation class).
+
+    Returns
+    -------
+    tuple
+        Question number, strata, reference and month ordinal of changes, and
+        boolean array, True for rows of the current run where only other
+        columns changed.
+    """
+    compared = (
+        rows[keys + [strata, "period_ordinal", "imputation_hash", "row_hash"]]
+        .assign(row=np.arange(len(rows)))
+        .merge(
+            cached_rows[keys + [strata, "imputation_hash", "row_hash"]],
+            on=keys,
+            how="outer",
+            suffixes=("", "_cached"),
+            indicator=True,
+        )
+    )
+
+    is_both = compared["_merge"] == "both"
+    is_changed = is_both & (
+        compared["imputation_hash"] != compared["imputation_hash_cached"]
+    )
+    is_current = is_changed | (compared["_merge"] == "left_only")
+    is_cached = is_changed | (compared["_merge"] == "right_only")
+
+    is_updated = np.zeros(len(rows), dtype=bool)
+    is_updated[
+        compared.loc[
+            is_both
+            & ~is_changed
+            & (compared["row_hash"] != compared["row_hash_cached"]),
+            "row",
+        ].to_numpy(dtype="int64")
+    ] = True
+
+    compared["period_ordinal"] = period_to_ordinal(compared[keys[2]])
+
+    columns = [keys[0], strata, keys[1], "period_ordinal"]
+
+    changes = pd.concat(
+        [
+            compared.loc[is_current, columns],
+            compared.loc[
+                is_cached, [*columns[:1], f"{strata}_cached", *columns[2:]]
+            ].rename(columns={f"{strata}_cached": strata}),
+        ],
+        ignore_index=True,
+    )
+
+    return changes, is_updated
+
+
+def is_near_change(
+    df: pd.DataFrame,
+    changes: pd.DataFrame,
+    columns: List[str],
+    period_ordinal: np.ndarray,
+    distance: int,
+) -> np.ndarray:
+    """
+    Flags rows of df with a change with the same columns within distance
+    months of their period.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe with the columns.
+    changes : pd.DataFrame
+        Changed rows from find_changed_rows.
+    columns : List[str]
+        Column names which must match, e.g. question number and strata.
+    period_ordinal : np.ndarray
+        Month ordinal of each row of df.
+    distance : int
+        Number of months before and after the period of a row.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array, True for rows near a change.
+    """
+    codes, change_codes = group_codes([df, changes], columns)
+    period_ordinal = np.asarray(period_ordinal, dtype="int64")
+
+    return count_in_ranges(
+        change_codes,
+        changes["period_ordinal"].to_numpy(),
+        codes,
+        period_ordinal - distance,
+        period_ordinal + distance,
+    ).astype(bool)
+
+
+def group_codes(frames: List[pd.DataFrame], columns: List[str]) -> List[np.ndarray]:
+    """
+    Numbers the distinct combinations of columns over several dataframes,
+    so rows of different dataframes can be compared by a single integer code.
+    Missing values are a combination like any other value.
+
+    Parameters
+    ----------
+    frames : List[pd.DataFrame]
+        Dataframes with the columns.
+    columns : List[str]
+        Column names to combine.
+
+    Returns
+    -------
+    List[np.ndarray]
+        Code of each row, one array for each dataframe.
+    """
+    codes = (
+        pd.concat([frame[columns] for frame in frames], ignore_index=True)
+        .groupby(columns, dropna=False, sort=False)
+        .ngroup()
+        .to_numpy(dtype="int64")
+    )
+
+    return np.split(codes, np.cumsum([len(frame) for frame in frames])[:-1])
+
+
+def combine_codes(codes: np.ndarray, period_ordinal: np.ndarray) -> np.ndarray:
+    """Combines codes and month ordinals into one sortable integer."""
+    return (np.asarray(codes, dtype="int64") << 32) + (
+        np.asarray(period_ordinal, dtype="int64") + UNBOUNDED
+    )
+
+
+def count_in_ranges(
+    event_codes: np.ndarray,
+    event_ordinals: np.ndarray,
+    codes: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+) -> np.ndarray:
+    """
+    Counts for each range the events with the same code between its lower
+    and upper month ordinal, inclusive.
+
+    Parameters
+    ----------
+    event_codes : np.ndarray
+        Code of each event.
+    event_ordinals : np.ndarray
+        Month ordinal of each event.
+    codes : np.ndarray
+        Code of each range.
+    lower : np.ndarray
+        First month ordinal of each range.
+    upper : np.ndarray
+        Last month ordinal of each range.
+
+    Returns
+    -------
+    np.ndarray
+        Number of events in each range.
+    """
+    events = np.sort(combine_codes(event_codes, event_ordinals))
+
+    return np.searchsorted(events, combine_codes(codes, upper), "right") - (
+        np.searchsorted(events, combine_codes(codes, lower), "left")
+    )
+
+
+def cover_ranges(
+    codes: np.ndarray,
+    period_ordinal: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    range_codes: np.ndarray,
+) -> np.ndarray:
+    """
+    Flags the rows within any of the ranges of their code.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        Code of each row, rows sorted by code and month ordinal.
+    period_ordinal : np.ndarray
+        Month ordinal of each row.
+    lower : np.ndarray
+        First month ordinal of each range.
+    upper : np.ndarray
+        Last month ordinal of each range.
+    range_codes : np.ndarray
+        Code of each range.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array, True for rows in a range.
+    """
+    row_keys = combine_codes(codes, period_ordinal)
+
+    starts = np.searchsorted(row_keys, combine_codes(range_codes, lower), "left")
+    ends = np.searchsorted(row_keys, combine_codes(range_codes, upper), "right")
+
+    covering = np.zeros(len(row_keys) + 1, dtype="int64")
+    np.add.at(covering, starts, 1)
+    np.add.at(covering, ends, -1)
+
+    return np.cumsum(covering[:-1]) > 0
+
+
+def hash_manual_constructions(
+    df: pd.DataFrame,
+    manual_constructions: pd.DataFrame,
+    question_no: str,
+    reference: str,
+    period: str,
+) -> np.ndarray:
+    """
+    Hashes the manual constructions of each row of df, 0 for rows without a
+    manual construction.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe to impute.
+    manual_constructions : pd.DataFrame
+        Dataframe with values which are used for manual construction, or None.
+    question_no : str
+        Column name containing question number.
+    reference : str
+        Column name of unique Identifier.
+    period : str
+        Column name containing datetime information.
+
+    Returns
+    -------
+    np.ndarray
+        Hash of each row of df.
+    """
+    if manual_constructions is None or manual_constructions.empty:
+        return np.zeros(len(df), dtype="uint64")
+
+    keys = [reference, period, question_no]
+
+    manual_constructions = manual_constructions.copy()
+
+    if manual_constructions[period].dtype != df[period].dtype:
+        manual_constructions[period] = convert_column_to_datetime(
+            manual_constructions[period]
+        )
+
+    manual_constructions[[reference, question_no]] = manual_constructions[
+        [reference, question_no]
+    ].astype(df[[reference, question_no]].dtypes.to_dict())
+
+    hashes = (
+        manual_constructions[keys]
+        .assign(hash=hash_pandas_object(manual_constructions, index=False).to_numpy())
+        .groupby(keys)[["hash"]]
+        .sum()
+    )
+
+    return map_lookup(df, hashes, keys)["hash"].fillna(0).to_numpy(dtype="uint64")
+
+
+def hash_imputation_arguments(
+    df: pd.DataFrame, manual_constructions: pd.DataFrame = None, **rom_arguments
+) -> str:
+    """
+    Hashes the columns and data types of df and the manual constructions and
+    the ratio of means arguments, except current_period and revision_window
+    which only change the back data period of rows.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        dataframe to impute.
+    manual_constructions : pd.DataFrame, optional
+        Dataframe with values which are used for manual construction.
+    rom_arguments : mapping
+        Ratio of means arguments.
+
+    Returns
+    -------
+    str
+        Hash of the arguments.
+    """
+    arguments = {
+        "version": INCREMENTAL_CACHE_VERSION,
+        "columns": df.dtypes.astype(str).to_dict(),
+        "manual_constructions": (
+            None
+            if manual_constructions is None
+            else manual_constructions.dtypes.astype(str).to_dict()
+        ),
+        **{
+            name: value
+            for name, value in rom_arguments.items()
+            if name
+            not in ["current_period", "revision_window", "diagnostics", "link_tables"]
+        },
+    }
+
+    return hashlib.sha256(
+        json.dumps(arguments, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def read_incremental_cache(cache_path: str, arguments_hash: str) -> dict:
+    """
+    Reads the imputed rows, row table and links of the cached run, None is
+    returned if there is no cache or it was written with other arguments.
+
+    Parameters
+    ----------
+    cache_path : str
+        Local folder of the cache.
+    arguments_hash : str
+        Hash of the arguments of the current run.
+
+    Returns
+    -------
+    dict
+        Dataframes of the cache by name, or None.
+    """
+    manifest_file = os.path.join(cache_path, "manifest.json")
+
+    if not os.path.exists(manifest_file):
+        logger.info(f"No incremental imputation cache found in {cache_path}")
+        return None
+
+    with open(manifest_file, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest["arguments"] != arguments_hash:
+        logger.info(
+            "Incremental imputation cache was written with other columns or "
+            "arguments, all rows are imputed"
+        )
+        return None
+
+    return {
+        name: pd.read_parquet(os.path.join(cache_path, file_name))
+        for name, file_name in manifest["files"].items()
+    }
+
+
+def write_incremental_cache(cache_path: str, arguments_hash: str, **frames):
+    """
+    Writes dataframes to the cache as parquet files and replaces the manifest
+    naming them, then removes the files of the previous manifest. The cache is
+    left unchanged if a dataframe can not be written.
+
+    Parameters
+    ----------
+    cache_path : str
+        Local folder of the cache, created if it does not exist.
+    arguments_hash : str
+        Hash of the arguments of the current run.
+    frames : mapping
+        Dataframes to cache by name.
+    """
+    os.makedirs(cache_path, exist_ok=True)
+
+    manifest_file = os.path.join(cache_path, "manifest.json")
+    run_token = uuid.uuid4().hex
+
+    files = {name: f"{name}_{run_token}.parquet" for name in frames}
+
+    try:
+        for name, frame in frames.items():
+            frame.to_parquet(os.path.join(cache_path, files[name]), index=False)
+
+    except (ImportError, TypeError, ValueError) as error:
+        logger.warning(f"Incremental imputation cache could not be written: {error}")
+
+        for file_name in files.values():
+            if os.path.exists(os.path.join(cache_path, file_name)):
+                os.remove(os.path.join(cache_path, file_name))
+
+        return
+
+    previous_files = []
+
+    if os.path.exists(manifest_file):
+        with open(manifest_file, encoding="utf-8") as f:
+            previous_files = list(json.load(f)["files"].values())
+
+    # Written under a temporary name first so a partly written manifest is
+    # never read
+    temporary_file = f"{manifest_file}.{run_token}.tmp"
+
+    with open(temporary_file, "w", encoding="utf-8") as f:
+        json.dump({"arguments": arguments_hash, "files": files}, f, indent=4)
+
+    os.replace(temporary_file, manifest_file)
+
+    for file_name in previous_files:
+        if os.path.exists(os.path.join(cache_path, file_name)):
+            os.remove(os.path.join(cache_path, file_name))
@@ -1,4 +1,10 @@
+import logging
+
+import numpy as np
 import pandas as pd
+from pandas.util import hash_pandas_object
+
+logger = logging.getLogger(__name__)
 
 # TODO: Extend function to receive multiple df with *df_with_filters
 
@@ -10,6 +16,10 @@ def flag_rows_to_ignore(
     Add a new column bool column named ignore_from_link to df
     having as TRUE the observations defined in df_with_filters.
 
+    Rows are matched on a hash of the columns of df_with_filters, e.g.
+    reference, period and question number, so neither dataframe is
+    re-indexed and the column order of df is kept.
+
     Parameters
     ----------
     df : pd.DataFrame
@@ -35,15 +45,20 @@ def flag_rows_to_ignore(
 
     # TODO: Check if values to be ignored exist
 
-    df = df.set_index(list(df_with_filters))
+    filter_columns = list(df_with_filters)
 
-    df_with_filters = df_with_filters.set_index(list(df_with_filters))
+    # Hashes depend on dtype, so filter keys are cast to the dtypes of df
+    df_with_filters = df_with_filters.astype(df[filter_columns].dtypes.to_dict())
 
-    df["ignore_from_link"] = df.index.isin(df_with_filters.index)
-
-    df = df.reset_index()
+    df = df.assign(
+        ignore_from_link=np.isin(
+            hash_pandas_object(df[filter_columns], index=False).to_numpy(),
+            hash_pandas_object(df_with_filters, index=False).to_numpy(),
+        )
+    )
 
-    # TODO: Consider what should be logged and reroute print to logs
-    print("These values were flagged:\n", df.loc[df["ignore_from_link"]])
+    logger.info(
+        f"{df['ignore_from_link'].sum()} rows were flagged to ignore from links"
+    )
 
     return df
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from mbs_results.utilities.utils import period_to_ordinal
+
+PANEL_INDEX_COLUMNS = ["period_ordinal", "panel_group_start", "panel_segment_start"]
+
+
+def create_panel_index(
+    df: pd.DataFrame, period: str, reference: str, strata: str, **kwargs
+) -> pd.DataFrame:
+    """
+    Sorts the dataframe by strata, reference and period and adds the panel
+    index columns, so imputation steps can reuse them instead of recomputing
+    contiguity with date offsets and shifted copies of the dataframe.
+
+    The panel index consists of:
+        period_ordinal: integer month number of period
+        panel_group_start: True if row is the first of its strata and
+            reference group
+        panel_segment_start: True if row is the first of a run of consecutive
+            months within its strata and reference group
+
+    Both start columns only depend on the previous period of the same strata
+    and reference, so they stay valid under any sort which keeps strata and
+    reference groups together and periods ascending within them.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Original dataframe.
+    period : str
+        Column name containing time period.
+    reference : str
+        Column name containing business reference id.
+    strata : str
+        Column name containing strata information (sic).
+    kwargs : mapping, optional
+        A dictionary of keyword arguments passed into func.
+
+    Returns
+    -------
+    pd.DataFrame
+        Sorted dataframe with the panel index columns added.
+    """
+    df = sort_panel(df, [strata, reference, period])
+
+    df[PANEL_INDEX_COLUMNS] = calculate_panel_index(df, period, reference, strata)
+
+    return df
+
+
+def get_panel_index(
+    df: pd.DataFrame, period: str, reference: str, strata: str
+) -> pd.DataFrame:
+    """
+    Returns the panel index for the dataframe in its current order. Uses the
+    columns added by create_panel_index if they exist, otherwise calculates
+    them without adding them to the dataframe.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe sorted so that strata and reference groups are together and
+        periods are ascending within them.
+    period : str
+        Column name containing time period.
+    reference : str
+        Column name containing business reference id.
+    strata : str
+        Column name containing strata information (sic).
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with the panel index columns, same index as df.
+    """
+    if set(PANEL_INDEX_COLUMNS).issubset(df.columns):
+        return df[PANEL_INDEX_COLUMNS]
+
+    return calculate_panel_index(df, period, reference, strata)
+
+
+def calculate_panel_index(
+    df: pd.DataFrame, period: str, reference: str, strata: str
+) -> pd.DataFrame:
+    """
+    Calculates the panel index columns for a dataframe sorted so that strata
+    and reference groups are together and periods are ascending within them.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Sorted dataframe.
+    period : str
+        Column name containing time period.
+    reference : str
+        Column name containing business reference id.
+    strata : str
+        Column name containing strata information (sic).
+
+    Returns
+    -------
+    pd.DataFrame
+        Dataframe with the panel index columns, same index as df.
+    """
+    period_ordinal = period_to_ordinal(df[period])
+
+    group_start = (df[strata] != df[strata].shift(1)) | (
+        df[reference] != df[reference].shift(1)
+    )
+
+    segment_start = group_start | (period_ordinal.diff(1) != 1)
+
+    return pd.DataFrame(
+        {
+            "period_ordinal": period_ordinal,
+            "panel_group_start": group_start,
+            "panel_segment_start": segment_start,
+        },
+        index=df.index,
+    )
+
+
+def same_segment(segment_start: pd.Series, time_difference: int) -> pd.Series:
+    """
+    Flags rows which are in the same run of consecutive months as the row
+    `time_difference` rows before them (after them if negative).
+
+    Parameters
+    ----------
+    segment_start : pd.Series
+        panel_segment_start column of the panel index.
+    time_difference : int
+        Number of rows to look back, negative values look forward.
+
+    Returns
+    -------
+    pd.Series
+        Boolean series, False where the other row is in a different segment
+        or does not exist.
+    """
+    segment_id = segment_start.cumsum()
+
+    return segment_id == segment_id.shift(time_difference)
+
+
+def sort_panel(df: pd.DataFrame, keys: list, inplace: bool = False) -> pd.DataFrame:
+    """
+    Sorts the dataframe by keys, unless it is already sorted by them.
+
+    Imputation steps all use the (strata, reference, period) order, so after
+    the first sort the following steps only pay for checking the order
+    instead of sorting and copying every column again. The order is checked
+    rather than recorded on the dataframe, because pandas keeps attributes
+    on reordered copies.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe to sort.
+    keys : list
+        Column names to sort by.
+    inplace : bool, optional
+        If True sort df in place and return None, as in pandas sort_values.
+
+    Returns
+    -------
+    pd.DataFrame
+        Sorted dataframe, df itself if it was already sorted, None if
+        inplace is True.
+    """
+    if is_sorted_by(df, keys):
+        return None if inplace else df
+
+    return df.sort_values(keys, inplace=inplace)
+
+
+def is_sorted_by(df: pd.DataFrame, keys: list) -> bool:
+    """
+    Checks if the dataframe is sorted ascending by keys, comparing each row
+    with the next one. Missing keys are treated as unsorted.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe to check.
+    keys : list
+        Column names to check the order of, in sort priority.
+
+    Returns
+    -------
+    bool
+        True if sorting df by keys would not change its order.
+    """
+    if df[keys].isna().any(axis=None):
+        return False
+
+    # Rows tied on all previous keys, only these are decided by the next key
+    tied = np.ones(max(len(df) - 1, 0), dtype=bool)
+
+    for key in keys:
+        values = df[key].to_numpy()
+        previous, following = values[:-1], values[1:]
+
+        if (tied & (previous > following)).any():
+            return False
+
+        tied &= previous == following
+
+    return True
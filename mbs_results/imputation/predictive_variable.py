@@ -1,5 +1,7 @@
 import pandas as pd
 
+from mbs_results.imputation.panel_index import get_panel_index, same_segment, sort_panel
+
 
 def shift_by_strata_period(
     df: pd.DataFrame,
@@ -42,14 +44,14 @@ def shift_by_strata_period(
         shifted values.
     """
 
-    df.sort_values([reference, strata, period], inplace=True)
+    sort_panel(df, [strata, reference, period], inplace=True)
+
+    panel_index = get_panel_index(df, period, reference, strata)
 
-    df[new_col] = df.groupby(
-        (
-            (df[period] - pd.DateOffset(months=1) != df.shift(1)[period])
-            | (df[strata].diff(1) != 0)
-            | (df[reference].diff(1) != 0)
-        ).cumsum()
-    ).shift(time_difference)[target]
+    df[new_col] = (
+        df[target]
+        .shift(time_difference)
+        .where(same_segment(panel_index["panel_segment_start"], time_difference))
+    )
 
     return df
@@ -1,4 +1,5 @@
-from typing import Dict
+from functools import partial
+from typing import Dict, List
 
 import numpy as np
 import pandas as pd
@@ -6,17 +7,27 @@ import pandas as pd
 from mbs_results.imputation.apply_imputation_link import (
     create_and_merge_imputation_values,
 )
-from mbs_results.imputation.calculate_imputation_link import calculate_imputation_link
+from mbs_results.imputation.calculate_imputation_link import (
+    calculate_imputation_link_table,
+    join_imputation_link_table,
+    replace_imputation_links,
+)
 from mbs_results.imputation.construction_matches import flag_construction_matches
-from mbs_results.imputation.cumulative_imputation_links import get_cumulative_links
-from mbs_results.imputation.flag_and_count_matched_pairs import (
-    count_matches,
-    flag_matched_pair,
+from mbs_results.imputation.cumulative_imputation_links import (
+    get_forward_and_backward_cumulative_links,
+)
+from mbs_results.imputation.flag_and_count_matched_pairs import flag_matched_pair
+from mbs_results.imputation.imputation_diagnostics import profile_imputation_step
+from mbs_results.imputation.imputation_flags import (
+    convert_to_imputation_marker,
+    generate_imputation_marker,
+    is_imputation_marker,
 )
-from mbs_results.imputation.imputation_flags import generate_imputation_marker
 from mbs_results.imputation.link_filter import flag_rows_to_ignore
+from mbs_results.imputation.panel_index import PANEL_INDEX_COLUMNS, create_panel_index
 from mbs_results.imputation.predictive_variable import shift_by_strata_period
 from mbs_results.staging.data_cleaning import join_manual_constructions
+from mbs_results.utilities.utils import ordinal_to_period, period_to_ordinal
 
 
 def wrap_flag_matched_pairs(
@@ -128,14 +139,30 @@ def wrap_shift_by_strata_period(
 
 
 def wrap_calculate_imputation_link(
-    df: pd.DataFrame, **default_columns: Dict[str, str]
+    df: pd.DataFrame,
+    link_tables: List[pd.DataFrame] = None,
+    question_no: str = None,
+    link_table: pd.DataFrame = None,
+    **default_columns: Dict[str, str],
 ) -> pd.DataFrame:
-    """Wrapper for calculate_imputation_link function.
+    """Wrapper for calculate_imputation_link_table function.
+
+    Forward, backward and construction links and match counts are calculated
+    as one table by strata and period, which is joined onto the rows once.
 
     Parameters
     ----------
     df : pd.DataFrame
         Original dataframe.
+    link_tables : List[pd.DataFrame], optional
+        If given, the link table with question numbers is appended to it.
+    question_no : str, optional
+        Column name containing question number, needed with link_tables or
+        link_table.
+    link_table : pd.DataFrame, optional
+        Links, default link flags and match counts with question number,
+        strata and period columns. If given, they replace the calculated links
+        of the same question number, strata and period.
     **default_columns : Dict[str, str]
         The column names which were passed to ratio of means function.
 
@@ -143,7 +170,8 @@ def wrap_calculate_imputation_link(
     -------
     df : pd.DataFrame
         Original dataframe with 3 new numeric columns which contain the
-        imputation links.
+        imputation links, 3 bool columns with default link flags and 3
+        numeric columns with the match counts.
     """
     target_col = default_columns["target"]
 
@@ -154,6 +182,7 @@ def wrap_calculate_imputation_link(
 
         # default_columns = {**default_columns, "target": "filtered_target"}
         # target_col = f"filtered_{target_col}"
+
     link_arguments = (
         dict(
             **default_columns,
@@ -181,10 +210,33 @@ def wrap_calculate_imputation_link(
         ),
     )
 
-    for args in link_arguments:
-        df = calculate_imputation_link(df, **args)
+    links = pd.concat(
+        [calculate_imputation_link_table(df, **args) for args in link_arguments],
+        axis=1,
+    )
 
-    return df
+    # Links and default flags first, then match counts
+    links = links[
+        [column for column in links if not column.endswith("_count")]
+        + [column for column in links if column.endswith("_count")]
+    ]
+
+    if link_tables is not None or link_table is not None:
+        question_numbers = df.groupby(
+            [default_columns["strata"], default_columns["period"]], sort=False
+        )[question_no].first()
+
+    if link_table is not None:
+        links = replace_imputation_links(
+            links, link_table, question_numbers.to_numpy(), question_no
+        )
+
+    if link_tables is not None:
+        link_tables.append(links.assign(**{question_no: question_numbers}))
+
+    return join_imputation_link_table(
+        df, links, [default_columns["strata"], default_columns["period"]]
+    )
 
 
 def wrap_get_cumulative_links(
@@ -210,21 +262,13 @@ def wrap_get_cumulative_links(
     # if f"filtered_{target_col}" in df.columns:
     #     target_col = f"filtered_{target_col}"
 
-    cum_links_arguments = (
-        dict(
-            **default_columns,
-            **{"forward_or_backward": "f", "imputation_link": "f_link_" + target_col},
-        ),
-        dict(
-            **default_columns,
-            **{"forward_or_backward": "b", "imputation_link": "b_link_" + target_col},
-        ),
+    df = get_forward_and_backward_cumulative_links(
+        df,
+        forward_link="f_link_" + target_col,
+        backward_link="b_link_" + target_col,
+        **default_columns,
     )
 
-    for args in cum_links_arguments:
-
-        df = get_cumulative_links(df, **args)
-
     return df
 
 
@@ -252,26 +296,31 @@ def process_backdata(
         dataframe with backdata processed and backdata flags copied to seperate columns
     """
     # Bool for if period is back data
-    df["is_backdata"] = df[period] == pd.to_datetime(back_data_period, format="%Y%m")
+    is_backdata = df[period] == pd.to_datetime(back_data_period, format="%Y%m")
+    df["is_backdata"] = is_backdata
     # Copying backdata to seperate column
-    df.loc[df["is_backdata"], f"backdata_{target}"] = df.loc[df["is_backdata"], target]
+    df[f"backdata_{target}"] = df[target].where(is_backdata)
     # Copying flags to sep column
-    df[f"backdata_flags_{target}"] = df[f"imputation_flags_{target}"].str.lower()
+    backdata_flags = convert_to_imputation_marker(df[f"imputation_flags_{target}"])
+    df[f"backdata_flags_{target}"] = backdata_flags
+
+    # Masks are built once from the category codes of the flags
+    is_manual_construction = is_imputation_marker(backdata_flags, ["mc", "fimc"])
+    is_not_return = backdata_flags.notna().to_numpy() & ~is_imputation_marker(
+        backdata_flags, ["r"]
+    )
 
     # moving mc data into manual construction column for MC imputation
-    df.loc[df[f"backdata_flags_{target}"] == "mc", f"{target}_man"] = df.loc[
-        df[f"backdata_flags_{target}"] == "mc", target
-    ]
-    df.loc[df[f"backdata_flags_{target}"] == "fimc", f"{target}_man"] = df.loc[
-        df[f"backdata_flags_{target}"] == "fimc", target
-    ]
+    if f"{target}_man" in df.columns:
+        df[f"{target}_man"] = df[f"{target}_man"].mask(
+            is_manual_construction, df[target]
+        )
+
+    else:
+        df[f"{target}_man"] = df[target].where(is_manual_construction)
 
     # removing mc data from target column
-    df.loc[
-        (~df[f"backdata_flags_{target}"].isin(["r"]))
-        & (df[f"backdata_flags_{target}"].notna()),
-        target,
-    ] = None
+    df[target] = df[target].mask(is_not_return)
 
     return df
 
@@ -300,15 +349,13 @@ def reapply_backdata(
     """
     if f"backdata_flags_{target}" in df.columns:
 
-        is_backdata_not_return = (df[f"backdata_flags_{target}"] != "r") & (
-            df["is_backdata"]
+        is_backdata_not_return = df["is_backdata"].to_numpy() & ~is_imputation_marker(
+            df[f"backdata_flags_{target}"], ["r"]
+        )
+        df[target] = df[target].mask(is_backdata_not_return, df[f"backdata_{target}"])
+        df[f"imputation_flags_{target}"] = df[f"imputation_flags_{target}"].mask(
+            is_backdata_not_return, df[f"backdata_flags_{target}"]
         )
-        df.loc[is_backdata_not_return, target] = df.loc[
-            is_backdata_not_return, f"backdata_{target}"
-        ]
-        df.loc[is_backdata_not_return, f"imputation_flags_{target}"] = df.loc[
-            is_backdata_not_return, f"backdata_flags_{target}"
-        ]
 
     if dropping:
         df.drop(columns=["is_backdata"], inplace=True)
@@ -336,48 +383,10 @@ def replace_fir_backdata(df: pd.DataFrame, target: str) -> pd.DataFrame:
 
     """
     if f"backdata_flags_{target}" in df.columns:
-        df.loc[(df[f"backdata_flags_{target}"].isin(["fir"])), target] = df.loc[
-            (df[f"backdata_flags_{target}"].isin(["fir"])), f"backdata_{target}"
-        ]
-
-    return df
-
-
-def count_all_matches(
-    df: pd.DataFrame, **default_columns: Dict[str, str]
-) -> pd.DataFrame:
-    """
-    Creates 3 new numeric columns with the sum of matches between targeted and
-    predicted values for each imputation method. This is wrapper for
-    count_matches function.
-
-    Parameters
-    ----------
-    df : pd.DataFrame
-        Original dataframe.
-    **default_columns : Dict[str, str]
-        The column names kwargs which were passed to ratio of means function.
-
-    Returns
-    -------
-    df : pd.DataFrame
-        Original dataframe with 3 new numeric columns.
-    """
-
-    target_col_name = default_columns["target"]
-
-    if "ignore_from_link" in df.columns:
-
-        target_col_name = "filtered_" + target_col_name
-
-    count_arguments = (
-        dict(**default_columns, **{"flag": "f_match_" + target_col_name}),
-        dict(**default_columns, **{"flag": "b_match_" + target_col_name}),
-        dict(**default_columns, **{"flag": "flag_construction_matches"}),
-    )
-
-    for args in count_arguments:
-        df = count_matches(df, **args)
+        df[target] = df[target].mask(
+            is_imputation_marker(df[f"backdata_flags_{target}"], ["fir"]),
+            df[f"backdata_{target}"],
+        )
 
     return df
 
@@ -395,6 +404,9 @@ def ratio_of_means(
     filters: pd.DataFrame = None,
     manual_constructions: pd.DataFrame = None,
     imputation_links: Dict[str, str] = {},
+    diagnostics: List[dict] = None,
+    link_tables: List[pd.DataFrame] = None,
+    link_table: pd.DataFrame = None,
     **kwargs,
 ) -> pd.DataFrame:
     """
@@ -428,12 +440,25 @@ def ratio_of_means(
     question_no: str
         Column name containing question_no
     filters : pd.DataFrame, optional
-        Dataframe with values to exclude from imputation method.
+        Dataframe with values to exclude from imputation method. Not needed
+        if df already has an ignore_from_link column from flag_rows_to_ignore.
     manual_constructions : pd.DataFrame, optional
         Dataframe with values which are used for manual construction
     imputation_links : dict, optional
         Dictionary of column name keys matching to their imputation link value
         ("f_link_question", "b_link_question", "construction_link").
+    diagnostics : List[dict], optional
+        If given, wall time, memory, row counts and imputation marker counts
+        of each imputation step are appended to it.
+    link_tables : List[pd.DataFrame], optional
+        If given, the table of calculated links, default link flags and match
+        counts by strata and period is appended to it, with the question
+        number of each strata and period.
+    link_table : pd.DataFrame, optional
+        Links, default link flags and match counts with question number,
+        strata and period columns, e.g. collected with link_tables by a
+        previous run. If given, they replace the calculated links of the same
+        question number, strata and period, other links are calculated.
     kwargs : mapping, optional
         A dictionary of keyword arguments passed into func.
 
@@ -449,6 +474,18 @@ def ratio_of_means(
 
     # TODO: Consider more elegant solution, or define function arguments explicitly
     back_data_period = calculate_back_data_period(current_period, revision_window)
+
+    # Imputation runs on a narrow frame with only the columns it uses, the
+    # remaining columns are joined back by row position at the end
+    original_df = df
+    imputation_columns = get_imputation_columns(
+        df,
+        [target, period, reference, strata, auxiliary, question_no],
+        filters,
+        imputation_links,
+    )
+    df = df[imputation_columns].assign(imputation_row=np.arange(len(df)))
+
     if f"imputation_flags_{target}" in df.columns:
         df = process_backdata(df, target, period, back_data_period)
 
@@ -467,20 +504,35 @@ def ratio_of_means(
         # target = f"filtered_{default_columns['target']}"
         # default_columns = {**default_columns, **{"target": f"filtered_{target_col}"}}
 
+    # Contiguity of periods is calculated once and reused by each step
+    df = create_panel_index(df, **default_columns)
+
+    profiled = partial(
+        profile_imputation_step,
+        diagnostics=diagnostics,
+        question_no=question_no,
+        marker=f"imputation_flags_{target}",
+    )
+
     if all(
         links in imputation_links.values()
-        for links in ["f_link_question", "b_link_question", "construction_link"]
+        for links in [f"f_link_{target}", f"b_link_{target}", "construction_link"]
     ):
         df = df.rename(columns=imputation_links).pipe(
-            wrap_shift_by_strata_period, **default_columns
+            profiled(wrap_shift_by_strata_period), **default_columns
         )
 
     else:
         df = (
-            df.pipe(wrap_flag_matched_pairs, **default_columns)
-            .pipe(wrap_shift_by_strata_period, **default_columns)
-            .pipe(wrap_calculate_imputation_link, **default_columns)
-            .pipe(count_all_matches, **default_columns)
+            df.pipe(profiled(wrap_flag_matched_pairs), **default_columns)
+            .pipe(profiled(wrap_shift_by_strata_period), **default_columns)
+            .pipe(
+                profiled(wrap_calculate_imputation_link),
+                link_tables=link_tables,
+                question_no=question_no,
+                link_table=link_table,
+                **default_columns,
+            )
         )
 
     if manual_constructions is not None:
@@ -500,12 +552,12 @@ def ratio_of_means(
     df = (
         df
         # Pass backdata period to calculate imputation link
-        .pipe(replace_fir_backdata, target=target)
-        .pipe(generate_imputation_marker, **default_columns)
-        .pipe(wrap_get_cumulative_links, **default_columns)
-        .pipe(reapply_backdata, target=target)
+        .pipe(profiled(replace_fir_backdata), target=target)
+        .pipe(profiled(generate_imputation_marker), **default_columns)
+        .pipe(profiled(wrap_get_cumulative_links), **default_columns)
+        .pipe(profiled(reapply_backdata), target=target)
         .pipe(
-            create_and_merge_imputation_values,
+            profiled(create_and_merge_imputation_values),
             **default_columns,
             imputation_class=strata,
             marker=f"imputation_flags_{target}",
@@ -516,6 +568,8 @@ def ratio_of_means(
         )
     )
 
+    df = join_pruned_columns(df, original_df, imputation_columns)
+
     # TODO: Reset index needed because of sorting, perhaps reset index
     #       when sorting directly in the low level functions or consider
     #       sorting here before chaining
@@ -551,6 +605,7 @@ def ratio_of_means(
             "ignore_from_link",
             "filtered_target",
             "man_link",
+            *PANEL_INDEX_COLUMNS,
         ],
         axis=1,
         errors="ignore",
@@ -562,8 +617,108 @@ def ratio_of_means(
 
 
 def calculate_back_data_period(current_period, revision_window) -> str:
-    current_period = pd.to_datetime(current_period, format="%Y%m")
-    back_data_period = (
-        (current_period - pd.DateOffset(months=revision_window)).date().strftime("%Y%m")
+    back_data_period = ordinal_to_period(
+        period_to_ordinal(current_period) - revision_window
     )
-    return back_data_period
+    return str(back_data_period)
+
+
+def get_imputation_columns(
+    df: pd.DataFrame,
+    columns: list,
+    filters: pd.DataFrame = None,
+    imputation_links: Dict[str, str] = {},
+) -> list:
+    """
+    Returns the columns of df used by ratio of means, in their order in df.
+
+    Besides the given columns, back data flags, manual constructions, filter
+    columns, filter flags and given imputation links are used if they exist.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Original dataframe.
+    columns : list
+        Column names of target, period, reference, strata, auxiliary and
+        question number.
+    filters : pd.DataFrame, optional
+        Dataframe with values to exclude from imputation method.
+    imputation_links : dict, optional
+        Dictionary of column name keys matching to their imputation link value.
+
+    Returns
+    -------
+    list
+        Column names used by ratio of means.
+    """
+    target = columns[0]
+
+    optional_columns = [
+        f"imputation_flags_{target}",
+        f"{target}_man",
+        *(list(filters) if filters is not None else []),
+        "ignore_from_link",
+        *imputation_links.keys(),
+    ]
+
+    return [
+        column
+        for column in df.columns
+        if column in columns or column in optional_columns
+    ]
+
+
+def join_pruned_columns(
+    df: pd.DataFrame, original_df: pd.DataFrame, imputation_columns: list
+) -> pd.DataFrame:
+    """
+    Joins the columns which were not used by ratio of means back onto the
+    imputed dataframe, matching rows on the imputation_row column (row
+    position in original_df). Pruned columns are placed in their original
+    position, columns created by imputation are kept if names collide.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Imputed dataframe with imputation_row column.
+    original_df : pd.DataFrame
+        Dataframe passed to ratio of means.
+    imputation_columns : list
+        Columns of original_df which were used by ratio of means.
+
+    Returns
+    -------
+    pd.DataFrame
+        Imputed dataframe with the pruned columns, without imputation_row.
+    """
+    pruned_columns = [
+        column
+        for column in original_df.columns
+        if column not in imputation_columns and column not in df.columns
+    ]
+
+    pruned_df = original_df[pruned_columns].take(df["imputation_row"].to_numpy())
+    pruned_df.index = df.index
+
+    df = pd.concat([df.drop(columns="imputation_row"), pruned_df], axis=1)
+
+    # Each pruned column goes after the column it originally followed
+    column_order = [column for column in df.columns if column not in pruned_columns]
+    previous_column = None
+
+    for column in original_df.columns:
+        if column in pruned_columns:
+            column_order.insert(
+                (
+                    column_order.index(previous_column) + 1
+                    if previous_column is not None
+                    else 0
+                ),
+                column,
+            )
+
+        if column in column_order:
+            previous_column = column
+
+    return df[column_order]
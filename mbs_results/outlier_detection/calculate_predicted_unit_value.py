@@ -1,4 +1,9 @@
+from typing import List
+
 import numpy as np
+import pandas as pd
+
+from mbs_results.utilities.utils import get_group_codes
 
 
 def calculate_predicted_unit_value(
@@ -32,46 +37,91 @@ def calculate_predicted_unit_value(
         A pandas DataFrame with a new column containing the predicted unit value.
     """
 
-    winsorised = (~df[is_census]) & (~df[nw_ag_flag])
-    filtered_df = df.copy().loc[winsorised]
+    return df.assign(
+        predicted_unit_value=predict_unit_values(
+            df[a_weight].to_numpy(dtype="float64"),
+            df[aux].to_numpy(dtype="float64"),
+            df[target_variable].to_numpy(dtype="float64"),
+            get_group_codes(df, [group, period]),
+            (df[is_census] | df[nw_ag_flag]).to_numpy(),
+        )
+    ).reset_index(drop=True)
 
-    filtered_df["weighted_target_values"] = (
-        filtered_df[a_weight] * filtered_df[target_variable]
-    )
-    filtered_df["weighted_auxiliary_values"] = filtered_df[a_weight] * filtered_df[aux]
 
-    sum_weighted_target_values = (
-        filtered_df.groupby([group, period])["weighted_target_values"]
-        .sum()
-        .to_frame(name="sum_weighted_target_values")
-        .reset_index()
-    )
-    sum_weighted_auxiliary_values = (
-        filtered_df.groupby([group, period])["weighted_auxiliary_values"]
-        .sum()
-        .to_frame(name="sum_weighted_auxiliary_values")
-        .reset_index()
-    )
+def predict_unit_values(
+    a: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    codes: np.ndarray,
+    non_winsorised: np.ndarray,
+) -> np.ndarray:
+    """
+    Returns the predicted unit value of each row, the auxiliary value times the
+    ratio of the design weighted target and auxiliary sums of winsorised rows
+    in its group. Non winsorised rows are given NaN.
+
+    Parameters
+    ----------
+    a : np.ndarray
+        Design weight of each row.
+    x : np.ndarray
+        Auxiliary value of each row.
+    y : np.ndarray
+        Target value of each row.
+    codes : np.ndarray
+        Group number of each row, -1 for rows without a group.
+    non_winsorised : np.ndarray
+        Bool array, True for census rows and rows which can't be winsorised.
 
-    total_sum_weighted = sum_weighted_target_values.merge(
-        sum_weighted_auxiliary_values, on=[group, period], how="left"
+    Returns
+    -------
+    np.ndarray
+        Predicted unit value of each row.
+    """
+    sum_weighted_target, sum_weighted_auxiliary = sum_by_group(
+        [a * y, a * x], codes, ~non_winsorised
     )
 
-    final_df = df.merge(total_sum_weighted, on=[group, period], how="left")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            non_winsorised, np.nan, x * sum_weighted_target / sum_weighted_auxiliary
+        )
 
-    final_df["predicted_unit_value"] = (
-        final_df[aux]
-        * final_df["sum_weighted_target_values"]
-        / final_df["sum_weighted_auxiliary_values"]
-    )
 
-    final_df = final_df.drop(
-        ["sum_weighted_target_values", "sum_weighted_auxiliary_values"], axis=1
-    )
+def sum_by_group(
+    values: List[np.ndarray], codes: np.ndarray, included: np.ndarray
+) -> List[np.ndarray]:
+    """
+    Sums values of included rows for each group and maps the sums back to
+    every row of the group. Rows of groups without included rows, or with
+    group number -1, are given NaN.
 
-    non_winsorised = (final_df[is_census]) | (final_df[nw_ag_flag])
-    final_df["predicted_unit_value"] = final_df["predicted_unit_value"].mask(
-        non_winsorised, np.nan
+    Sums are calculated with a groupby on the group numbers rather than
+    np.bincount, as pandas uses compensated summation and the sums must match
+    summing each group separately.
+
+    Parameters
+    ----------
+    values : List[np.ndarray]
+        Arrays to sum, missing values are skipped.
+    codes : np.ndarray
+        Group number of each row.
+    included : np.ndarray
+        Bool array, True for rows which are summed.
+
+    Returns
+    -------
+    List[np.ndarray]
+        Group sum of each array for each row.
+    """
+    included = included & (codes >= 0)
+
+    sums = (
+        pd.DataFrame({i: value[included] for i, value in enumerate(values)})
+        .groupby(codes[included])
+        .sum()
+        .reindex(np.arange(codes.max(initial=-1) + 2) - 1)
     )
 
-    return final_df
+    # Group number -1 is at position 0 and has no sums
+    return [sums[i].to_numpy()[codes + 1] for i in range(len(values))]
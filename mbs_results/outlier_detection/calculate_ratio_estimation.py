@@ -42,16 +42,45 @@ def calculate_ratio_estimation(
         A pandas DataFrame with a new column containing the ratio estimation.
     """
 
-    df = df.copy()
-    df["flag_calculation"] = df[a_weight] * df[g_weight]
-    df["ratio_estimation_treshold"] = (df[predicted_unit_value]) + (
-        df[l_values] / (df["flag_calculation"] - 1)
+    return df.assign(
+        ratio_estimation_treshold=calculate_ratio_estimation_threshold(
+            df[predicted_unit_value].to_numpy(dtype="float64"),
+            df[l_values].to_numpy(dtype="float64"),
+            df[a_weight].to_numpy(dtype="float64")
+            * df[g_weight].to_numpy(dtype="float64"),
+            (df[is_census] | df[nw_ag_flag]).to_numpy(),
+        )
     )
-    df = df.drop("flag_calculation", axis=1)
 
-    non_winsorised = (df[is_census]) | (df[nw_ag_flag])
-    df["ratio_estimation_treshold"] = df["ratio_estimation_treshold"].mask(
-        non_winsorised, np.nan
-    )
 
-    return df
+def calculate_ratio_estimation_threshold(
+    predicted_unit_value: np.ndarray,
+    l_values: np.ndarray,
+    ag: np.ndarray,
+    non_winsorised: np.ndarray,
+) -> np.ndarray:
+    """
+    Returns the ratio estimation threshold of each row, the predicted unit
+    value plus the L-value divided by the product of the design and g weights
+    minus 1. Non winsorised rows are given NaN.
+
+    Parameters
+    ----------
+    predicted_unit_value : np.ndarray
+        Predicted unit value of each row.
+    l_values : np.ndarray
+        L-value of each row.
+    ag : np.ndarray
+        Product of the design weight and the g weight of each row.
+    non_winsorised : np.ndarray
+        Bool array, True for census rows and rows which can't be winsorised.
+
+    Returns
+    -------
+    np.ndarray
+        Ratio estimation threshold of each row.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            non_winsorised, np.nan, predicted_unit_value + l_values / (ag - 1)
+        )
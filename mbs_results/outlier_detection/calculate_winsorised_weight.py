@@ -1,3 +1,5 @@
+from typing import Tuple
+
 import numpy as np
 
 
@@ -50,29 +52,59 @@ def calculate_winsorised_weight(
         A pandas DataFrame with a new column containing the winsorised weights.
     """
 
-    df["w"] = df[a_weight] * df[g_weight]
+    new_target_variable, outlier_weight = calculate_outlier_weights(
+        df[target_variable].to_numpy(dtype="float64"),
+        df[a_weight].to_numpy(dtype="float64") * df[g_weight].to_numpy(dtype="float64"),
+        df[ratio_estimation_treshold].to_numpy(dtype="float64"),
+        (df[is_census] | df[nw_ag_flag]).to_numpy(),
+    )
 
-    df["new_target"] = (df[target_variable] / df["w"]) + (
-        df[ratio_estimation_treshold] - (df[ratio_estimation_treshold] / df["w"])
+    return df.assign(
+        new_target_variable=new_target_variable, outlier_weight=outlier_weight
     )
 
-    mask = df[target_variable] <= df[ratio_estimation_treshold]
-    df["new_target_variable"] = np.where(mask, df[target_variable], df["new_target"])
 
-    df["outlier_weight"] = df["new_target_variable"] / df[target_variable]
+def calculate_outlier_weights(
+    y: np.ndarray,
+    ag: np.ndarray,
+    ratio_estimation_treshold: np.ndarray,
+    non_winsorised: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the winsorised target and outlier weight of each row. Targets
+    above the ratio estimation threshold are reduced towards it, outlier
+    weights are the winsorised target divided by the target.
 
-    df = df.drop(["w", "new_target"], axis=1)
+    Non winsorised rows and rows with target 0 are given no winsorised target
+    and an outlier weight of 1.
 
-    non_winsorised = (df[is_census]) | (df[nw_ag_flag])
+    Parameters
+    ----------
+    y : np.ndarray
+        Target value of each row.
+    ag : np.ndarray
+        Product of the design weight and the g weight of each row.
+    ratio_estimation_treshold : np.ndarray
+        Ratio estimation threshold of each row.
+    non_winsorised : np.ndarray
+        Bool array, True for census rows and rows which can't be winsorised.
 
-    division_with_0 = ~non_winsorised & (df[target_variable] == 0)
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Winsorised target and outlier weight of each row.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        new_target_variable = np.where(
+            y <= ratio_estimation_treshold,
+            y,
+            (y / ag) + (ratio_estimation_treshold - (ratio_estimation_treshold / ag)),
+        )
+        outlier_weight = new_target_variable / y
 
-    df["outlier_weight"] = df["outlier_weight"].mask(
-        non_winsorised | division_with_0, 1
-    )
+    not_winsorised = non_winsorised | (y == 0)
 
-    df["new_target_variable"] = df["new_target_variable"].mask(
-        non_winsorised | division_with_0, np.nan
+    return (
+        np.where(not_winsorised, np.nan, new_target_variable),
+        np.where(not_winsorised, 1.0, outlier_weight),
     )
-
-    return df
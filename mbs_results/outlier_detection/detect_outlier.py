@@ -1,54 +1,73 @@
-import pandas as pd
-
 from mbs_results.outlier_detection.winsorisation import winsorise
 from mbs_results.utilities.constrains import (
     enforce_export_weight_constraint,
     replace_with_manual_outlier_weights,
     update_derived_weight_and_winsorised_value,
 )
-from mbs_results.utilities.inputs import read_csv_wrapper
+from mbs_results.utilities.lookups import map_lookup, read_lookup
 
 
 def join_l_values(df, l_values_path, classification_values_path, config):
-    """Read l values, classifications and drop duplicates and period"""
+    """
+    Map classification and l values onto df, from lookups of the SIC
+    classification and l value files which are read once per process.
+
+    Raises a ValueError if df already has a column of either file, e.g.
+    classification, as mapped columns would replace it.
+    """
 
     l_value_question_no = config["l_value_question_no"]
 
-    l_values = read_csv_wrapper(
-        l_values_path,
+    # Map on SIC to get classification, SIC is called from config
+    classification_values = read_lookup(
+        classification_values_path,
+        ["sic_5_digit"],
         config["platform"],
         config["bucket"],
-        dtype={"classification": "str"},
+        dtype=str,
     )
+    check_no_mapped_columns(df, classification_values, [config["sic"]])
 
-    # Merge on classification SIC map (merge on SIC to get classsificaion on df -> )
-    # SIC is now called from config
-    classification_values = read_csv_wrapper(
-        classification_values_path, config["platform"], config["bucket"], dtype=str
-    )
-    df = pd.merge(
-        df,
-        classification_values,
-        left_on=config["sic"],
-        right_on="sic_5_digit",
-        how="left",
+    # Columns are added to a shallow copy, so df is neither copied nor changed
+    df = df.copy(deep=False)
+
+    df[list(classification_values)] = map_lookup(
+        df, classification_values, [config["sic"]]
     )
-    # left on question frocsic .-> Change to left on question_no
-    # and classication from above
-    df = pd.merge(
-        df,
-        l_values,
-        how="left",
-        left_on=[config["question_no"], "classification"],
-        right_on=[l_value_question_no, "classification"],
+
+    # Map on question_no and classification from above
+    l_values = read_lookup(
+        l_values_path,
+        [l_value_question_no, "classification"],
+        config["platform"],
+        config["bucket"],
+        dtype={"classification": "str"},
     )
+    l_value_columns = map_lookup(
+        df, l_values, [config["question_no"], "classification"]
+    ).drop(columns=[l_value_question_no, "classification"])
+
+    check_no_mapped_columns(df, l_value_columns, [])
 
-    if l_value_question_no != config["question_no"]:
-        df.drop(columns=l_value_question_no, inplace=True)
+    df[list(l_value_columns)] = l_value_columns
 
     return df
 
 
+def check_no_mapped_columns(df, lookup, keys):
+    """
+    Raises a ValueError if df already has a column of lookup, other than the
+    keys it is mapped on.
+    """
+    existing_columns = df.columns.intersection(lookup.columns).difference(keys)
+
+    if not existing_columns.empty:
+        raise ValueError(
+            f"Columns {list(existing_columns)} are already in the dataframe, "
+            "they would be replaced by the mapped lookup"
+        )
+
+
 def detect_outlier(df, config):
     """
     # Todo: docstrings
@@ -57,22 +76,24 @@ def detect_outlier(df, config):
         df, config["l_values_path"], config["classification_values_path"], config
     )
 
-    post_win = pre_win.groupby(config["question_no"])[pre_win.columns].apply(
-        lambda df: winsorise(
-            df,
-            "calibration_group",
-            config["period"],
-            config["auxiliary"],
-            config["census"],
-            "design_weight",
-            "calibration_factor",
-            config["target"],
-            "l_value",
-        )
+    # Rows ordered and filtered by question number as a groupby would, the
+    # weighted sums are calculated separately for each question number
+    pre_win = pre_win.loc[pre_win[config["question_no"]].notna()].sort_values(
+        config["question_no"], kind="stable"
     )
 
-    # Remove groupby leftovers
-    post_win.reset_index(drop=True, inplace=True)
+    post_win = winsorise(
+        pre_win,
+        "calibration_group",
+        config["period"],
+        config["auxiliary"],
+        config["census"],
+        "design_weight",
+        "calibration_factor",
+        config["target"],
+        "l_value",
+        question_no=config["question_no"],
+    )
 
     # Replace outlier weights
     post_win = replace_with_manual_outlier_weights(
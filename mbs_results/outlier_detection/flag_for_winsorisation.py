@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def winsorisation_flag(df, a_weight, g_weight):
     """
     Function to create a column to flag whether or not a row should have
@@ -22,11 +25,27 @@ def winsorisation_flag(df, a_weight, g_weight):
         Dataframe with an additional column (nw_ag_flag) that indicates if
         winsorisation should be applied.
     """
-    df = df.copy()
-    df["flag_calculation"] = df[a_weight] * df[g_weight]
+    return df.assign(
+        nw_ag_flag=flag_non_winsorised_weights(
+            df[a_weight].to_numpy(dtype="float64")
+            * df[g_weight].to_numpy(dtype="float64")
+        )
+    )
 
-    df["nw_ag_flag"] = df["flag_calculation"].apply(lambda x: True if x <= 1 else False)
 
-    df = df.drop("flag_calculation", axis=1)
+def flag_non_winsorised_weights(ag: np.ndarray) -> np.ndarray:
+    """
+    Flags rows which can't be winsorised, i.e. rows where the product of the
+    design weight and the g weight is at most 1.
 
-    return df
+    Parameters
+    ----------
+    ag : np.ndarray
+        Product of the design weight and the g weight of each row.
+
+    Returns
+    -------
+    np.ndarray
+        Bool array, True where winsorisation can't be applied.
+    """
+    return ag <= 1
@@ -1,15 +1,18 @@
 import pandas as pd
 
 from mbs_results.outlier_detection.calculate_predicted_unit_value import (
-    calculate_predicted_unit_value,
+    predict_unit_values,
 )
 from mbs_results.outlier_detection.calculate_ratio_estimation import (
-    calculate_ratio_estimation,
+    calculate_ratio_estimation_threshold,
 )
 from mbs_results.outlier_detection.calculate_winsorised_weight import (
-    calculate_winsorised_weight,
+    calculate_outlier_weights,
 )
-from mbs_results.outlier_detection.flag_for_winsorisation import winsorisation_flag
+from mbs_results.outlier_detection.flag_for_winsorisation import (
+    flag_non_winsorised_weights,
+)
+from mbs_results.utilities.utils import get_group_codes
 
 
 def winsorise(
@@ -22,6 +25,7 @@ def winsorise(
     g_weight: str,
     target_variable: str,
     l_values,
+    question_no: str = None,
 ) -> pd.DataFrame:
     """
     Applies a technique known as one-sided Winsorisation. The objective of the
@@ -34,6 +38,10 @@ def winsorise(
     calculated depends upon whether expansion or ratio estimation is used in
     this case.
 
+    The kernels of winsorisation_flag, calculate_predicted_unit_value,
+    calculate_ratio_estimation and calculate_winsorised_weight are applied in
+    one pass on arrays, so the frame is not copied or merged between steps.
+
     Parameters
     ----------
     df : pd.Dataframe
@@ -54,6 +62,9 @@ def winsorise(
         Column name of the predicted target variable.
     l_values: str
         column name containing the l values as provided by methodology.
+    question_no : str, optional
+        Column name containing question number, if given weighted sums are
+        calculated separately for each question number.
 
     Returns
     -------
@@ -61,40 +72,39 @@ def winsorise(
         A pandas DataFrame with a new column containing the winsorised weights.
     """
 
-    return (
-        df.pipe(winsorisation_flag, a_weight, g_weight)
-        .pipe(
-            calculate_predicted_unit_value,
-            group,
-            period,
-            aux,
-            census,
-            a_weight,
-            target_variable,
-            "nw_ag_flag",
-        )
-        .pipe(
-            calculate_ratio_estimation,
-            aux,
-            census,
-            a_weight,
-            g_weight,
-            target_variable,
-            "predicted_unit_value",
-            l_values,
-            "nw_ag_flag",
-        )
-        .pipe(
-            calculate_winsorised_weight,
-            group,
-            period,
-            aux,
-            census,
-            a_weight,
-            g_weight,
-            target_variable,
-            "predicted_unit_value",
-            "ratio_estimation_treshold",
-            "nw_ag_flag",
-        )
+    keys = [group, period] if question_no is None else [question_no, group, period]
+
+    a = df[a_weight].to_numpy(dtype="float64")
+    ag = a * df[g_weight].to_numpy(dtype="float64")
+    y = df[target_variable].to_numpy(dtype="float64")
+
+    nw_ag_flag = flag_non_winsorised_weights(ag)
+
+    non_winsorised = df[census].to_numpy() | nw_ag_flag
+
+    predicted_unit_value = predict_unit_values(
+        a,
+        df[aux].to_numpy(dtype="float64"),
+        y,
+        get_group_codes(df, keys),
+        non_winsorised,
     )
+
+    ratio_estimation_treshold = calculate_ratio_estimation_threshold(
+        predicted_unit_value,
+        df[l_values].to_numpy(dtype="float64"),
+        ag,
+        non_winsorised,
+    )
+
+    new_target_variable, outlier_weight = calculate_outlier_weights(
+        y, ag, ratio_estimation_treshold, non_winsorised
+    )
+
+    return df.assign(
+        nw_ag_flag=nw_ag_flag,
+        predicted_unit_value=predicted_unit_value,
+        ratio_estimation_treshold=ratio_estimation_treshold,
+        new_target_variable=new_target_variable,
+        outlier_weight=outlier_weight,
+    ).reset_index(drop=True)
@@ -64,6 +64,8 @@ def read_and_combine_ludets_files(config: dict) -> pd.DataFrame:
                 period=config["period"],
                 import_platform=config["platform"],
                 bucket_name=config["bucket"],
+                cache_path=config.get("idbr_cache_path"),
+                cache_format=config.get("idbr_cache_format", "parquet"),
             )
             for f in sample_files
         ],
@@ -2,9 +2,11 @@ import logging
 
 import pandas as pd
 
-from mbs_results.imputation.calculate_imputation_link import calculate_imputation_link
+from mbs_results.imputation.calculate_imputation_link import (
+    calculate_imputation_link_table,
+    join_imputation_link_table,
+)
 from mbs_results.imputation.construction_matches import flag_construction_matches
-from mbs_results.imputation.flag_and_count_matched_pairs import count_matches
 from mbs_results.outputs.selective_editing_outputs import create_se_outputs
 from mbs_results.staging.back_data import read_and_process_back_data
 from mbs_results.staging.data_cleaning import (
@@ -15,7 +17,7 @@ from mbs_results.staging.data_cleaning import (
 from mbs_results.staging.stage_dataframe import drop_derived_questions
 from mbs_results.utilities.inputs import load_config
 from mbs_results.utilities.outputs import save_df
-from mbs_results.utilities.utils import get_or_create_run_id
+from mbs_results.utilities.utils import convert_datetime_to_int, get_or_create_run_id
 
 logger = logging.getLogger(__name__)
 
@@ -101,48 +103,21 @@ def imputation_processing(back_data: pd.DataFrame, config: dict) -> pd.DataFrame
         back_data, config["cell_number"], "imputation_class"
     )
 
-    # Run apply_imputation_link function to get construction links
-    back_data_cons_matches = (
-        back_data.groupby(config["question_no"])
-        .apply(lambda df: flag_construction_matches(df, **config))
-        .reset_index(drop=True)
-    )
-
-    back_data_cons_matches = (
-        back_data_cons_matches.groupby(config["question_no"])
-        .apply(
-            lambda df: count_matches(
-                df,
-                flag="flag_construction_matches",
-                period=config["period"],
-                strata="imputation_class",
-            )
-        )
-        .reset_index(drop=True)
-    )
-
-    # group by question number then apply this function
-    back_data_imputation = (
-        back_data_cons_matches.groupby(config["question_no"])
-        .apply(
-            lambda df: calculate_imputation_link(
-                df,
-                match_col="flag_construction_matches",
-                link_col="construction_link",
-                predictive_variable=config["auxiliary_converted"],
-                strata="imputation_class",
-                target=config["target"],
-                period=config["period"],
-            )
-        )
-        .reset_index(drop=True)
+    back_data_imputation = calculate_construction_links(
+        back_data,
+        question_no=config["question_no"],
+        strata="imputation_class",
+        period=config["period"],
+        target=config["target"],
+        auxiliary=config["auxiliary"],
+        predictive_variable=config["auxiliary_converted"],
     )
 
     # Changing period back into int. Read_colon_sep_file should be updated to enforce
     # data types as per the config.
 
-    back_data_imputation["period"] = (
-        back_data_imputation["period"].dt.strftime("%Y%m").astype("int")
+    back_data_imputation["period"] = convert_datetime_to_int(
+        back_data_imputation["period"]
     )
     back_data_imputation[config["sic"]] = back_data_imputation[config["sic"]].astype(
         "str"
@@ -151,6 +126,84 @@ def imputation_processing(back_data: pd.DataFrame, config: dict) -> pd.DataFrame
     return back_data_imputation
 
 
+def calculate_construction_links(
+    df: pd.DataFrame,
+    question_no: str,
+    strata: str,
+    period: str,
+    target: str,
+    auxiliary: str,
+    predictive_variable: str,
+) -> pd.DataFrame:
+    """
+    Flags construction matches, counts them and calculates construction links
+    for all question numbers at once, using a code of each question number
+    and strata combination as the strata of the link table. Gives the same
+    output as running flag_construction_matches, count_matches and
+    calculate_imputation_link for each question number.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Back data with all question numbers.
+    question_no : str
+        Column name containing question number.
+    strata : str
+        Column name containing strata information (imputation class).
+    period : str
+        Column name containing time period.
+    target : str
+        Column name of the targeted variable.
+    auxiliary : str
+        Column name of the auxiliary variable used to flag matches.
+    predictive_variable : str
+        Column name of the auxiliary variable used to calculate links.
+
+    Returns
+    -------
+    pd.DataFrame
+        Back data sorted by question number with flag_construction_matches,
+        flag_construction_matches_count, construction_link and
+        default_link_flag_construction_matches columns.
+    """
+    df = flag_construction_matches(
+        df, target=target, period=period, auxiliary=auxiliary
+    )
+
+    # Rows with a missing question number or strata have a missing code, so
+    # they get no link
+    question_strata = f"{question_no}_{strata}"
+    df[question_strata] = df.groupby([question_no, strata], sort=False).ngroup()
+
+    link_table = calculate_imputation_link_table(
+        df,
+        period=period,
+        strata=question_strata,
+        match_col="flag_construction_matches",
+        target=target,
+        predictive_variable=predictive_variable,
+        link_col="construction_link",
+    )
+
+    df = join_imputation_link_table(
+        df,
+        link_table[
+            [
+                "flag_construction_matches_count",
+                "construction_link",
+                "default_link_flag_construction_matches",
+            ]
+        ],
+        [question_strata, period],
+    )
+
+    return (
+        df.drop(columns=question_strata)
+        .sort_values(question_no, kind="stable")
+        .reset_index(drop=True)
+    )
+
+
 if __name__ == "__main__":
     print("wrapper start")
     period_zero_se_wrapper()
@@ -3,6 +3,7 @@ import warnings
 
 import pandas as pd
 
+from mbs_results.imputation.imputation_flags import convert_to_imputation_marker
 from mbs_results.staging.data_cleaning import (
     create_form_type_spp_column,
     enforce_datatypes,
@@ -160,10 +161,12 @@ def read_back_data(config: dict) -> pd.DataFrame:
         keep_columns=config["finalsel_keep_cols"],
         import_platform=config["platform"],
         bucket_name=config["bucket"],
-    )
-    # keep columns is applied in data reading from source, enforcing dtypes
-    # in all columns of finalsel
-    finalsel = enforce_datatypes(finalsel, keep_columns=list(finalsel), **config)
+        # keep columns is applied in data reading from source, enforcing dtypes
+        # in all columns of finalsel
+        column_types=config["master_column_type_dict"],
+        cache_path=config.get("idbr_cache_path"),
+        cache_format=config.get("idbr_cache_format", "parquet"),
+    ).drop(columns=config["temporarily_remove_cols"], errors="ignore")
 
     join_type = "left"
 
@@ -204,6 +207,11 @@ def append_back_data(staged_data: pd.DataFrame, config: dict) -> pd.DataFrame:
         back_data = back_data[back_data[config["imputation_marker_col"]] != "derived"]
         warnings.warn("Removing derived values from back")
 
+    # Markers are normalised once here, imputation compares category codes
+    back_data[config["imputation_marker_col"]] = convert_to_imputation_marker(
+        back_data[config["imputation_marker_col"]]
+    )
+
     common_cols = list(staged_data.columns.intersection(back_data.columns))
 
     common_cols.append(config["imputation_marker_col"])
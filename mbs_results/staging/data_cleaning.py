@@ -5,7 +5,11 @@ from typing import List
 import pandas as pd
 
 from mbs_results.utilities.inputs import read_csv_wrapper
-from mbs_results.utilities.utils import convert_column_to_datetime
+from mbs_results.utilities.utils import (
+    convert_column_to_datetime,
+    convert_column_types,
+    convert_datetime_to_int,
+)
 from mbs_results.utilities.validation_checks import (  # validate_manual_constructions,
     validate_indices,
 )
@@ -156,16 +160,8 @@ def enforce_datatypes(
         # None handles cases when key is not included in joint_dict
         keep_columns.pop(key1, None)
 
-    for key in subset_dict:
-        type_from_dict = subset_dict[key]
-        if type_from_dict in ["str", "float", "bool", "category"]:
-            df_convert[key] = df_convert[key].astype(type_from_dict)
-        elif type_from_dict == "int":
-            df_convert[key] = df_convert[key].astype("int64")
-        elif type_from_dict == "date":
-            df_convert[key] = convert_column_to_datetime(df_convert[key])
     # Re-set the index back to reference and period
-    return df_convert
+    return convert_column_types(df_convert, subset_dict)
 
 
 def load_manual_constructions(
@@ -248,14 +244,24 @@ def join_manual_constructions(
     question_no_from_df = df[question_no].unique().tolist()
     manual_constructions_filter = manual_constructions.loc[
         manual_constructions[question_no].isin(question_no_from_df)
-    ]
+    ].copy()
 
     if manual_constructions_filter.empty:
         # return original df as nothing present to use
         # as manual construction
         return df
     else:
-        manual_constructions_filter.drop(columns=[question_no], inplace=True)
+        join_columns = [reference, period]
+        if len(question_no_from_df) > 1:
+            # Several question numbers are imputed together, question number
+            # is needed to join manual constructions onto the correct question
+            join_columns.append(question_no)
+            manual_constructions_filter[question_no] = manual_constructions_filter[
+                question_no
+            ].astype(df[question_no].dtype)
+        else:
+            manual_constructions_filter.drop(columns=[question_no], inplace=True)
+
         if period not in df.columns or reference not in df.columns:
             df = df.reset_index()
 
@@ -276,7 +282,7 @@ def join_manual_constructions(
 
         df = df.merge(
             manual_constructions_filter,
-            on=[reference, period],
+            on=join_columns,
             how="left",
             suffixes=("", "_man_from_file"),
         ).reset_index()
@@ -482,7 +488,7 @@ def is_census(calibration_group: pd.Series, extra_bands: List) -> pd.Series:
         A bool series, TRUE if calibration group is cencus
     """
 
-    rule_band_4_5 = calibration_group.astype(str).map(lambda x: x.endswith(("4", "5")))
+    rule_band_4_5 = calibration_group.astype(str).str.endswith(("4", "5"))
 
     rule_extra_bands = calibration_group.isin(extra_bands)
 
@@ -520,8 +526,8 @@ def filter_out_questions(
     keep_questions_df.reset_index(drop=True, inplace=True)
     filter_out_questions_df.reset_index(drop=True, inplace=True)
 
-    filter_out_questions_df["period"] = (
-        filter_out_questions_df["period"].dt.strftime("%Y%m").astype("int")
+    filter_out_questions_df["period"] = convert_datetime_to_int(
+        filter_out_questions_df["period"]
     )
 
     return keep_questions_df, filter_out_questions_df
@@ -25,13 +25,18 @@ from mbs_results.utilities.constrains import constrain
 from mbs_results.utilities.file_selector import find_files
 from mbs_results.utilities.inputs import read_colon_separated_file, read_csv_wrapper
 from mbs_results.utilities.outputs import save_df, write_csv_wrapper
-from mbs_results.utilities.utils import convert_column_to_datetime
+from mbs_results.utilities.utils import (
+    convert_column_to_datetime,
+    convert_datetime_to_int,
+)
 from mbs_results.utilities.validation_checks import validate_manual_constructions
 
 logger = logging.getLogger(__name__)
 
 
-def read_and_combine_colon_sep_files(config: dict) -> pd.DataFrame:
+def read_and_combine_colon_sep_files(
+    config: dict, column_types: dict = None
+) -> pd.DataFrame:
     """
     reads in and combined colon separated files from the specified folder path
 
@@ -43,6 +48,9 @@ def read_and_combine_colon_sep_files(config: dict) -> pd.DataFrame:
         list of column names in colon separated file
     config : dict
         main pipeline config containing period column name
+    column_types : dict, optional
+        column names and data types to enforce in each file, e.g.
+        `master_column_type_dict`.
 
     Returns
     -------
@@ -65,6 +73,9 @@ def read_and_combine_colon_sep_files(config: dict) -> pd.DataFrame:
                 period=config["period"],
                 import_platform=config["platform"],
                 bucket_name=config["bucket"],
+                column_types=column_types,
+                cache_path=config.get("idbr_cache_path"),
+                cache_format=config.get("idbr_cache_format", "parquet"),
             )
             for f in sample_files
         ],
@@ -120,11 +131,12 @@ def stage_dataframe(config: dict) -> pd.DataFrame:
         responses, keep_columns=config["responses_keep_cols"], **config
     )
 
-    finalsel = read_and_combine_colon_sep_files(config)
-
     # keep columns is applied in data reading from source, enforcing dtypes
-    # in all columns of finalsel
-    finalsel = enforce_datatypes(finalsel, keep_columns=list(finalsel), **config)
+    # in all columns of finalsel, temporarily removed columns are dropped after
+    # the read so cached files do not depend on them
+    finalsel = read_and_combine_colon_sep_files(
+        config, column_types=config["master_column_type_dict"]
+    ).drop(columns=config["temporarily_remove_cols"], errors="ignore")
 
     # Filter contributors files here to temp fix this overlap
 
@@ -358,10 +370,9 @@ def start_of_period_staging(
         )
         config["current_period"] = config["selective_editing_period"]
 
-        finalsel = read_and_combine_colon_sep_files(config)
-        finalsel = enforce_datatypes(
-            finalsel, keep_columns=config["finalsel_keep_cols"] + ["period"], **config
-        )
+        finalsel = read_and_combine_colon_sep_files(
+            config, column_types=config["master_column_type_dict"]
+        ).drop(columns=config["temporarily_remove_cols"], errors="ignore")
 
         idbr_to_spp_mapping = config["idbr_to_spp"]
         finalsel[config["form_id_spp"]] = (
@@ -391,8 +402,8 @@ def start_of_period_staging(
             how="right",
         )
 
-        imputation_output_with_missing["period"] = (
-            imputation_output_with_missing["period"].dt.strftime("%Y%m").astype(int)
+        imputation_output_with_missing["period"] = convert_datetime_to_int(
+            imputation_output_with_missing["period"]
         )
 
         imputation_output_with_missing[config["auxiliary_converted"]] = (
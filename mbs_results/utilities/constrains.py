@@ -3,6 +3,7 @@ import operator
 import warnings
 from typing import List
 
+import numpy as np
 import pandas as pd
 
 from mbs_results.utilities.inputs import read_csv_wrapper
@@ -47,32 +48,34 @@ def replace_values_index_based(
         "==": operator.eq,
     }
 
-    series_from_a = df.loc[a][target]
+    # Positions of rows with `a` in df, in the same order as df.loc[a]
+    rows_from_a = np.flatnonzero(df.index.get_level_values(0) == a)
 
-    series_from_b = df.loc[b][target]
+    series_from_a = df.loc[a, target]
 
-    common_index = series_from_a.index.intersection(series_from_b.index)
+    series_from_b = df.loc[b, target]
 
-    # Has format (period,reference)
-    index_to_replace = series_from_a[common_index][
-        ops[compare](series_from_a[common_index], series_from_b[common_index])
-    ].index
+    # Values of b aligned to the (period,reference) index of a, the first
+    # value is used if b has duplicated indices
+    aligned_b = series_from_b[~series_from_b.index.duplicated()].reindex(
+        series_from_a.index
+    )
 
-    if len(index_to_replace) > 0:
-        for date_ref_idx in index_to_replace.values:
+    index_to_replace = series_from_a.index[ops[compare](series_from_a, aligned_b)]
 
-            # Has format (question_no,period,reference)
-            index_to_replace = (a,) + date_ref_idx
-            index_to_replace_with = (b,) + date_ref_idx
+    if len(index_to_replace) > 0:
+        # All rows of a with an index to replace, including duplicates
+        to_replace = series_from_a.index.isin(index_to_replace)
 
-            # Convert to series to ensure consistent dtype
-            # df.loc[index_to_replace_with, target] could be either series or float
+        if "constrain_marker" not in df.columns:
+            df["constrain_marker"] = pd.Series(np.nan, index=df.index, dtype=object)
 
-            replace_with_value = pd.Series(df.loc[index_to_replace_with, target]).iloc[
-                0
-            ]
-            df.loc[index_to_replace, target] = replace_with_value
-            df.loc[index_to_replace, "constrain_marker"] = f"{a} {compare} {b}"
+        df.iloc[rows_from_a[to_replace], df.columns.get_loc(target)] = aligned_b[
+            to_replace
+        ].to_numpy()
+        df.iloc[rows_from_a[to_replace], df.columns.get_loc("constrain_marker")] = (
+            f"{a} {compare} {b}"
+        )
 
 
 def sum_sub_df(df: pd.DataFrame, derive_from: List[int]) -> pd.DataFrame:
@@ -645,19 +648,28 @@ def enforce_export_weight_constraint(
     if all(q in pivot["winsorised_value"].columns for q in [40, 49]):
 
         mask = pivot["winsorised_value"][49] > pivot["winsorised_value"][40]
-        affected = pivot.index[mask].tolist()
 
-        for ref, per in affected:
+        # Q49 rows aligned to their (reference, period) row of the pivot
+        rows_49 = np.flatnonzero(df[question_code] == 49)
+        pivot_rows = pivot.index.get_indexer(
+            pd.MultiIndex.from_frame(df.iloc[rows_49][[reference, period]])
+        )
 
-            idx = (
-                (df[reference] == ref) & (df[period] == per) & (df[question_code] == 49)
-            )
+        affected = (
+            mask.to_numpy()[pivot_rows]
+            & df.iloc[rows_49][[reference, period]].notna().all(axis=1).to_numpy()
+        )
 
-            q40_weight = pivot.loc[(ref, per), (outlier_weight, 40)]
-            df.loc[idx, outlier_weight] = q40_weight
+        rows_49 = rows_49[affected]
+        pivot_rows = pivot_rows[affected]
 
-            q49_target = pivot.loc[(ref, per), (target, 49)]
-            df.loc[idx, "winsorised_value"] = q40_weight * q49_target
+        q40_weight = pivot[(outlier_weight, 40)].to_numpy()[pivot_rows]
+        q49_target = pivot[(target, 49)].to_numpy()[pivot_rows]
+
+        df.iloc[rows_49, df.columns.get_loc(outlier_weight)] = q40_weight
+        df.iloc[rows_49, df.columns.get_loc("winsorised_value")] = (
+            q40_weight * q49_target
+        )
 
     return df
 
@@ -1,7 +1,10 @@
+import hashlib
 import inspect
+import json
 import logging
 import os
 import re
+import uuid
 from typing import List
 
 import boto3
@@ -10,9 +13,15 @@ import raz_client
 from rdsa_utils.cdp.helpers.s3_utils import load_csv
 
 from mbs_results.utilities.merge_two_config_files import merge_two_config_files
+from mbs_results.utilities.utils import convert_column_types
 
 logger = logging.getLogger(__name__)
 
+IDBR_CACHE_FORMATS = {
+    "parquet": (pd.DataFrame.to_parquet, pd.read_parquet),
+    "feather": (pd.DataFrame.to_feather, pd.read_feather),
+}
+
 
 def load_config(config_user_path, config_user_dict=None):
     """Load the dev and user configs and merges into one dictionary"""
@@ -166,6 +175,175 @@ def read_colon_separated_file(
     period="period",
     import_platform: str = "network",
     bucket_name: str = None,
+    column_types: dict = None,
+    cache_path: str = None,
+    cache_format: str = "parquet",
+) -> pd.DataFrame:
+    """
+    Load a colon separated file from an S3 bucket or from a network path into
+    a Pandas DataFrame, using a local cache of parsed files if cache_path is
+    given.
+
+    Cached files hold the frame after data types are enforced, and are named
+    by a hash of the file path, its modified time and size (ETag and size on
+    S3), the reading arguments and the data types, so a changed file is parsed
+    again instead of taken from the cache.
+
+    Parameters
+    ----------
+    filepath
+        The key (full path and filename) of the CSV file in the S3 bucket or
+        in the network.
+    column_names : List[str]
+        list of column names in data file
+    keep_columns : List[str], optional
+        list of column names to keep, must be a subset of column_names.
+    period : str, optional
+        name of the period column derived from the filepath.
+    import_platform : str
+        Platform to import from. Must be either 's3' or 'network'
+    bucket_name : str, optional
+        The name of the S3 bucket,needed when `import_platform` is set to
+         `s3`. The default is None.
+    column_types : dict, optional
+        Column names and data types to enforce, as in
+        `master_column_type_dict`. Columns not in the file are ignored.
+    cache_path : str, optional
+        Local folder of the cache, created if it does not exist. Files are
+        parsed without a cache if not given.
+    cache_format : str, optional
+        File format of the cache, `parquet` (default) or `feather`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Pandas DataFrame containing the data from a colon seperated file.
+
+    Raises
+    ------
+    ValueError
+        If cache_format is not accepted.
+    """
+    read_arguments = dict(
+        filepath=filepath,
+        column_names=column_names,
+        keep_columns=keep_columns,
+        period=period,
+        import_platform=import_platform,
+        bucket_name=bucket_name,
+        column_types=column_types,
+    )
+
+    if not cache_path:
+        return parse_colon_separated_file(**read_arguments)
+
+    if cache_format not in IDBR_CACHE_FORMATS:
+        raise ValueError(
+            f"""{cache_format} is not an accepted cache format, use one of
+            {list(IDBR_CACHE_FORMATS)}"""
+        )
+
+    write_cache, read_cache = IDBR_CACHE_FORMATS[cache_format]
+
+    cache_key = hashlib.sha256(
+        json.dumps(
+            {
+                **read_arguments,
+                "filepath": str(filepath),
+                "signature": get_file_signature(filepath, import_platform, bucket_name),
+            },
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
+
+    cache_file = os.path.join(cache_path, f"{cache_key}.{cache_format}")
+
+    if os.path.exists(cache_file):
+        logger.info(f"Reading {filepath} from cache {cache_file}")
+        return read_cache(cache_file)
+
+    df = parse_colon_separated_file(**read_arguments)
+
+    os.makedirs(cache_path, exist_ok=True)
+
+    # Written under a temporary name first so a partly written file is never read
+    temporary_file = f"{cache_file}.{uuid.uuid4().hex}.tmp"
+
+    try:
+        write_cache(df, temporary_file)
+        os.replace(temporary_file, cache_file)
+
+    except (ImportError, TypeError, ValueError) as error:
+        logger.warning(f"{filepath} could not be cached: {error}")
+
+        if os.path.exists(temporary_file):
+            os.remove(temporary_file)
+
+    return df
+
+
+def get_file_signature(
+    filepath: str, import_platform: str = "network", bucket_name: str = None
+) -> dict:
+    """
+    Returns the modified time and size of a network file, or the ETag and size
+    of an S3 file, which change when the file is changed.
+
+    Parameters
+    ----------
+    filepath
+        The key (full path and filename) of the file in the S3 bucket or
+        in the network.
+    import_platform : str
+        Platform of the file. Must be either 's3' or 'network'
+    bucket_name : str, optional
+        The name of the S3 bucket,needed when `import_platform` is set to
+         `s3`. The default is None.
+
+    Returns
+    -------
+    dict
+        Signature of the file.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file does not exist.
+    Exception
+        If import_platform is not either 's3' or 'network'.
+    """
+    if import_platform == "s3":
+        client = boto3.client("s3")
+        raz_client.configure_ranger_raz(
+            client, ssl_file="/etc/pki/tls/certs/ca-bundle.crt"
+        )
+        try:
+            head = client.head_object(Bucket=bucket_name, Key=filepath)
+        except client.exceptions.ClientError:
+            raise FileNotFoundError(f"S3 file not found: {bucket_name}/{filepath}")
+
+        return {"etag": head["ETag"], "size": head["ContentLength"]}
+
+    if import_platform == "network":
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Network file not found: {filepath}")
+
+        file_stat = os.stat(filepath)
+
+        return {"modified": file_stat.st_mtime_ns, "size": file_stat.st_size}
+
+    raise Exception("platform must either be 's3' or 'network'")
+
+
+def parse_colon_separated_file(
+    filepath: str,
+    column_names: List[str],
+    keep_columns: List[str] = None,
+    period="period",
+    import_platform: str = "network",
+    bucket_name: str = None,
+    column_types: dict = None,
 ) -> pd.DataFrame:
     """
     Load a CSV file from an S3 bucket or from a network path into a Pandas
@@ -185,6 +363,9 @@ def read_colon_separated_file(
     bucket_name : str, optional
         The name of the S3 bucket,needed when `import_platform` is set to
          `s3`. The default is None.
+    column_types : dict, optional
+        Column names and data types to enforce, as in
+        `master_column_type_dict`. Columns not in the file are ignored.
 
     Returns
     -------
@@ -249,4 +430,10 @@ def read_colon_separated_file(
         logger.error(error_msg)
         raise ValueError(error_msg)
 
+    if column_types:
+        df = convert_column_types(
+            df,
+            {column: column_types[column] for column in df if column in column_types},
+        )
+
     return df
@@ -0,0 +1,133 @@
+import json
+import logging
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from mbs_results.utilities.inputs import get_file_signature, read_csv_wrapper
+
+logger = logging.getLogger(__name__)
+
+# Lookups read in this process, keyed by file, keys, dtypes and file signature
+LOOKUP_CACHE = {}
+
+
+def read_lookup(
+    filepath: str,
+    keys: List[str],
+    import_platform: str = "network",
+    bucket_name: str = None,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Reads a reference table, e.g. the classification or L-value mapping, into
+    a lookup indexed by its key columns. Lookups are cached for the process
+    and read again only if the file changes.
+
+    Rows with duplicated keys are dropped, keeping the first, so each key
+    maps to a single row. The returned dataframe is shared between callers
+    and must not be modified.
+
+    Parameters
+    ----------
+    filepath : str
+        The key (full path and filename) of the CSV file in the S3 bucket or
+        in the network.
+    keys : List[str]
+        Column names of the lookup keys.
+    import_platform : str
+        Platform to import from. Must be either 's3' or 'network'
+    bucket_name : str, optional
+        The name of the S3 bucket,needed when `import_platform` is set to
+         `s3`. The default is None.
+    kwargs
+        Additional keyword arguments to pass to the `pd.read_csv` method,
+        e.g. dtype.
+
+    Returns
+    -------
+    pd.DataFrame
+        Reference table indexed by the key columns, key columns are also kept
+        as columns.
+    """
+    cache_key = (
+        str(filepath),
+        tuple(keys),
+        import_platform,
+        bucket_name,
+        json.dumps(get_file_signature(filepath, import_platform, bucket_name)),
+        repr(sorted(kwargs.items())),
+    )
+
+    if cache_key not in LOOKUP_CACHE:
+        lookup = read_csv_wrapper(filepath, import_platform, bucket_name, **kwargs)
+
+        duplicated = lookup.duplicated(subset=keys)
+
+        if duplicated.any():
+            logger.warning(
+                f"{duplicated.sum()} rows with duplicated {keys} dropped from "
+                f"{filepath}"
+            )
+
+        LOOKUP_CACHE[cache_key] = lookup.loc[~duplicated].set_index(keys, drop=False)
+
+    return LOOKUP_CACHE[cache_key]
+
+
+def map_lookup(
+    df: pd.DataFrame, lookup: pd.DataFrame, left_on: List[str]
+) -> pd.DataFrame:
+    """
+    Returns the rows of lookup matching the key columns of each row of df,
+    aligned to the index of df. Rows without a match, or with a missing key,
+    are missing.
+
+    Keys of df are factorised, so each distinct key is looked up once and
+    mapped back to rows by its code.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe to map the lookup onto.
+    lookup : pd.DataFrame
+        Reference table indexed by its keys, as returned by read_lookup.
+    left_on : List[str]
+        Column names in df matching the index levels of lookup.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns of lookup with the index of df.
+    """
+    key_codes, key_uniques = zip(*(pd.factorize(df[key]) for key in left_on))
+
+    # Codes of each key combined into one integer code per row
+    combined_codes = np.zeros(len(df), dtype="int64")
+
+    for codes, uniques in zip(key_codes, key_uniques):
+        combined_codes = combined_codes * len(uniques) + codes
+
+    is_missing = np.any([codes < 0 for codes in key_codes], axis=0)
+
+    codes = np.full(len(df), -1)
+    codes[~is_missing], combined_uniques = pd.factorize(combined_codes[~is_missing])
+
+    # Each distinct combination is split back into the unique value of each key
+    unique_values = []
+
+    for uniques in reversed(key_uniques):
+        unique_values.insert(0, uniques.take(combined_uniques % max(len(uniques), 1)))
+        combined_uniques = combined_uniques // max(len(uniques), 1)
+
+    if len(left_on) == 1:
+        positions = lookup.index.get_indexer(unique_values[0])
+
+    else:
+        positions = lookup.index.get_indexer(pd.MultiIndex.from_arrays(unique_values))
+
+    # Missing keys have code -1, which takes the appended -1
+    positions = np.append(positions, -1)[codes]
+
+    return lookup.reset_index(drop=True).reindex(positions).set_axis(df.index)
@@ -27,6 +27,72 @@ def convert_column_to_datetime(dates):
     return pd.to_datetime(dates, format="%Y%m")
 
 
+def convert_datetime_to_int(dates):
+    """
+    Convert datetime pandas series to YYYYMM integers (for outputs), inverse
+    of convert_column_to_datetime.
+
+    Parameters
+    ----------
+    dates : pd.Series.
+
+    Returns
+    -------
+    df : pd.Series
+    """
+    return (dates.dt.year * 100 + dates.dt.month).astype("int")
+
+
+def period_to_ordinal(period):
+    """
+    Convert periods to month ordinals (months since year 0), so that shifting
+    and comparing periods is integer arithmetic instead of date offsets.
+
+    Parameters
+    ----------
+    period : pd.Series, pd.Timestamp, int or str
+        Datetime periods, or periods in YYYYMM format.
+
+    Returns
+    -------
+    pd.Series or int
+        Month ordinals, int32 if a series was passed.
+    """
+    if isinstance(period, pd.Series):
+        if pd.api.types.is_datetime64_any_dtype(period):
+            ordinal = period.dt.year * 12 + period.dt.month - 1
+        else:
+            period = period.astype("int64")
+            ordinal = (period // 100) * 12 + period % 100 - 1
+
+        return ordinal.astype("int32")
+
+    if isinstance(period, datetime.date):
+        return period.year * 12 + period.month - 1
+
+    period = int(period)
+
+    return (period // 100) * 12 + period % 100 - 1
+
+
+def ordinal_to_period(ordinal):
+    """
+    Convert month ordinals created by period_to_ordinal back to periods in
+    YYYYMM format.
+
+    Parameters
+    ----------
+    ordinal : pd.Series or int
+        Month ordinals.
+
+    Returns
+    -------
+    pd.Series or int
+        Periods in YYYYMM format.
+    """
+    return (ordinal // 12) * 100 + ordinal % 12 + 1
+
+
 def get_versioned_filename(prefix, run_id):
 
     filename = f"{prefix}_{run_id}.csv"
@@ -456,3 +522,51 @@ def multi_filter_list(master_list: list, *args: str) -> list:
         result = [list_value for list_value in result if arg in list_value]
 
     return result
+
+
+def get_group_codes(df: pd.DataFrame, keys: list) -> np.ndarray:
+    """
+    Returns the group number of each row of df, -1 where a key is missing.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe to group.
+    keys : list
+        Column names to group by.
+
+    Returns
+    -------
+    np.ndarray
+        Group numbers in sorted key order.
+    """
+    return df.groupby(keys).ngroup().fillna(-1).to_numpy(dtype="int64")
+
+
+def convert_column_types(df: pd.DataFrame, column_types: dict) -> pd.DataFrame:
+    """
+    Converts columns of df to the data types in column_types, in place.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe with all columns in column_types.
+    column_types : dict
+        Column names and data types, as in `master_column_type_dict`. Types
+        other than `str`, `float`, `bool`, `category`, `int` and `date` are
+        left unchanged.
+
+    Returns
+    -------
+    pd.DataFrame
+        df with converted columns.
+    """
+    for column, column_type in column_types.items():
+        if column_type in ["str", "float", "bool", "category"]:
+            df[column] = df[column].astype(column_type)
+        elif column_type == "int":
+            df[column] = df[column].astype("int64")
+        elif column_type == "date":
+            df[column] = convert_column_to_datetime(df[column])
+
+    return df
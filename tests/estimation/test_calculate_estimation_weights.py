@@ -5,6 +5,7 @@ from pandas.testing import assert_frame_equal
 from mbs_results.estimation.calculate_estimation_weights import (
     calculate_calibration_factor,
     calculate_design_weight,
+    calculate_estimation_weights,
 )
 
 
@@ -43,3 +44,35 @@ class TestEstimation:
         )
 
         assert_frame_equal(actual_output, expected_output)
+
+    def test_calculate_estimation_weights(self):
+        input_data = pd.DataFrame(
+            {
+                "period": [202201] * 6,
+                "strata": [101, 101, 101, 102, 104, 104],
+                "calibration_group": [101, 101, 101, 102, 104, 104],
+                "sampled": [True, False, False, False, True, False],
+                "auxiliary": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+            }
+        )
+
+        actual_output = calculate_estimation_weights(
+            input_data,
+            calibration_group="calibration_group",
+            census_extra_calibration_group=[],
+            period="period",
+            strata="strata",
+            group="strata",
+            sampled="sampled",
+            auxiliary="auxiliary",
+            design_weight="design_weight",
+        )
+
+        # Stratum 102 has no sample and 104 is census, non census rows first
+        expected_output = input_data.assign(
+            design_weight=[3.0, 3.0, 3.0, None, 1.0, 1.0],
+            calibration_factor=[2.0, 2.0, 2.0, None, 1.0, 1.0],
+            is_census=[False, False, False, False, True, True],
+        )
+
+        assert_frame_equal(actual_output, expected_output)
@@ -1,7 +1,12 @@
+import pandas as pd
 import pytest
-from pandas.testing import assert_frame_equal
+from pandas.testing import assert_frame_equal, assert_series_equal
 
-from mbs_results.imputation.calculate_imputation_link import calculate_imputation_link
+from mbs_results.imputation.calculate_imputation_link import (
+    calculate_imputation_link,
+    calculate_imputation_link_table,
+    merge_imputation_link_table,
+)
 from tests.helper_functions import load_and_format
 
 
@@ -62,3 +67,101 @@ class TestLinks:
         )
 
         assert_frame_equal(df_input, df_output, check_like=True)
+
+    def test_calculate_imputation_links_missing_strata(self, construction_test_data):
+        """Rows without strata get no link, other rows are unaffected"""
+        df_input = construction_test_data.drop(columns=["construction_link"])
+        df_input["group"] = df_input["group"].astype("float")
+        df_input.loc[0, "group"] = None
+
+        df_output = calculate_imputation_link(
+            df_input,
+            "period",
+            "group",
+            "flag_construction_matches",
+            "target",
+            "auxiliary",
+            "construction_link",
+        )
+
+        expected_links = construction_test_data["construction_link"].copy()
+        expected_links[0] = None
+
+        assert_series_equal(df_output["construction_link"], expected_links)
+
+
+class TestLinkTable:
+    def test_link_table_one_row_per_strata_period(self, forward_backward_test_data):
+        """Test the link table has the links of calculate_imputation_link"""
+        df = forward_backward_test_data.drop(columns=["f_link"])
+
+        link_table = calculate_imputation_link_table(
+            df,
+            "period",
+            "group",
+            "f_matched_pair",
+            "target",
+            "f_predictive_question",
+            "f_link",
+        )
+
+        assert link_table.index.is_unique
+        assert list(link_table.columns) == [
+            "f_link",
+            "default_link_f_matched_pair",
+            "f_matched_pair_count",
+        ]
+
+        expected_output = forward_backward_test_data.groupby(
+            ["group", "period"], sort=False
+        ).agg(
+            f_link=("f_link", "first"),
+            f_matched_pair_count=("f_matched_pair", "sum"),
+        )
+
+        assert_series_equal(link_table["f_link"], expected_output["f_link"])
+        assert_series_equal(
+            link_table["f_matched_pair_count"],
+            expected_output["f_matched_pair_count"],
+        )
+
+    def test_link_table_round_trip(self, forward_backward_test_data):
+        """Test links merged from a link table match the calculated links"""
+        df = forward_backward_test_data.copy()
+        df["questioncode"] = 40
+
+        link_table = pd.concat(
+            [
+                calculate_imputation_link_table(
+                    df, "period", "group", match, "target", predictive, link
+                )
+                for match, predictive, link in [
+                    ("f_matched_pair", "f_predictive_question", "f_link_target"),
+                    ("b_matched_pair", "b_predictive_question", "b_link_target"),
+                ]
+            ],
+            axis=1,
+        ).reset_index()
+        link_table["questioncode"] = 40
+
+        expected_output = df[["questioncode", "group", "period"]].copy()
+
+        for match, predictive, link in [
+            ("f_matched_pair", "f_predictive_question", "f_link_target"),
+            ("b_matched_pair", "b_predictive_question", "b_link_target"),
+        ]:
+            expected_output[[link, "default_link_" + match]] = (
+                calculate_imputation_link(
+                    df.copy(), "period", "group", match, "target", predictive, link
+                )[[link, "default_link_" + match]]
+            )
+
+        actual_output = merge_imputation_link_table(
+            df[["questioncode", "group", "period"]],
+            link_table,
+            "questioncode",
+            "group",
+            "period",
+        )
+
+        assert_frame_equal(actual_output[expected_output.columns], expected_output)
@@ -1,7 +1,18 @@
+import time
+
+import numpy as np
+import pandas as pd
 import pytest
+from numpy.testing import assert_array_equal
 from pandas.testing import assert_frame_equal
 
-from mbs_results.imputation.cumulative_imputation_links import get_cumulative_links
+from mbs_results.imputation import cumulative_imputation_links
+from mbs_results.imputation.cumulative_imputation_links import (
+    _segmented_cumprod_loop,
+    _segmented_cumprod_numpy,
+    get_cumulative_links,
+    segmented_cumprod,
+)
 from tests.helper_functions import load_and_format
 
 
@@ -72,3 +83,94 @@ class TestCumulativeLinks:
         )
 
         assert_frame_equal(actual_output, expected_output)
+
+
+@pytest.fixture(scope="module")
+def segmented_values():
+    rng = np.random.default_rng(0)
+
+    values = rng.uniform(0.5, 1.5, 200_000)
+    values[rng.random(len(values)) < 0.1] = np.nan
+
+    segment_start = rng.random(len(values)) < 0.2
+    segment_start[0] = True
+
+    return values, segment_start
+
+
+class TestSegmentedCumprod:
+    @pytest.mark.parametrize("reverse", [False, True])
+    def test_segmented_cumprod_matches_groupby(self, segmented_values, reverse):
+        values, segment_start = segmented_values
+        grouped = pd.Series(values[::-1] if reverse else values).groupby(
+            segment_start.cumsum()[::-1] if reverse else segment_start.cumsum()
+        )
+        expected = grouped.cumprod().to_numpy()
+
+        actual = segmented_cumprod(values, segment_start, reverse)
+
+        assert_array_equal(actual, expected[::-1] if reverse else expected)
+
+    def test_numpy_kernel_matches_loop_kernel(self, segmented_values):
+        values, segment_start = segmented_values
+
+        assert_array_equal(
+            _segmented_cumprod_numpy(values, segment_start),
+            _segmented_cumprod_loop(values, segment_start),
+        )
+
+    @pytest.mark.benchmark
+    @pytest.mark.parametrize("reverse", [False, True])
+    @pytest.mark.parametrize("kernel", ["numpy", "numba"])
+    def test_segmented_cumprod_speed(self, kernel, reverse, monkeypatch):
+        """Times segmented_cumprod against a groupby cumprod of 1m links in
+        segments of about 13 periods, best of 3 runs"""
+        if kernel == "numba":
+            pytest.importorskip("numba")
+        else:
+            monkeypatch.setattr(cumulative_imputation_links, "njit", None)
+
+        rng = np.random.default_rng(0)
+
+        values = rng.uniform(0.5, 1.5, 1_000_000)
+        values[rng.random(len(values)) < 0.1] = np.nan
+
+        segment_start = rng.random(len(values)) < 1 / 13
+        segment_start[0] = True
+        segment_end = np.append(segment_start[1:], True)
+
+        def groupby_cumprod():
+            if reverse:
+                return (
+                    pd.Series(values[::-1])
+                    .groupby(segment_end[::-1].cumsum())
+                    .cumprod()
+                    .to_numpy()[::-1]
+                )
+
+            return pd.Series(values).groupby(segment_start.cumsum()).cumprod()
+
+        def best_time(function):
+            times = []
+            for _ in range(3):
+                start = time.perf_counter()
+                output = function()
+                times.append(time.perf_counter() - start)
+            return min(times), np.asarray(output)
+
+        # Compiles the numba kernel before it is timed
+        segmented_cumprod(values[:10], segment_start[:10], reverse)
+
+        kernel_time, actual = best_time(
+            lambda: segmented_cumprod(values, segment_start, reverse)
+        )
+        groupby_time, expected = best_time(groupby_cumprod)
+
+        assert_array_equal(actual, expected)
+
+        if kernel == "numba":
+            assert kernel_time * 2 < groupby_time
+        else:
+            # The NumPy kernel is about as fast as groupby, it avoids copying
+            # the link columns into a grouped frame
+            assert kernel_time < groupby_time * 1.5
@@ -0,0 +1,183 @@
+import json
+import tracemalloc
+
+import pandas as pd
+import pytest
+
+from mbs_results.imputation import impute
+from mbs_results.imputation.imputation_diagnostics import (
+    export_imputation_diagnostics,
+    profile_imputation_step,
+)
+from mbs_results.imputation.impute import (
+    impute_with_diagnostics,
+    ratio_of_means_single_pass,
+)
+from mbs_results.imputation.ratio_of_means import ratio_of_means
+from tests.helper_functions import load_and_format, load_filter
+
+
+@pytest.fixture(scope="class")
+def data_dir(imputation_data_dir):
+    return imputation_data_dir / "ratio_of_means"
+
+
+@pytest.fixture(scope="class")
+def diagnostics_and_output(data_dir):
+    input_data = load_and_format(data_dir / "29_mixed_data_filtered_input.csv")
+    input_data["imputation_flags_question"] = pd.Series(dtype="str")
+    input_data["questioncode"] = 40
+
+    diagnostics = []
+
+    output = ratio_of_means(
+        input_data,
+        target="question",
+        period="period",
+        reference="identifier",
+        strata="group",
+        auxiliary="other",
+        question_no="questioncode",
+        filters=load_filter(
+            data_dir / "ratio_of_means_filters" / "29_mixed_data_filtered.csv"
+        ),
+        current_period=202001,
+        revision_window=10,
+        diagnostics=diagnostics,
+    )
+
+    return diagnostics, output
+
+
+class TestImputationDiagnostics:
+    def test_diagnostics_steps(self, diagnostics_and_output):
+        diagnostics, output = diagnostics_and_output
+
+        assert [record["step"] for record in diagnostics] == [
+            "wrap_flag_matched_pairs",
+            "wrap_shift_by_strata_period",
+            "wrap_calculate_imputation_link",
+            "replace_fir_backdata",
+            "generate_imputation_marker",
+            "wrap_get_cumulative_links",
+            "reapply_backdata",
+            "create_and_merge_imputation_values",
+        ]
+
+        for record in diagnostics:
+            assert record["question"] == 40
+            assert record["rows_in"] == record["rows_out"] == len(output)
+            assert record["wall_time_seconds"] >= 0
+            # Memory is only recorded if tracemalloc is tracing
+            assert record["peak_memory_delta_bytes"] is None
+
+    def test_diagnostics_marker_counts(self, diagnostics_and_output):
+        diagnostics, output = diagnostics_and_output
+
+        expected_counts = output["imputation_flags_question"].value_counts()
+
+        assert "marker_r" not in diagnostics[0]
+        assert {
+            marker: diagnostics[-1][f"marker_{marker}"]
+            for marker in expected_counts.index
+        } == expected_counts.to_dict()
+
+    def test_diagnostics_memory_when_tracing(self):
+        def step(df):
+            return df.assign(copy=df["value"].copy())
+
+        diagnostics = []
+
+        tracemalloc.start()
+        try:
+            profile_imputation_step(step, diagnostics, "questioncode", "marker")(
+                pd.DataFrame({"value": range(100_000)})
+            )
+        finally:
+            tracemalloc.stop()
+
+        assert diagnostics[0]["question"] is None
+        assert diagnostics[0]["peak_memory_delta_bytes"] >= 800_000
+
+    def test_single_pass_diagnostics(self, data_dir):
+        input_data = pd.concat(
+            [
+                load_and_format(data_dir / "20_mixed_data_input.csv").assign(
+                    questioncode=question
+                )
+                for question in [40, 41]
+            ],
+            ignore_index=True,
+        )
+        input_data["imputation_flags_question"] = pd.Series(dtype="str")
+
+        diagnostics = []
+
+        ratio_of_means_single_pass(
+            input_data,
+            target="question",
+            period="period",
+            reference="identifier",
+            strata="group",
+            auxiliary="other",
+            question_no="questioncode",
+            current_period=202001,
+            revision_window=10,
+            diagnostics=diagnostics,
+        )
+
+        # One record for each step, for all question numbers
+        assert len(diagnostics) == 8
+        for record in diagnostics:
+            assert record["question"] is None
+            assert record["rows_in"] == len(input_data)
+
+    def test_profile_imputation_step_without_diagnostics(self):
+        def step(df):
+            return df
+
+        assert profile_imputation_step(step, None, "questioncode", "marker") is step
+
+    def test_export_imputation_diagnostics(self, diagnostics_and_output, tmp_path):
+        diagnostics, _ = diagnostics_and_output
+
+        csv_path, json_path = export_imputation_diagnostics(
+            diagnostics, str(tmp_path / "imputation_diagnostics")
+        )
+
+        csv_diagnostics = pd.read_csv(csv_path)
+
+        with open(json_path) as json_file:
+            json_diagnostics = json.load(json_file)
+
+        assert len(csv_diagnostics) == len(json_diagnostics) == len(diagnostics)
+        assert csv_diagnostics["marker_r"].iloc[0] == 0
+        assert json_diagnostics[-1]["marker_r"] == diagnostics[-1]["marker_r"]
+        assert json_diagnostics[0]["peak_memory_delta_bytes"] is None
+
+    def test_impute_with_diagnostics_uses_config_platform(self, monkeypatch):
+        exported = {}
+
+        def export(diagnostics, file_prefix, import_platform, bucket_name):
+            exported.update(
+                file_prefix=file_prefix,
+                import_platform=import_platform,
+                bucket_name=bucket_name,
+            )
+
+        monkeypatch.setattr(impute, "export_imputation_diagnostics", export)
+
+        def imputation_function(df, diagnostics):
+            return df
+
+        impute_with_diagnostics(
+            imputation_function,
+            pd.DataFrame(),
+            {"output_path": "outputs/", "run_id": 1, "platform": "s3", "bucket": "b"},
+        )
+
+        assert exported == {
+            "file_prefix": "outputs/imputation_diagnostics_1",
+            "import_platform": "s3",
+            "bucket_name": "b",
+        }
@@ -1,7 +1,19 @@
+import time
+
+import numpy as np
+import pandas as pd
 import pytest
 from pandas.testing import assert_frame_equal
 
-from mbs_results.imputation.imputation_flags import generate_imputation_marker
+from mbs_results.imputation.imputation_flags import (
+    IMPUTATION_MARKER_DTYPE,
+    convert_to_imputation_marker,
+    flag_rolling_impute_columns,
+    generate_imputation_marker,
+    imputation_overlaps_mc,
+    is_imputation_marker,
+    select_imputation_marker,
+)
 from tests.helper_functions import load_and_format
 
 
@@ -63,4 +75,110 @@ class TestImputationMarkers:
 
         df_output.drop(columns=["is_backdata"], inplace=True)
 
+        df_expected_output["imputation_flags_target_variable"] = df_expected_output[
+            "imputation_flags_target_variable"
+        ].astype(IMPUTATION_MARKER_DTYPE)
+
         assert_frame_equal(df_output, df_expected_output)
+
+
+class TestSelectImputationMarker:
+    def test_select_imputation_marker_matches_loop(self):
+        rng = np.random.default_rng(0)
+
+        flags = ["r", "fir", "bir", "fic", "c"]
+        flag_matrix = rng.random((200_000, len(flags))) < 0.3
+        flag_matrix[:, -1] = True
+
+        expected = [flags[np.where(row)[0][0]] for row in flag_matrix]
+
+        actual = select_imputation_marker(flag_matrix, flags)
+
+        assert actual.tolist() == expected
+
+    @pytest.mark.benchmark
+    def test_select_imputation_marker_speed(self):
+        """Guards the vectorised marker selection against regressing to a loop"""
+        rng = np.random.default_rng(0)
+
+        flags = ["r", "fir", "bir", "fic", "c"]
+        flag_matrix = rng.random((200_000, len(flags))) < 0.3
+        flag_matrix[:, -1] = True
+
+        start = time.perf_counter()
+        actual = select_imputation_marker(flag_matrix, flags)
+        vectorised_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = [flags[np.where(row)[0][0]] for row in flag_matrix]
+        loop_time = time.perf_counter() - start
+
+        assert actual.tolist() == expected
+        assert vectorised_time * 5 < loop_time
+
+
+@pytest.mark.parametrize("time_difference", [1, -1, 2])
+def test_flag_rolling_impute_columns_matches_grouped_fill(time_difference):
+    rng = np.random.default_rng(0)
+
+    df = pd.DataFrame(
+        {
+            "fill_group": np.cumsum(rng.random(1000) < 0.3),
+            "target": np.where(rng.random(1000) < 0.5, np.nan, 1.0),
+            "auxiliary": np.where(rng.random(1000) < 0.2, np.nan, 1.0),
+        }
+    )
+
+    actual = flag_rolling_impute_columns(
+        df, time_difference, ["target", "auxiliary"], "fill_group"
+    )
+
+    same_group = df["fill_group"] == df["fill_group"].shift(time_difference)
+    grouped = df.groupby("fill_group")[["target", "auxiliary"]]
+    filled = grouped.ffill() if time_difference > 0 else grouped.bfill()
+
+    expected = filled.notna() & same_group.to_numpy()[:, np.newaxis]
+
+    assert_frame_equal(actual, expected)
+
+
+def test_imputation_overlaps_mc():
+    df = pd.DataFrame(
+        {
+            "fill_group": [1, 1, 1, 2, 2, 2],
+            "fir_flag_target": [True, True, True, True, True, False],
+            "bir_flag_target": [True, True, True, True, True, True],
+            "mc_flag_target": [False, True, False, False, False, True],
+        }
+    )
+
+    actual = imputation_overlaps_mc(df.copy(), "target", "fill_group")
+
+    expected = df.assign(
+        fir_flag_target=[True, False, False, True, True, False],
+        bir_flag_target=[False, False, True, False, False, False],
+    )
+
+    assert_frame_equal(actual, expected)
+
+
+def test_convert_to_imputation_marker():
+    markers = pd.Series(["R", "fir", None, "MC", np.nan, "c"], name="flags")
+
+    actual = convert_to_imputation_marker(markers)
+
+    expected = markers.str.lower().astype(IMPUTATION_MARKER_DTYPE)
+
+    pd.testing.assert_series_equal(actual, expected)
+
+    with pytest.raises(ValueError):
+        convert_to_imputation_marker(pd.Series(["r", "x"]))
+
+
+def test_is_imputation_marker():
+    markers = pd.Series(["r", "mc", None, "fimc", "fir"])
+
+    np.testing.assert_array_equal(
+        is_imputation_marker(markers, ["mc", "fimc"]),
+        [False, True, False, True, False],
+    )
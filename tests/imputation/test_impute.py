@@ -0,0 +1,312 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from mbs_results.imputation.batched_imputation import ratio_of_means_batched
+from mbs_results.imputation.impute import (
+    impute,
+    ratio_of_means_parallel,
+    ratio_of_means_per_question,
+    ratio_of_means_single_pass,
+)
+from mbs_results.imputation.ratio_of_means import ratio_of_means
+from tests.helper_functions import load_and_format
+
+
+@pytest.fixture(scope="class")
+def data_dir(imputation_data_dir):
+    return imputation_data_dir / "ratio_of_means"
+
+
+@pytest.fixture(scope="class")
+def multi_question_data(data_dir):
+    """Stack ratio of means scenarios as different question numbers"""
+    scenarios = [
+        "07_BI_BI_R_FI_FI_R_FI",
+        "14_C_FI_FI_NS_BI_BI_R",
+        "20_mixed_data",
+        "25_class_change_C_FI_FI",
+    ]
+    dfs = []
+    for question_no, scenario in enumerate(scenarios, start=40):
+        df = load_and_format(data_dir / (scenario + "_input.csv"))
+        df["questioncode"] = question_no
+        dfs.append(df)
+
+    df = pd.concat(dfs, ignore_index=True)
+    df["imputation_flags_question"] = pd.Series(dtype="str")
+
+    return df
+
+
+@pytest.fixture(scope="class")
+def rom_arguments():
+    return dict(
+        target="question",
+        period="period",
+        reference="identifier",
+        auxiliary="other",
+        current_period=202001,
+        revision_window=10,
+    )
+
+
+@pytest.fixture(scope="class")
+def per_question_output(multi_question_data, rom_arguments):
+    return (
+        multi_question_data.groupby("questioncode", group_keys=False)[
+            multi_question_data.columns
+        ]
+        .apply(
+            lambda df: ratio_of_means(
+                df.copy(),
+                strata="group",
+                question_no="questioncode",
+                **rom_arguments,
+            )
+        )
+        .reset_index(drop=True)
+    )
+
+
+class TestRatioOfMeansSinglePass:
+    def test_single_pass_matches_per_question(
+        self, multi_question_data, rom_arguments, per_question_output
+    ):
+        actual_output = ratio_of_means_single_pass(
+            multi_question_data.copy(),
+            question_no="questioncode",
+            strata="group",
+            **rom_arguments,
+        )
+
+        assert_frame_equal(actual_output, per_question_output)
+
+
+class TestRatioOfMeansParallel:
+    def test_parallel_matches_per_question(
+        self, multi_question_data, rom_arguments, per_question_output
+    ):
+        actual_output = ratio_of_means_parallel(
+            multi_question_data.copy(),
+            imputation_workers=2,
+            question_no="questioncode",
+            strata="group",
+            **rom_arguments,
+        ).reset_index(drop=True)
+
+        assert_frame_equal(actual_output, per_question_output)
+
+
+class TestLinkTables:
+    @pytest.fixture(scope="class")
+    def per_question_link_table(self, multi_question_data, rom_arguments):
+        link_tables = []
+
+        ratio_of_means_per_question(
+            multi_question_data.copy(),
+            question_no="questioncode",
+            strata="group",
+            link_tables=link_tables,
+            **rom_arguments,
+        )
+
+        return pd.concat(link_tables).reset_index()
+
+    def test_link_table_matches_row_links(
+        self, per_question_link_table, per_question_output
+    ):
+        keys = ["questioncode", "group", "period"]
+
+        assert not per_question_link_table.duplicated(keys).any()
+
+        expected_output = per_question_output[
+            per_question_link_table.columns
+        ].drop_duplicates(keys)
+
+        assert_frame_equal(
+            per_question_link_table.sort_values(keys).reset_index(drop=True),
+            expected_output.sort_values(keys).reset_index(drop=True),
+        )
+
+    @pytest.mark.parametrize("engine", ["single_pass", "parallel"])
+    def test_link_table_matches_per_question(
+        self, engine, multi_question_data, rom_arguments, per_question_link_table
+    ):
+        link_tables = []
+
+        if engine == "single_pass":
+            ratio_of_means_single_pass(
+                multi_question_data.copy(),
+                question_no="questioncode",
+                strata="group",
+                link_tables=link_tables,
+                **rom_arguments,
+            )
+
+        else:
+            ratio_of_means_parallel(
+                multi_question_data.copy(),
+                imputation_workers=2,
+                question_no="questioncode",
+                strata="group",
+                link_tables=link_tables,
+                **rom_arguments,
+            )
+
+        keys = ["questioncode", "group", "period"]
+
+        assert_frame_equal(
+            pd.concat(link_tables)
+            .reset_index()
+            .sort_values(keys)
+            .reset_index(drop=True),
+            per_question_link_table.sort_values(keys).reset_index(drop=True),
+        )
+
+    def test_given_links_replace_calculated_links(
+        self, multi_question_data, rom_arguments, per_question_link_table
+    ):
+        keys = ["questioncode", "group", "period"]
+        given_links = per_question_link_table.iloc[[0]].assign(f_link_question=2.5)
+
+        link_tables = []
+
+        ratio_of_means_per_question(
+            multi_question_data.copy(),
+            question_no="questioncode",
+            strata="group",
+            link_tables=link_tables,
+            link_table=given_links,
+            **rom_arguments,
+        )
+
+        expected_link_table = pd.concat(
+            [given_links, per_question_link_table.iloc[1:]]
+        ).sort_values(keys)
+
+        assert_frame_equal(
+            pd.concat(link_tables)
+            .reset_index()
+            .sort_values(keys)
+            .reset_index(drop=True),
+            expected_link_table.reset_index(drop=True),
+        )
+
+
+class TestImputeImputationLinks:
+    @pytest.fixture(scope="class")
+    def impute_input(self, multi_question_data):
+        """Scenarios with the columns impute and constrain need"""
+        return multi_question_data.rename(columns={"group": "imputation_class"}).assign(
+            spp_form_id=99,
+            form_type_spp=99,
+            formtype="0099",
+            cell_no=1,
+            converted_frotover=1,
+            froempment=1,
+            frosic2007=1,
+        )
+
+    @pytest.fixture
+    def impute_config(self, tmp_path):
+        return {
+            "reference": "identifier",
+            "target": "question",
+            "period": "period",
+            "question_no": "questioncode",
+            "auxiliary_converted": "other",
+            "current_period": 202001,
+            "revision_window": 10,
+            "form_id_spp": "spp_form_id",
+            "sic": "frosic2007",
+            "idbr_to_spp": {},
+            "debug_mode": False,
+            "platform": "network",
+            "bucket": None,
+            "output_path": str(tmp_path) + "/",
+            "run_id": 1,
+        }
+
+    def test_impute_reusing_exported_links(self, impute_input, impute_config):
+        expected_output = impute(
+            impute_input.copy(),
+            None,
+            {**impute_config, "export_imputation_links": True},
+        )
+
+        links_path = impute_config["output_path"] + "imputation_links_1.csv"
+
+        actual_output = impute(
+            impute_input.copy(),
+            None,
+            {**impute_config, "imputation_links_path": links_path},
+        )
+
+        for output in [actual_output, expected_output]:
+            output.sort_values(["questioncode", "identifier", "period"], inplace=True)
+
+        assert (
+            actual_output["imputation_flags_question"].tolist()
+            == expected_output["imputation_flags_question"].tolist()
+        )
+
+        # Links read from the csv differ from calculated links by round-off
+        assert_series_equal(
+            actual_output["question"].reset_index(drop=True),
+            expected_output["question"].reset_index(drop=True),
+            check_exact=False,
+        )
+
+    def test_impute_incremental_matches_full_run(
+        self, impute_input, impute_config, tmp_path
+    ):
+        expected_output = impute(impute_input.copy(), None, impute_config)
+
+        incremental_config = {
+            **impute_config,
+            "incremental_imputation_path": str(tmp_path / "incremental"),
+        }
+
+        for _ in range(2):
+            actual_output = impute(impute_input.copy(), None, incremental_config)
+
+            assert_frame_equal(
+                actual_output.sort_values(
+                    ["questioncode", "identifier", "period"]
+                ).reset_index(drop=True),
+                expected_output.sort_values(
+                    ["questioncode", "identifier", "period"]
+                ).reset_index(drop=True),
+            )
+
+    def test_impute_incremental_with_links_path_raises(
+        self, impute_input, impute_config, tmp_path
+    ):
+        with pytest.raises(ValueError):
+            impute(
+                impute_input.copy(),
+                None,
+                {
+                    **impute_config,
+                    "imputation_links_path": "imputation_links.csv",
+                    "incremental_imputation_path": str(tmp_path),
+                },
+            )
+
+
+class TestRatioOfMeansBatched:
+    @pytest.mark.parametrize("batch_size", [1, 2, 1000])
+    def test_batched_matches_per_question(
+        self, multi_question_data, rom_arguments, per_question_output, batch_size
+    ):
+        actual_output = ratio_of_means_batched(
+            multi_question_data.copy(),
+            ratio_of_means_per_question,
+            batch_size=batch_size,
+            question_no="questioncode",
+            strata="group",
+            **rom_arguments,
+        ).reset_index(drop=True)
+
+        assert_frame_equal(actual_output, per_question_output)
@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from mbs_results.imputation.impute import ratio_of_means_per_question
+from mbs_results.imputation.incremental_imputation import (
+    UNBOUNDED,
+    find_dependency_ranges,
+    ratio_of_means_incremental,
+    read_incremental_cache,
+    write_incremental_cache,
+)
+from tests.helper_functions import load_and_format
+
+
+@pytest.fixture(scope="class")
+def data_dir(imputation_data_dir):
+    return imputation_data_dir / "ratio_of_means"
+
+
+@pytest.fixture(scope="class")
+def multi_question_data(data_dir):
+    """Stack ratio of means scenarios as different question numbers"""
+    scenarios = [
+        "07_BI_BI_R_FI_FI_R_FI",
+        "14_C_FI_FI_NS_BI_BI_R",
+        "20_mixed_data",
+        "25_class_change_C_FI_FI",
+    ]
+    dfs = []
+    for question_no, scenario in enumerate(scenarios, start=40):
+        df = load_and_format(data_dir / (scenario + "_input.csv"))
+        df["questioncode"] = question_no
+        dfs.append(df)
+
+    df = pd.concat(dfs, ignore_index=True)
+    df["imputation_flags_question"] = pd.Series(dtype="str")
+
+    return df
+
+
+@pytest.fixture(scope="class")
+def rom_arguments():
+    return dict(
+        question_no="questioncode",
+        strata="group",
+        target="question",
+        period="period",
+        reference="identifier",
+        auxiliary="other",
+        current_period=202001,
+        revision_window=10,
+    )
+
+
+def sort_output(df):
+    return df.sort_values(
+        ["questioncode", "group", "identifier", "period"], kind="stable"
+    ).reset_index(drop=True)
+
+
+class TestRatioOfMeansIncremental:
+    def test_first_run_matches_per_question(
+        self, multi_question_data, rom_arguments, tmp_path
+    ):
+        expected_output = sort_output(
+            ratio_of_means_per_question(multi_question_data.copy(), **rom_arguments)
+        )
+
+        actual_output = ratio_of_means_incremental(
+            multi_question_data.copy(),
+            cache_path=str(tmp_path),
+            imputation_function=ratio_of_means_per_question,
+            **rom_arguments,
+        )
+
+        assert_frame_equal(actual_output, expected_output)
+
+    def test_appended_period_only_imputes_changed_rows(
+        self, multi_question_data, rom_arguments, tmp_path
+    ):
+        last_period = multi_question_data["period"].max()
+
+        ratio_of_means_incremental(
+            multi_question_data.loc[multi_question_data["period"] < last_period],
+            cache_path=str(tmp_path),
+            imputation_function=ratio_of_means_per_question,
+            **rom_arguments,
+        )
+
+        imputed_rows = []
+
+        def spy_imputation_function(df, **kwargs):
+            imputed_rows.append(df)
+            return ratio_of_means_per_question(df, **kwargs)
+
+        actual_output = ratio_of_means_incremental(
+            multi_question_data.copy(),
+            cache_path=str(tmp_path),
+            imputation_function=spy_imputation_function,
+            **rom_arguments,
+        )
+
+        expected_output = sort_output(
+            ratio_of_means_per_question(multi_question_data.copy(), **rom_arguments)
+        )
+
+        assert_frame_equal(actual_output, expected_output)
+
+        # Only question numbers with the appended period are imputed again
+        assert len(imputed_rows) == 1
+        assert len(imputed_rows[0]) < len(multi_question_data)
+        assert set(imputed_rows[0]["questioncode"]) == {40, 41}
+
+    def test_unchanged_input_is_not_imputed(
+        self, multi_question_data, rom_arguments, tmp_path
+    ):
+        expected_output = ratio_of_means_incremental(
+            multi_question_data.copy(),
+            cache_path=str(tmp_path),
+            imputation_function=ratio_of_means_per_question,
+            **rom_arguments,
+        )
+
+        def failing_imputation_function(df, **kwargs):
+            raise AssertionError("Rows were imputed again")
+
+        link_tables = []
+
+        actual_output = ratio_of_means_incremental(
+            multi_question_data.copy(),
+            cache_path=str(tmp_path),
+            imputation_function=failing_imputation_function,
+            link_tables=link_tables,
+            **rom_arguments,
+        )
+
+        assert_frame_equal(actual_output, expected_output)
+        assert (
+            not link_tables[0]
+            .set_index("questioncode", append=True)
+            .index.duplicated()
+            .any()
+        )
+
+    def test_changed_column_types_impute_all_rows(
+        self, multi_question_data, rom_arguments, tmp_path
+    ):
+        ratio_of_means_incremental(
+            multi_question_data.copy(),
+            cache_path=str(tmp_path),
+            imputation_function=ratio_of_means_per_question,
+            **rom_arguments,
+        )
+
+        imputed_rows = []
+
+        def spy_imputation_function(df, **kwargs):
+            imputed_rows.append(df)
+            return ratio_of_means_per_question(df, **kwargs)
+
+        ratio_of_means_incremental(
+            multi_question_data.astype({"other": "float32"}),
+            cache_path=str(tmp_path),
+            imputation_function=spy_imputation_function,
+            **rom_arguments,
+        )
+
+        assert len(imputed_rows[0]) == len(multi_question_data)
+
+
+class TestFindDependencyRanges:
+    def test_find_dependency_ranges(self):
+        # One chain of periods 1 to 7 and one chain of periods 1 to 2
+        chain_codes = np.array([0, 0, 0, 0, 0, 0, 0, 1, 1])
+        period_ordinal = np.array([1, 2, 3, 4, 5, 6, 7, 1, 2])
+        is_response = np.array([0, 1, 0, 0, 1, 0, 0, 0, 0], dtype=bool)
+        is_forward_barrier = np.array([0, 1, 0, 0, 0, 0, 0, 0, 0], dtype=bool)
+
+        lower, upper = find_dependency_ranges(
+            chain_codes, period_ordinal, is_response, is_forward_barrier
+        )
+
+        expected_lower = [-UNBOUNDED, 1, 1, 1, 4, 1, 1, -UNBOUNDED, -UNBOUNDED]
+        expected_upper = [3, 3, 6, 6, 6, UNBOUNDED, UNBOUNDED, UNBOUNDED, UNBOUNDED]
+
+        assert lower.tolist() == expected_lower
+        assert upper.tolist() == expected_upper
+
+
+class TestIncrementalCache:
+    def test_cache_round_trip(self, tmp_path):
+        frames = {
+            "imputed": pd.DataFrame({"a": [1, 2], "b": ["x", None]}),
+            "links": pd.DataFrame({"c": [0.5, np.nan]}),
+        }
+
+        write_incremental_cache(str(tmp_path), "first", **frames)
+        write_incremental_cache(str(tmp_path), "second", **frames)
+
+        cache = read_incremental_cache(str(tmp_path), "second")
+
+        assert cache.keys() == frames.keys()
+        for name, frame in frames.items():
+            assert_frame_equal(cache[name], frame)
+
+        # Files of the replaced cache are removed
+        assert len(list(tmp_path.glob("*.parquet"))) == len(frames)
+
+    def test_cache_with_other_arguments_is_not_read(self, tmp_path):
+        write_incremental_cache(str(tmp_path), "first", links=pd.DataFrame())
+
+        assert read_incremental_cache(str(tmp_path), "second") is None
+        assert read_incremental_cache(str(tmp_path / "missing"), "first") is None
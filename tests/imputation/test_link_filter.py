@@ -44,3 +44,27 @@ class TestFilters:
             df_filters.columns = df_filters.columns + "_fail"
 
             flag_rows_to_ignore(df_input, df_filters)
+
+
+def test_flag_rows_to_ignore_keeps_column_order_and_casts_keys():
+    """Test columns are not reordered and filters with different key dtypes
+    are matched."""
+
+    df_input = pd.DataFrame(
+        {
+            "target": [1.0, 2.0, 3.0, 4.0],
+            "reference": [1, 1, 2, 2],
+            "period": [202001, 202002, 202001, 202002],
+            "question": [40.0, 40.0, 40.0, 49.0],
+        }
+    )
+
+    df_filters = pd.DataFrame(
+        {"reference": ["1", "2"], "period": [202002, 202002], "question": [40, 49]}
+    )
+
+    df_output = flag_rows_to_ignore(df_input, df_filters)
+
+    df_output_expected = df_input.assign(ignore_from_link=[False, True, False, True])
+
+    assert_frame_equal(df_output, df_output_expected)
@@ -0,0 +1,126 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal, assert_series_equal
+
+from mbs_results.imputation.panel_index import (
+    create_panel_index,
+    get_panel_index,
+    is_sorted_by,
+    same_segment,
+    sort_panel,
+)
+
+
+def panel_data():
+    # reference 1 has a gap in 202003, reference 2 changes strata in 202003
+    return pd.DataFrame(
+        {
+            "reference": [2, 1, 1, 1, 2, 2, 1],
+            "strata": [10, 10, 10, 10, 10, 20, 10],
+            "period": pd.to_datetime(
+                [
+                    "2020-02-01",
+                    "2020-01-01",
+                    "2020-02-01",
+                    "2020-04-01",
+                    "2020-01-01",
+                    "2020-03-01",
+                    "2020-05-01",
+                ]
+            ),
+        }
+    )
+
+
+class TestPanelIndex:
+    def test_create_panel_index(self):
+        actual_output = create_panel_index(
+            panel_data(), period="period", reference="reference", strata="strata"
+        )
+
+        expected_output = panel_data().iloc[[1, 2, 3, 6, 4, 0, 5]]
+        expected_output["period_ordinal"] = [
+            24240,
+            24241,
+            24243,
+            24244,
+            24240,
+            24241,
+            24242,
+        ]
+        expected_output["panel_group_start"] = [
+            True,
+            False,
+            False,
+            False,
+            True,
+            False,
+            True,
+        ]
+        expected_output["panel_segment_start"] = [
+            True,
+            False,
+            True,
+            False,
+            True,
+            False,
+            True,
+        ]
+
+        assert_frame_equal(actual_output, expected_output, check_dtype=False)
+
+    def test_get_panel_index_reuses_columns(self):
+        df = create_panel_index(
+            panel_data(), period="period", reference="reference", strata="strata"
+        )
+        # Any order which keeps groups together is valid
+        df = df.sort_values(["reference", "strata", "period"])
+
+        expected_output = get_panel_index(
+            df.drop(columns=["panel_group_start", "panel_segment_start"]),
+            period="period",
+            reference="reference",
+            strata="strata",
+        )
+
+        assert_frame_equal(
+            get_panel_index(df, "period", "reference", "strata"), expected_output
+        )
+
+    def test_same_segment(self):
+        segment_start = pd.Series([True, False, True, False, False])
+
+        assert_series_equal(
+            same_segment(segment_start, 1),
+            pd.Series([False, True, False, True, True]),
+        )
+        assert_series_equal(
+            same_segment(segment_start, -1),
+            pd.Series([True, False, True, True, False]),
+        )
+
+
+class TestSortPanel:
+    keys = ["strata", "reference", "period"]
+
+    def test_is_sorted_by(self):
+        df = panel_data()
+
+        assert not is_sorted_by(df, self.keys)
+        assert is_sorted_by(df.sort_values(self.keys), self.keys)
+        assert not is_sorted_by(df.sort_values(["period", "strata"]), self.keys)
+
+    def test_is_sorted_by_missing_key(self):
+        df = panel_data().sort_values(self.keys)
+        df.loc[df.index[-1], "reference"] = None
+
+        assert not is_sorted_by(df, self.keys)
+
+    def test_sort_panel_unsorted(self):
+        assert_frame_equal(
+            sort_panel(panel_data(), self.keys), panel_data().sort_values(self.keys)
+        )
+
+    def test_sort_panel_skips_sorted(self):
+        df = panel_data().sort_values(self.keys)
+
+        assert sort_panel(df, self.keys) is df
@@ -2,6 +2,7 @@ import pandas as pd
 import pytest
 from pandas.testing import assert_frame_equal
 
+from mbs_results.imputation.imputation_flags import IMPUTATION_MARKER_DTYPE
 from mbs_results.imputation.ratio_of_means import ratio_of_means
 from tests.helper_functions import load_and_format, load_filter
 
@@ -91,6 +92,12 @@ class TestRatioOfMeans:
             revision_window=10,
         )
 
+        expected_output[["imputation_flags_question", "backdata_flags_question"]] = (
+            expected_output[
+                ["imputation_flags_question", "backdata_flags_question"]
+            ].astype(IMPUTATION_MARKER_DTYPE)
+        )
+
         assert_frame_equal(actual_output, expected_output, check_dtype=False)
 
     @pytest.mark.parametrize("link_scenario", pre_defined_link_scenarios)
@@ -125,6 +132,12 @@ class TestRatioOfMeans:
             revision_window=10,
         )
 
+        expected_output[["imputation_flags_question", "backdata_flags_question"]] = (
+            expected_output[
+                ["imputation_flags_question", "backdata_flags_question"]
+            ].astype(IMPUTATION_MARKER_DTYPE)
+        )
+
         assert_frame_equal(actual_output, expected_output, check_dtype=False)
 
     @pytest.mark.parametrize("mc_base_file_name", manual_constructions_scenarios)
@@ -160,4 +173,41 @@ class TestRatioOfMeans:
             revision_window=10,
         )
 
+        expected_output[["imputation_flags_question", "backdata_flags_question"]] = (
+            expected_output[
+                ["imputation_flags_question", "backdata_flags_question"]
+            ].astype(IMPUTATION_MARKER_DTYPE)
+        )
+
         assert_frame_equal(actual_output, expected_output, check_dtype=False)
+
+    def test_ratio_of_means_keeps_unused_columns(self, data_dir):
+        input_data = load_and_format(data_dir / "29_mixed_data_filtered_input.csv")
+        input_data["imputation_flags_question"] = pd.Series(dtype="str")
+
+        filter_df = load_filter(
+            data_dir / "ratio_of_means_filters" / "29_mixed_data_filtered.csv"
+        )
+
+        rom_arguments = dict(
+            target="question",
+            period="period",
+            reference="identifier",
+            strata="group",
+            auxiliary="other",
+            question_no="questioncode",
+            filters=filter_df,
+            current_period=202001,
+            revision_window=10,
+        )
+
+        expected_output = ratio_of_means(input_data.copy(), **rom_arguments)
+
+        input_data.insert(1, "name", "name_" + input_data["identifier"].astype(str))
+        actual_output = ratio_of_means(input_data.copy(), **rom_arguments)
+
+        assert actual_output.columns.get_loc("name") == 1
+        assert actual_output["name"].equals(
+            "name_" + actual_output["identifier"].astype(str)
+        )
+        assert_frame_equal(actual_output.drop(columns="name"), expected_output)
@@ -2,6 +2,7 @@ import pandas as pd
 import pytest
 from pandas.testing import assert_frame_equal
 
+from mbs_results.imputation.imputation_flags import IMPUTATION_MARKER_DTYPE
 from mbs_results.imputation.ratio_of_means import ratio_of_means
 
 
@@ -115,5 +116,8 @@ class TestRatioOfMeans:
             "imputation_flags_question"
         ].str.lower()
         expected_output = expected_output.replace({"bi": "bir"})
+        expected_output["imputation_flags_question"] = expected_output[
+            "imputation_flags_question"
+        ].astype(IMPUTATION_MARKER_DTYPE)
 
         assert_frame_equal(actual_output, expected_output, check_dtype=False)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from mbs_results.outlier_detection.detect_outlier import join_l_values
+
+
+@pytest.fixture(scope="class")
+def lookup_paths(tmp_path_factory):
+    lookup_dir = tmp_path_factory.mktemp("lookups")
+
+    classification_values_path = lookup_dir / "classification_values.csv"
+    pd.DataFrame(
+        {"sic_5_digit": ["01110", "02000"], "classification": ["1", "2"]}
+    ).to_csv(classification_values_path, index=False)
+
+    l_values_path = lookup_dir / "l_values.csv"
+    pd.DataFrame(
+        {
+            "question_no": [40, 40, 49],
+            "classification": ["1", "2", "1"],
+            "l_value": [10.0, 20.0, 30.0],
+        }
+    ).to_csv(l_values_path, index=False)
+
+    return str(l_values_path), str(classification_values_path)
+
+
+@pytest.fixture(scope="class")
+def config():
+    return {
+        "l_value_question_no": "question_no",
+        "question_no": "questioncode",
+        "sic": "frosic2007",
+        "platform": "network",
+        "bucket": None,
+    }
+
+
+class TestJoinLValues:
+    def test_join_l_values(self, lookup_paths, config):
+        df = pd.DataFrame(
+            {"questioncode": [40, 49, 40], "frosic2007": ["02000", "01110", "99999"]}
+        )
+
+        actual = join_l_values(df, *lookup_paths, config)
+
+        expected = pd.DataFrame(
+            {
+                "questioncode": [40, 49, 40],
+                "frosic2007": ["02000", "01110", "99999"],
+                "sic_5_digit": ["02000", "01110", np.nan],
+                "classification": ["2", "1", np.nan],
+                "l_value": [20.0, 30.0, np.nan],
+            }
+        )
+
+        assert_frame_equal(actual, expected)
+        assert list(df.columns) == ["questioncode", "frosic2007"]
+
+    def test_join_l_values_existing_classification(self, lookup_paths, config):
+        df = pd.DataFrame(
+            {"questioncode": [40], "frosic2007": ["02000"], "classification": ["1"]}
+        )
+
+        with pytest.raises(ValueError, match="classification"):
+            join_l_values(df, *lookup_paths, config)
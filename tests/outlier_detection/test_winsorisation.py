@@ -45,3 +45,48 @@ class TestWinsorisedWeight:
         actual_output = actual_output[expected_output.columns]
 
         assert_frame_equal(actual_output, expected_output)
+
+    def test_winsorised_weight_by_question(self, expected_output):
+        input_data = expected_output[
+            [
+                "group",
+                "period",
+                "aux",
+                "is_census",
+                "a_weight",
+                "g_weight",
+                "target_variable",
+                "l_value",
+            ]
+        ]
+
+        # Same data for two question numbers gives the same weights for both
+        two_questions = pd.concat(
+            [input_data.assign(question=40), input_data.assign(question=49)],
+            ignore_index=True,
+        )
+
+        actual_output = winsorise(
+            two_questions,
+            "group",
+            "period",
+            "aux",
+            "is_census",
+            "a_weight",
+            "g_weight",
+            "target_variable",
+            "l_value",
+            question_no="question",
+        )
+
+        expected_by_question = pd.concat(
+            [
+                expected_output.assign(question=40),
+                expected_output.assign(question=49),
+            ],
+            ignore_index=True,
+        )
+
+        actual_output = actual_output[expected_by_question.columns]
+
+        assert_frame_equal(actual_output, expected_by_question)
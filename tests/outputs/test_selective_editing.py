@@ -1,6 +1,7 @@
 from pathlib import Path
 from unittest.mock import patch
 
+import numpy as np
 import pandas as pd
 import pytest
 from pandas.testing import assert_frame_equal
@@ -11,7 +12,10 @@ from mbs_results.outputs.selective_editing import (
     calculate_predicted_value,
     create_standardising_factor,
 )
-from mbs_results.period_zero_se_wrapper import period_zero_se_wrapper
+from mbs_results.period_zero_se_wrapper import (
+    calculate_construction_links,
+    period_zero_se_wrapper,
+)
 
 
 @pytest.fixture(scope="class")
@@ -45,6 +49,74 @@ def calculate_auxiliary_value_output(filepath):
     )
 
 
+class TestConstructionLinks:
+    def test_calculate_construction_links(self):
+        input_data = pd.DataFrame(
+            {
+                "questioncode": [49, 49, 49, 49, 49, 40, 40],
+                "period": [202201, 202201, 202201, 202201, 202202, 202201, 202201],
+                "group": [1.0, 1.0, 2.0, np.nan, 1.0, 1.0, 1.0],
+                "auxiliary": [12.0, 24.0, np.nan, 12.0, 12.0, 12.0, 36.0],
+                "auxiliary_converted": [1.0, 2.0, np.nan, 1.0, 0.0, 1.0, 3.0],
+                "target": [2.0, 6.0, 5.0, 3.0, 4.0, np.nan, 9.0],
+            }
+        )
+
+        # Sorted by question number, 49 in 202201 group 2 has no matches and
+        # in 202202 a zero denominator so both get default links, the row
+        # with a missing group gets no link
+        expected_output = pd.DataFrame(
+            {
+                "questioncode": [40, 40, 49, 49, 49, 49, 49],
+                "period": [202201, 202201, 202201, 202201, 202201, 202201, 202202],
+                "group": [1.0, 1.0, 1.0, 1.0, 2.0, np.nan, 1.0],
+                "auxiliary": [12.0, 36.0, 12.0, 24.0, np.nan, 12.0, 12.0],
+                "auxiliary_converted": [1.0, 3.0, 1.0, 2.0, np.nan, 1.0, 0.0],
+                "target": [np.nan, 9.0, 2.0, 6.0, 5.0, 3.0, 4.0],
+                "flag_construction_matches": [
+                    False,
+                    True,
+                    True,
+                    True,
+                    False,
+                    True,
+                    True,
+                ],
+                "flag_construction_matches_count": [
+                    1.0,
+                    1.0,
+                    2.0,
+                    2.0,
+                    0.0,
+                    np.nan,
+                    1.0,
+                ],
+                "construction_link": [3.0, 3.0, 8 / 3, 8 / 3, 1.0, np.nan, 1.0],
+                "default_link_flag_construction_matches": [
+                    False,
+                    False,
+                    False,
+                    False,
+                    True,
+                    False,
+                    True,
+                ],
+            }
+        )
+
+        actual_output = calculate_construction_links(
+            input_data,
+            question_no="questioncode",
+            strata="group",
+            period="period",
+            target="target",
+            auxiliary="auxiliary",
+            predictive_variable="auxiliary_converted",
+        )
+
+        assert_frame_equal(actual_output, expected_output)
+
+
 class TestSelectiveEditing:
     def test_create_standardising_factor(
         self,
@@ -5,6 +5,7 @@ import pandas as pd
 import pytest
 from pandas.testing import assert_frame_equal
 
+from mbs_results.imputation.imputation_flags import IMPUTATION_MARKER_DTYPE
 from mbs_results.staging.back_data import is_back_data_date_ok
 from mbs_results.utilities.utils import convert_column_to_datetime
 
@@ -100,5 +101,8 @@ class TestBackData:
         order = actual_output.columns
         expected_output = expected_output[order]
         expected_output["cellnumber"] = expected_output["cellnumber"].astype(int)
+        expected_output["imputation_marker"] = expected_output[
+            "imputation_marker"
+        ].astype(IMPUTATION_MARKER_DTYPE)
 
         assert_frame_equal(actual_output, expected_output)
@@ -122,7 +122,7 @@ def mock_read_and_combine_colon_sep_files():
     with patch(
         "mbs_results.staging.stage_dataframe.read_and_combine_colon_sep_files"
     ) as mock_read_and_combine_colon_sep_files:
-        mock_read_and_combine_colon_sep_files.return_value = pd.DataFrame(
+        finalsel = pd.DataFrame(
             {
                 "reference": [
                     1,
@@ -135,6 +135,10 @@ def mock_read_and_combine_colon_sep_files():
                 "period": [202202],
             }
         )
+        # Files are read with the data types of master_column_type_dict
+        mock_read_and_combine_colon_sep_files.return_value = enforce_datatypes(
+            finalsel, keep_columns=list(finalsel), **config
+        )
         yield mock_read_and_combine_colon_sep_files
 
 
@@ -143,7 +147,7 @@ def mock_read_and_combine_colon_sep_files_changing_formtypes():
     with patch(
         "mbs_results.staging.stage_dataframe.read_and_combine_colon_sep_files"
     ) as mock_read_and_combine_colon_sep_files:
-        mock_read_and_combine_colon_sep_files.return_value = pd.DataFrame(
+        finalsel = pd.DataFrame(
             {
                 "reference": [1, 2, 3],
                 "formtype": [117, 817, 117],
@@ -154,6 +158,10 @@ def mock_read_and_combine_colon_sep_files_changing_formtypes():
                 "period": [202202, 202202, 202202],
             }
         )
+        # Files are read with the data types of master_column_type_dict
+        mock_read_and_combine_colon_sep_files.return_value = enforce_datatypes(
+            finalsel, keep_columns=list(finalsel), **config
+        )
         yield mock_read_and_combine_colon_sep_files
 
 
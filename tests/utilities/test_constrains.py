@@ -1,6 +1,9 @@
 import logging
+import operator
+import time
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import pytest
 from pandas.testing import assert_frame_equal
@@ -44,6 +47,99 @@ def test_replace_values_index_base(filepath):
     assert_frame_equal(df_in, df_expected)
 
 
+def test_replace_values_index_based_many_pairs():
+    """100k (period, reference) pairs, 49 > 40 in every other pair"""
+    number_of_pairs = 100_000
+
+    index = pd.MultiIndex.from_product(
+        [[40, 49], [202201, 202202], range(number_of_pairs // 2)],
+        names=["question_no", "period", "reference"],
+    )
+    is_violating = np.arange(number_of_pairs) % 2 == 0
+
+    df = pd.DataFrame(
+        {
+            "target": np.concatenate(
+                [np.ones(number_of_pairs), np.where(is_violating, 2.0, 0.5)]
+            )
+        },
+        index=index,
+    )
+
+    replace_values_index_based(df, "target", 49, ">", 40)
+
+    assert (df.loc[40, "target"] == 1.0).all()
+    assert (df.loc[49, "target"] == np.where(is_violating, 1.0, 0.5)).all()
+
+    assert df.loc[40, "constrain_marker"].isna().all()
+    assert (df.loc[49, "constrain_marker"][is_violating] == "49 > 40").all()
+    assert df.loc[49, "constrain_marker"][~is_violating].isna().all()
+
+
+def replace_values_index_based_loop(
+    df: pd.DataFrame, target: str, a: int, compare: str, b: int
+) -> None:
+    """Previous implementation of replace_values_index_based, one .loc lookup
+    and two .loc writes for each violating pair"""
+    df.sort_index(inplace=True)
+
+    ops = {
+        ">": operator.gt,
+        "<": operator.lt,
+        ">=": operator.ge,
+        "<=": operator.le,
+        "==": operator.eq,
+    }
+
+    series_from_a = df.loc[a][target]
+
+    series_from_b = df.loc[b][target]
+
+    common_index = series_from_a.index.intersection(series_from_b.index)
+
+    index_to_replace = series_from_a[common_index][
+        ops[compare](series_from_a[common_index], series_from_b[common_index])
+    ].index
+
+    if len(index_to_replace) > 0:
+        for date_ref_idx in index_to_replace.values:
+
+            index_to_replace = (a,) + date_ref_idx
+            index_to_replace_with = (b,) + date_ref_idx
+
+            replace_with_value = pd.Series(df.loc[index_to_replace_with, target]).iloc[
+                0
+            ]
+            df.loc[index_to_replace, target] = replace_with_value
+            df.loc[index_to_replace, "constrain_marker"] = f"{a} {compare} {b}"
+
+
+@pytest.mark.benchmark
+def test_replace_values_index_based_speed():
+    """100k (period, reference) pairs where 49 > 40, guards the vectorised
+    replacement against regressing to a loop over pairs"""
+    number_of_pairs = 100_000
+
+    index = pd.MultiIndex.from_product(
+        [[40, 49], [202201, 202202], range(number_of_pairs // 2)],
+        names=["question_no", "period", "reference"],
+    )
+    df = pd.DataFrame({"target": np.repeat([1.0, 2.0], number_of_pairs)}, index=index)
+
+    expected = df.copy()
+
+    start = time.perf_counter()
+    replace_values_index_based_loop(expected, "target", 49, ">", 40)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    replace_values_index_based(df, "target", 49, ">", 40)
+    vectorised_time = time.perf_counter() - start
+
+    assert_frame_equal(df, expected)
+    assert vectorised_time * 10 < loop_time
+
+
 def test_sum_sub_df_46_47(filepath):
 
     df = pd.read_csv(filepath / "test_sum_sub_df.csv", index_col=False)
@@ -266,6 +362,31 @@ class TestDerivedOutlierWeights:
 
         assert_frame_equal(df_actual, df_expected)
 
+    def test_enforce_export_weight_constraint_many_references(self):
+        number_of_references = 50_000
+
+        df_in = pd.DataFrame(
+            {
+                "reference": np.tile(np.arange(number_of_references), 2),
+                "period": 202201,
+                "questioncode": np.repeat([40, 49], number_of_references),
+                "outlier_weight": np.repeat([0.5, 1.0], number_of_references),
+                "value": 10.0,
+            }
+        )
+
+        df_actual = enforce_export_weight_constraint(
+            df_in,
+            reference="reference",
+            period="period",
+            question_code="questioncode",
+            outlier_weight="outlier_weight",
+            target="value",
+        )
+
+        assert (df_actual["outlier_weight"] == 0.5).all()
+        assert (df_actual["winsorised_value"] == 5.0).all()
+
     def test_replace_outlier_weights(self, filepath):
 
         df = pd.read_csv(filepath / "test_replace_outliers_in.csv", index_col=False)
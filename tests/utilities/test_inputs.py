@@ -1,4 +1,5 @@
 import pandas as pd
+import pytest
 from pandas.testing import assert_frame_equal
 
 from mbs_results.utilities.inputs import read_colon_separated_file
@@ -38,3 +39,72 @@ def test_read_colon_seperated_file_encoding(utilities_data_dir):
     )
 
     assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize("cache_format", ["parquet", "feather"])
+def test_read_colon_separated_file_cache(utilities_data_dir, tmp_path, cache_format):
+    headers = ["int", "str", "float", "period"]
+    filepath = tmp_path / "colon_sep_202401"
+    filepath.write_bytes(
+        (utilities_data_dir / "read_colon_separated_file/colon_sep_202401").read_bytes()
+    )
+    cache_path = tmp_path / "cache"
+
+    expected = read_colon_separated_file(filepath, headers)
+
+    first = read_colon_separated_file(
+        filepath, headers, cache_path=cache_path, cache_format=cache_format
+    )
+    cached = read_colon_separated_file(
+        filepath, headers, cache_path=cache_path, cache_format=cache_format
+    )
+
+    assert len(list(cache_path.iterdir())) == 1
+    assert_frame_equal(first, expected)
+    assert_frame_equal(cached, expected)
+
+    # Changed files are parsed again
+    with open(filepath, "a") as file:
+        file.write("4:D:4.0\n")
+
+    changed = read_colon_separated_file(
+        filepath, headers, cache_path=cache_path, cache_format=cache_format
+    )
+
+    assert len(list(cache_path.iterdir())) == 2
+    assert_frame_equal(changed, read_colon_separated_file(filepath, headers))
+
+
+def test_read_colon_separated_file_cache_column_types(utilities_data_dir, tmp_path):
+    headers = ["int", "str", "float", "period"]
+    filepath = utilities_data_dir / "read_colon_separated_file/colon_sep_202401"
+    column_types = {"int": "float", "period": "date", "not_in_file": "int"}
+
+    expected = read_colon_separated_file(filepath, headers)
+    expected["int"] = expected["int"].astype("float")
+    expected["period"] = pd.to_datetime(expected["period"], format="%Y%m")
+
+    first = read_colon_separated_file(
+        filepath, headers, column_types=column_types, cache_path=tmp_path
+    )
+    cached = read_colon_separated_file(
+        filepath, headers, column_types=column_types, cache_path=tmp_path
+    )
+
+    assert_frame_equal(first, expected)
+    assert_frame_equal(cached, expected)
+
+    # Frames with other data types are cached separately
+    read_colon_separated_file(filepath, headers, cache_path=tmp_path)
+
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_read_colon_separated_file_cache_format(utilities_data_dir, tmp_path):
+    with pytest.raises(ValueError):
+        read_colon_separated_file(
+            utilities_data_dir / "read_colon_separated_file/colon_sep_202401",
+            ["int", "str", "float", "period"],
+            cache_path=tmp_path,
+            cache_format="csv",
+        )
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from mbs_results.utilities.lookups import map_lookup, read_lookup
+
+
+def test_read_lookup_cached_until_file_changes(tmp_path):
+    lookup_path = tmp_path / "lookup.csv"
+    pd.DataFrame({"sic": ["01110", "01110", "02000"], "value": [1, 2, 3]}).to_csv(
+        lookup_path, index=False
+    )
+
+    lookup = read_lookup(lookup_path, ["sic"], dtype={"sic": str})
+
+    # Duplicated keys keep the first row
+    assert lookup["value"].tolist() == [1, 3]
+    assert read_lookup(lookup_path, ["sic"], dtype={"sic": str}) is lookup
+
+    pd.DataFrame({"sic": ["01110"], "value": [10]}).to_csv(lookup_path, index=False)
+
+    assert read_lookup(lookup_path, ["sic"], dtype={"sic": str})["value"].tolist() == [
+        10
+    ]
+
+
+def test_read_lookup_drops_duplicated_keys(tmp_path, caplog):
+    lookup_path = tmp_path / "duplicated_lookup.csv"
+    pd.DataFrame(
+        {
+            "question": [40, 40, 40, 49],
+            "classification": ["1", "2", "1", "1"],
+            "l_value": [10.0, 20.0, 30.0, 40.0],
+        }
+    ).to_csv(lookup_path, index=False)
+
+    with caplog.at_level("WARNING"):
+        lookup = read_lookup(
+            lookup_path, ["question", "classification"], dtype={"classification": str}
+        )
+
+    expected = pd.DataFrame(
+        {
+            "question": [40, 40, 49],
+            "classification": ["1", "2", "1"],
+            "l_value": [10.0, 20.0, 40.0],
+        }
+    )
+
+    assert_frame_equal(lookup.reset_index(drop=True), expected)
+    assert lookup.index.is_unique
+    assert "1 rows with duplicated" in caplog.text
+
+
+def test_map_lookup():
+    lookup = pd.DataFrame(
+        {
+            "question": [40, 40, 49],
+            "classification": ["1", "2", "1"],
+            "l_value": [10.0, 20.0, 30.0],
+        }
+    ).set_index(["question", "classification"], drop=False)
+
+    df = pd.DataFrame(
+        {
+            "question": [49, 40, 40, 49, 40],
+            "classification": ["1", "2", None, "2", "2"],
+        },
+        index=[5, 6, 7, 8, 9],
+    )
+
+    actual = map_lookup(df, lookup, ["question", "classification"])
+
+    expected = pd.DataFrame(
+        {
+            "question": [49.0, 40.0, np.nan, np.nan, 40.0],
+            "classification": ["1", "2", np.nan, np.nan, "2"],
+            "l_value": [30.0, 20.0, np.nan, np.nan, 20.0],
+        },
+        index=[5, 6, 7, 8, 9],
+    )
+
+    assert_frame_equal(actual, expected)
@@ -4,7 +4,7 @@ import numpy as np
 import pandas as pd
 import pytest
 import toml
-from pandas.testing import assert_frame_equal
+from pandas.testing import assert_frame_equal, assert_series_equal
 
 from mbs_results.utilities.inputs import read_colon_separated_file
 from mbs_results.utilities.utils import (
@@ -16,10 +16,13 @@ from mbs_results.utilities.utils import (
     check_population_sample,
     check_unique_per_cell_period,
     compare_two_dataframes,
+    convert_datetime_to_int,
     generate_schemas,
     get_or_create_run_id,
     get_or_read_run_id,
     multi_filter_list,
+    ordinal_to_period,
+    period_to_ordinal,
     unpack_dates_and_comments,
 )
 
@@ -291,3 +294,32 @@ class TestMultiFilterList:
         result = multi_filter_list(input_list, "test", "759")
 
         assert result == []
+
+
+class TestPeriodOrdinals:
+    def test_period_to_ordinal(self):
+        periods = pd.Series([202212, 202301, 202303])
+
+        expected = pd.Series([24275, 24276, 24278], dtype="int32")
+
+        assert_series_equal(period_to_ordinal(periods), expected)
+        assert_series_equal(
+            period_to_ordinal(pd.to_datetime(periods, format="%Y%m")), expected
+        )
+        assert period_to_ordinal(202301) == 24276
+        assert period_to_ordinal(pd.Timestamp("2023-01-01")) == 24276
+
+    def test_ordinal_to_period(self):
+        periods = pd.Series([202212, 202301, 202303])
+
+        assert_series_equal(
+            ordinal_to_period(period_to_ordinal(periods)), periods, check_dtype=False
+        )
+        assert ordinal_to_period(period_to_ordinal(202301) - 2) == 202211
+
+    def test_convert_datetime_to_int(self):
+        periods = pd.Series([202212, 202301, 202303])
+
+        assert_series_equal(
+            convert_datetime_to_int(pd.to_datetime(periods, format="%Y%m")), periods
+        )